@@ -1,5 +1,12 @@
 from .chess import Chess_State
+from .bitboard import Bitboard_State
 from .engine import Engine
 from .move import Move
 
-__all__ = ['Chess_State', 'Engine', "Move"]
\ No newline at end of file
+# interchangeable position representations, selectable by name
+BACKENDS = {
+    'list': Chess_State,
+    'bitboard': Bitboard_State,
+}
+
+__all__ = ['Chess_State', 'Bitboard_State', 'Engine', "Move", 'BACKENDS']
@@ -0,0 +1,150 @@
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from . import BACKENDS
+from .engine import Engine
+
+# Engine of an analysis process, built once per process
+_process_engine = None
+
+
+def _init_analysis_process(engine_options):
+    global _process_engine
+    _process_engine = Engine(**(engine_options or {}))
+
+
+# search one position in an analysis process and return its result record
+def analyse_position(index, position_id, fen, depth, time_limit, backend, engine=None):
+    engine = engine or _process_engine
+    record = {'index': index, 'id': position_id, 'fen': fen}
+    try:
+        state = BACKENDS[backend]()
+        state.load_fen(fen)
+    except Exception as error:
+        record['error'] = f"Invalid position: {error}"
+        return record
+
+    # every position starts from empty tables so results do not depend on the job order
+    start_time = time.perf_counter()
+    try:
+        engine.clear_transposition_table()
+        if time_limit is not None:
+            move = engine.get_best_move_iterative(state, depth or 64, state.white_to_move, time_limit=time_limit)
+        else:
+            move = engine.get_best_move(state, depth, state.white_to_move)
+    except Exception as error:
+        # one bad position must not end the whole batch
+        record['error'] = f"Search failed: {type(error).__name__}: {error}"
+        return record
+    elapsed = time.perf_counter() - start_time
+
+    stats = engine.get_stats()
+    record.update({
+        'move': state.index_to_algebraic(move.start_row, move.start_col, move.end_row, move.end_col) if move else None,
+        'score': stats['best_score'],
+        'time': round(elapsed, 6),
+        'stats': stats,
+    })
+    return record
+
+
+# "fen" or ("id", "fen") -> ("id", "fen"), plain FENs are numbered by their position in the input
+def split_position(index, position):
+    if isinstance(position, str):
+        return index, position.strip()
+    position_id, fen = position
+    return position_id, fen.strip()
+
+
+# Analyse positions from any iterable (FEN strings or (id, fen) pairs) over a process pool.
+# Results are yielded as the searches finish, not in input order; the input is read lazily
+# and at most `max_in_flight` positions are queued at a time, so a slow consumer stalls the
+# reading instead of piling up results.
+def analyse_positions(positions, depth=3, time_limit=None, backend='list', processes=None,
+                      max_in_flight=None, engine_options=None):
+    if depth is None and time_limit is None:
+        raise Exception("Either a depth or a time limit is required")
+    if backend not in BACKENDS:
+        raise Exception(f"Unknown backend '{backend}'")
+    processes = processes or os.cpu_count() or 1
+    max_in_flight = max_in_flight or 2 * processes
+
+    jobs = enumerate(positions)
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_analysis_process,
+                             initargs=(engine_options,)) as pool:
+        pending = set()
+        # future -> (index, id, fen), to report a job whose process failed
+        submitted = {}
+        try:
+            while True:
+                for index, position in itertools.islice(jobs, max_in_flight - len(pending)):
+                    position_id, fen = split_position(index, position)
+                    future = pool.submit(analyse_position, index, position_id, fen, depth, time_limit, backend)
+                    submitted[future] = (index, position_id, fen)
+                    pending.add(future)
+                if not pending:
+                    break
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index, position_id, fen = submitted.pop(future)
+                    try:
+                        record = future.result()
+                    except Exception as error:
+                        record = {'index': index, 'id': position_id, 'fen': fen,
+                                  'error': f"Analysis failed: {type(error).__name__}: {error}"}
+                    yield record
+        finally:
+            # the consumer stopped early, drop what has not started yet
+            for future in pending:
+                future.cancel()
+
+
+# one FEN per line, optionally "id;fen"; blank lines and lines starting with # are skipped
+def read_positions(lines):
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        if ';' in line:
+            position_id, fen = line.split(';', 1)
+            yield position_id, fen
+        else:
+            yield line
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyse a file of positions over a process pool")
+    parser.add_argument('input', nargs='?', default='-', help="file with one FEN (or id;FEN) per line, - for stdin")
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default='list')
+    parser.add_argument('--depth', type=int, help="search depth, 3 by default (maximum depth with --time-limit)")
+    parser.add_argument('--time-limit', type=float, help="seconds per position, searched iteratively")
+    parser.add_argument('--processes', type=int, help="analysis processes, defaults to the CPU count")
+    parser.add_argument('--max-in-flight', type=int, help="positions queued at once, defaults to 2 per process")
+    parser.add_argument('--output', help="write JSON lines here instead of stdout")
+    args = parser.parse_args(argv)
+
+    depth = args.depth or (None if args.time_limit else 3)
+    source = sys.stdin if args.input == '-' else open(args.input)
+    output = open(args.output, 'w') if args.output else sys.stdout
+    failed = 0
+    try:
+        for record in analyse_positions(read_positions(source), depth, args.time_limit, args.backend,
+                                        args.processes, args.max_in_flight):
+            failed += 'error' in record
+            output.write(json.dumps(record) + '\n')
+            output.flush()
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,220 @@
+import argparse
+import json
+import sys
+
+from .chess import Chess_State, KING_STEPS, KNIGHT_STEPS
+from .move import PIECE_CODES
+
+# NumPy is optional: without it every position goes through Chess_State one at a time
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+TERMS = ('material', 'positional', 'mobility', 'castling')
+
+# piece codes as in the snapshots (PIECE_CODES), 0 is an empty square
+WHITE_PAWN, WHITE_KNIGHT, WHITE_BISHOP, WHITE_ROOK, WHITE_QUEEN, WHITE_KING = range(1, 7)
+BLACK_PAWN, BLACK_KNIGHT, BLACK_BISHOP, BLACK_ROOK, BLACK_QUEEN, BLACK_KING = range(7, 13)
+SLIDING_DIRECTIONS = KING_STEPS
+
+_tables = None
+
+
+# (source squares, target squares) index arrays of every square `steps` * (dr, dc) away on the board
+def _step_pairs(dr, dc, steps=1, rows=range(8)):
+    pairs = [(row * 8 + col, (row + dr * steps) * 8 + col + dc * steps) for row in rows for col in range(8)
+             if 0 <= row + dr * steps < 8 and 0 <= col + dc * steps < 8]
+    return np.array([source for source, _ in pairs], dtype=np.intp), np.array([target for _, target in pairs], dtype=np.intp)
+
+
+# (sources, targets, positions of the next distance's sources among these) for distances 1 to 7,
+# so the open rays are carried from one distance to the next without a full board array
+def _ray_steps(dr, dc):
+    steps = [_step_pairs(dr, dc, distance) for distance in range(1, 8)]
+    rays = []
+    for distance, (source, target) in enumerate(steps):
+        following = steps[distance + 1][0] if distance + 1 < len(steps) else np.array([], dtype=np.intp)
+        rays.append((source, target, np.searchsorted(source, following)))
+    return [ray for ray in rays if len(ray[0])]
+
+
+# lookup tables of the vectorized evaluation, built on first use
+def _get_tables():
+    global _tables
+    if _tables is None:
+        _tables = {
+            'values': np.array([Chess_State.SIGNED_PIECE_VALUES[piece] for piece in PIECE_CODES], dtype=np.float64),
+            # signed PST of every code on every square, (13, 64)
+            'pst': np.array([[Chess_State.SIGNED_PST.get(piece, Chess_State.SIGNED_PST['--'])[square // 8][square % 8]
+                              for square in range(64)] for piece in PIECE_CODES], dtype=np.float64),
+            'knight': [_step_pairs(dr, dc) for dr, dc in KNIGHT_STEPS],
+            'king': [_step_pairs(dr, dc) for dr, dc in KING_STEPS],
+            # rays: per direction the pairs of every distance, see _ray_steps
+            'rays': [(bool(dr and dc), _ray_steps(dr, dc)) for dr, dc in SLIDING_DIRECTIONS],
+            # pawn pushes, double pushes from the start row and captures, per color
+            'pawns': {
+                'w': (_step_pairs(-1, 0), _step_pairs(-1, 0, rows=[6]), _step_pairs(-2, 0, rows=[6]),
+                      [_step_pairs(-1, -1), _step_pairs(-1, 1)]),
+                'b': (_step_pairs(1, 0), _step_pairs(1, 0, rows=[1]), _step_pairs(2, 0, rows=[1]),
+                      [_step_pairs(1, -1), _step_pairs(1, 1)]),
+            },
+        }
+    return _tables
+
+
+# (N, 64) piece codes and (N,) flag bytes (None when there are none) of an array input
+def to_codes(positions, flags=None):
+    positions = np.asarray(positions)
+    if positions.ndim == 4:
+        # (N, 12, 8, 8) one-hot planes in PIECE_CODES order (wP ... bK)
+        planes = positions.reshape(len(positions), 12, 64)
+        codes = (planes * np.arange(1, 13).reshape(1, 12, 1)).sum(axis=1)
+    elif positions.ndim == 2 and positions.shape[1] in (64, Chess_State.SNAPSHOT_SIZE):
+        codes = positions[:, :64]
+        if positions.shape[1] == Chess_State.SNAPSHOT_SIZE and flags is None:
+            flags = positions[:, 64]
+    else:
+        raise Exception(f"Expected (N, 64), (N, 65) or (N, 12, 8, 8) positions, got shape {positions.shape}")
+    if flags is not None:
+        flags = np.asarray(flags, dtype=np.int64)
+    return codes.astype(np.int64), flags
+
+
+# (N, 65) snapshot array of positions
+def encode_states(states):
+    data = b''.join(state.to_snapshot() for state in states)
+    if np is None:
+        return [data[start:start + Chess_State.SNAPSHOT_SIZE] for start in range(0, len(data), Chess_State.SNAPSHOT_SIZE)]
+    return np.frombuffer(data, dtype=np.uint8).reshape(-1, Chess_State.SNAPSHOT_SIZE)
+
+
+# white and black pseudo-legal destination counts, same rules as Chess_State.count_pseudo_mobility.
+# Arrays are square-major, (64, 2, N) with white then black, so a set of squares is a block of rows
+def pseudo_mobility(codes):
+    tables = _get_tables()
+    squares = np.ascontiguousarray(codes.T).astype(np.int8)
+    empty = (squares == 0)[:, None, :]
+    white = (squares >= WHITE_PAWN) & (squares <= WHITE_KING)
+    black = squares >= BLACK_PAWN
+    not_own = ~np.stack((white, black), axis=1)
+    enemy = np.stack((black, white), axis=1)
+    pieces = {piece: np.stack((squares == piece, squares == piece + 6), axis=1)
+              for piece in (WHITE_PAWN, WHITE_KNIGHT, WHITE_BISHOP, WHITE_ROOK, WHITE_QUEEN, WHITE_KING)}
+    count = np.zeros((2, len(codes)), dtype=np.int64)
+
+    for piece, pairs in ((WHITE_KNIGHT, tables['knight']), (WHITE_KING, tables['king'])):
+        for source, target in pairs:
+            count += np.count_nonzero(pieces[piece][source] & not_own[target], axis=0)
+
+    # sliders: a ray goes on over empty squares, the first piece ends it (counted when it is the enemy's)
+    straight = pieces[WHITE_ROOK] | pieces[WHITE_QUEEN]
+    diagonal = pieces[WHITE_BISHOP] | pieces[WHITE_QUEEN]
+    for is_diagonal, steps in tables['rays']:
+        open_ray = (diagonal if is_diagonal else straight)[steps[0][0]]
+        for _, target, following in steps:
+            count += np.count_nonzero(open_ray & not_own[target], axis=0)
+            open_ray = (open_ray & empty[target])[following]
+
+    pawns = pieces[WHITE_PAWN]
+    for color in (0, 1):
+        push, double_source, double_target, captures = tables['pawns']['wb'[color]]
+        source, target = push
+        count[color] += np.count_nonzero(pawns[source, color] & empty[target, 0], axis=0)
+        (source, middle), (_, target) = double_source, double_target
+        count[color] += np.count_nonzero(pawns[source, color] & empty[middle, 0] & empty[target, 0], axis=0)
+        for source, target in captures:
+            count[color] += np.count_nonzero(pawns[source, color] & enemy[target, color], axis=0)
+    return count[0], count[1]
+
+
+# castling term of evaluate_board from snapshot flag bytes
+def castling_bonus(flags):
+    mask = (flags >> Chess_State.SNAPSHOT_CASTLING_SHIFT) & Chess_State.ALL_CASTLING_RIGHTS
+    score = 10.0 * ((mask & Chess_State.CASTLING_COLOR_BITS['w']) != 0)
+    score -= 10.0 * ((mask & Chess_State.CASTLING_COLOR_BITS['b']) != 0)
+    score += 30.0 * ((flags & Chess_State.SNAPSHOT_CASTLED['w']) != 0)
+    score -= 30.0 * ((flags & Chess_State.SNAPSHOT_CASTLED['b']) != 0)
+    return score
+
+
+def _evaluate_arrays(positions, flags):
+    codes, flags = to_codes(positions, flags)
+    tables = _get_tables()
+    white, black = pseudo_mobility(codes)
+    terms = {
+        'material': tables['values'][codes].sum(axis=1),
+        'positional': tables['pst'][codes, np.arange(64)].sum(axis=1),
+        'mobility': Chess_State.MOBILITY_WEIGHT * (white - black),
+        # without flag bytes (plain boards) there are no castling rights and nobody castled
+        'castling': castling_bonus(flags) if flags is not None else np.zeros(len(codes)),
+    }
+    terms['total'] = terms['material'] + terms['positional'] + terms['mobility'] + terms['castling']
+    return terms
+
+
+# scalar fallback: one Chess_State per position
+def _evaluate_states(positions, flags):
+    terms = {name: [] for name in TERMS + ('total',)}
+    # snapshots are loaded here, never into a Chess_State the caller passed in
+    scratch = Chess_State()
+    for index, position in enumerate(positions):
+        if isinstance(position, Chess_State):
+            state = position
+        else:
+            data = bytes(position)
+            if len(data) == 64:
+                data += bytes([flags[index] if flags is not None else 0])
+            scratch.load_snapshot(data)
+            state = scratch
+        white, black = state.count_pseudo_mobility()
+        values = (state.get_material_score(), state.get_positional_score(),
+                  state.MOBILITY_WEIGHT * (white - black), state.get_castling_bonus())
+        for name, value in zip(TERMS, values):
+            terms[name].append(value)
+        terms['total'].append(values[0] + values[1] + values[2] + values[3])
+    return terms
+
+
+# Evaluate many positions at once: {'material', 'positional', 'mobility', 'castling', 'total'}
+# each with one score per position (white positive, like evaluate_board with pseudo mobility).
+# `positions` is an (N, 65) snapshot array (to_snapshot / encode_states), (N, 64) piece codes
+# or (N, 12, 8, 8) piece planes; `flags` gives the snapshot flag bytes of the last two.
+# Without NumPy (or with use_numpy=False) it takes snapshots or Chess_States and returns lists.
+def evaluate_batch(positions, flags=None, use_numpy=None):
+    if use_numpy is None:
+        # Chess_States go through the scalar path
+        use_numpy = np is not None and not (len(positions) and isinstance(positions[0], Chess_State))
+    if use_numpy:
+        if np is None:
+            raise Exception("NumPy is not installed, use evaluate_batch(..., use_numpy=False)")
+        return _evaluate_arrays(positions, flags)
+    return _evaluate_states(positions, flags)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Static evaluation of many positions, one JSON line per position")
+    parser.add_argument('input', help="file with one FEN per line, - for stdin")
+    parser.add_argument('--output', help="write the JSON lines here instead of stdout")
+    parser.add_argument('--no-numpy', action='store_true', help="use the scalar evaluation")
+    args = parser.parse_args(argv)
+
+    source = sys.stdin if args.input == '-' else open(args.input)
+    with source:
+        fens = [line.strip() for line in source if line.strip() and not line.startswith('#')]
+    terms = evaluate_batch(encode_states(Chess_State.from_fen(fen) for fen in fens),
+                           use_numpy=not args.no_numpy and np is not None)
+    output = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        for index, fen in enumerate(fens):
+            record = {'fen': fen}
+            record.update({name: float(values[index]) for name, values in terms.items()})
+            output.write(json.dumps(record) + '\n')
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,242 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+from . import BACKENDS
+from .engine import Engine
+
+# Fixed search suite, so runs on the same machine are comparable
+SEARCH_POSITIONS = [
+    ('italian', 'middlegame', 'r1bqkb1r/pppp1ppp/2n2n2/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4'),
+    ('giuoco', 'middlegame', 'r1bq1rk1/ppp2ppp/2np1n2/2b1p3/2B1P3/2PP1N2/PP3PPP/RNBQ1RK1 w - - 0 7'),
+    ('qgd', 'middlegame', 'r2q1rk1/pp2bppp/2n1pn2/3p4/3P4/2NBPN2/PP3PPP/R2Q1RK1 w - - 0 10'),
+    ('position6', 'middlegame', 'r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10'),
+    ('rook_ending', 'endgame', '8/5pk1/6p1/8/8/6P1/r4PK1/3R4 w - - 0 1'),
+    ('kp_vs_k', 'endgame', '8/5k2/8/3K4/8/8/4P3/8 w - - 0 1'),
+    ('minor_ending', 'endgame', '8/1p3k2/p1b5/8/2P5/1P2B3/P4K2/8 b - - 0 1'),
+]
+
+SEARCH_MODES = ('fixed', 'iterative')
+
+
+# run one search and turn the engine counters into a record
+def run_search(name, category, fen, depth, mode, backend='list', engine_options=None, time_limit=3600.0):
+    state = BACKENDS[backend]()
+    state.load_fen(fen)
+    engine = Engine(**(engine_options or {}))
+
+    start_time = time.perf_counter()
+    if mode == 'fixed':
+        move = engine.get_best_move(state, depth, state.white_to_move)
+    elif mode == 'iterative':
+        move = engine.get_best_move_iterative(state, depth, state.white_to_move, time_limit=time_limit)
+    else:
+        raise Exception(f"Unknown search mode '{mode}'")
+    elapsed = time.perf_counter() - start_time
+    engine.close()
+
+    stats = engine.get_stats()
+    # nps counts quiescence nodes too, like the UCI info lines; the branching factor is
+    # the main search's, quiescence nodes are their own column (qnode_cnt)
+    nodes = stats['nodes']
+    main_nodes = stats['node_cnt']
+    reached = stats['completed_depth']
+    record = {
+        'name': name,
+        'category': category,
+        'mode': mode,
+        'depth': depth,
+        'move': state.index_to_algebraic(move.start_row, move.start_col, move.end_row, move.end_col) if move else None,
+        'time': round(elapsed, 6),
+        'nps': round(nodes / elapsed) if elapsed > 0 else 0,
+        # main search nodes ** (1 / depth): the average branching left after pruning
+        'ebf': round(main_nodes ** (1.0 / reached), 3) if main_nodes and reached else None,
+    }
+    record.update(stats)
+    return record
+
+
+def run_benchmark(depths, modes=SEARCH_MODES, backend='list', engine_options=None,
+                  positions=SEARCH_POSITIONS, time_limit=3600.0, verbose=True):
+    records = []
+    for depth in depths:
+        for name, category, fen in positions:
+            for mode in modes:
+                record = run_search(name, category, fen, depth, mode, backend, engine_options, time_limit)
+                records.append(record)
+                if verbose:
+                    print_record(record)
+    return records
+
+
+# Time to depth of the root split: the iterative search to `depth` over the suite with each
+# number of search processes, and the speedup and extra nodes against the first count.
+# `serial_share` is the part of the nodes the main process searched alone (shallow iterations
+# and first root moves); `speedup_bound` is what that allows on free cores (Amdahl's law)
+def run_scaling(depth, process_counts, backend='list', engine_options=None, positions=SEARCH_POSITIONS,
+                verbose=True):
+    rows = []
+    for processes in process_counts:
+        options = dict(engine_options or {}, processes=processes)
+        records = [run_search(name, category, fen, depth, 'iterative', backend, options)
+                   for name, category, fen in positions]
+        summary = summarize(records)
+        row = {'processes': processes, 'time': summary['time'], 'nodes': summary['nodes'],
+               'moves': [record['move'] for record in records]}
+        serial = 1.0 - sum(record['pool_nodes'] for record in records) / summary['nodes'] if processes > 1 else 1.0
+        row['serial_share'] = round(serial, 4)
+        row['speedup_bound'] = round(1.0 / (serial + (1.0 - serial) / processes), 3)
+        base = rows[0] if rows else row
+        row['speedup'] = round(base['time'] / row['time'], 3) if row['time'] > 0 else None
+        row['node_overhead'] = percent_change(row['nodes'], base['nodes'])
+        rows.append(row)
+        if verbose:
+            print(f"processes {processes:>2}: {row['time']:>8.3f}s to depth {depth}, {row['nodes']} nodes, "
+                  f"speedup {row['speedup']}, nodes {row['node_overhead']:+}%, serial {row['serial_share']:.1%}, "
+                  f"speedup bound {row['speedup_bound']}")
+    return rows
+
+
+def print_record(record):
+    print(f"{record['name']:<13} {record['mode']:<9} depth {record['depth']}: {record['move'] or '-':<5} "
+          f"{record['time']:>8.3f}s {record['nodes']:>8} nodes ({record['qnode_cnt']} in quiescence) {record['nps']:>7} nps "
+          f"ebf {record['ebf']} branch {record['branch']} pruned {record['pruned']} hit {record['hit']} "
+          f"first-move cutoffs {record['first_move_cutoff_rate']}")
+
+
+# main search and quiescence nodes of a record, also for runs saved before records had `nodes`
+def record_nodes(record):
+    return record.get('nodes', record['node_cnt'] + record['qnode_cnt'])
+
+
+def summarize(records):
+    nodes = sum(record_nodes(record) for record in records)
+    elapsed = sum(record['time'] for record in records)
+    return {
+        'positions': len(records),
+        'nodes': nodes,
+        'time': round(elapsed, 6),
+        'nps': round(nodes / elapsed) if elapsed > 0 else 0,
+    }
+
+
+def write_results(records, path, backend, engine_options):
+    result = {
+        'backend': backend,
+        'engine_options': engine_options,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'summary': summarize(records),
+        'records': records,
+    }
+    with open(path, 'w') as f:
+        json.dump(result, f, indent=2)
+
+
+def percent_change(new, old):
+    if not old:
+        return None
+    return round(100.0 * (new - old) / old, 1)
+
+
+def record_nps(record):
+    return record_nodes(record) / record['time'] if record['time'] > 0 else 0
+
+
+# per-record and total differences against an earlier JSON run
+def compare_results(records, previous_path):
+    with open(previous_path) as f:
+        previous = json.load(f)
+
+    old_records = {(r['name'], r['mode'], r['depth']): r for r in previous['records']}
+    rows = []
+    matched, old_matched = [], []
+    for record in records:
+        old = old_records.get((record['name'], record['mode'], record['depth']))
+        if old is None:
+            continue
+        matched.append(record)
+        old_matched.append(old)
+        rows.append({
+            'name': record['name'],
+            'mode': record['mode'],
+            'depth': record['depth'],
+            'move_changed': record['move'] != old['move'],
+            'time': percent_change(record['time'], old['time']),
+            'nodes': percent_change(record_nodes(record), record_nodes(old)),
+            'nps': percent_change(record_nps(record), record_nps(old)),
+        })
+    # totals only over the searches both runs have in common
+    summary = summarize(matched)
+    old_summary = summarize(old_matched)
+    totals = {
+        'time': percent_change(summary['time'], old_summary['time']),
+        'nodes': percent_change(summary['nodes'], old_summary['nodes']),
+        'nps': percent_change(summary['nps'], old_summary['nps']),
+    }
+    return rows, totals
+
+
+# "use_quiescence=false" -> ('use_quiescence', False)
+def parse_option(text):
+    key, _, value = text.partition('=')
+    lowered = value.lower()
+    if lowered in ('true', 'false'):
+        return key, lowered == 'true'
+    for cast in (int, float):
+        try:
+            return key, cast(value)
+        except ValueError:
+            pass
+    return key, value
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search benchmark over a fixed middlegame/endgame suite")
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default='list')
+    parser.add_argument('--depths', default='3', help="comma separated search depths, e.g. 2,3,4")
+    parser.add_argument('--modes', default=','.join(SEARCH_MODES), help="fixed, iterative or both")
+    parser.add_argument('--time-limit', type=float, default=3600.0, help="time limit of the iterative search")
+    parser.add_argument('--option', action='append', default=[], metavar='NAME=VALUE',
+                        help="Engine keyword argument, e.g. use_transposition_table=false (repeatable)")
+    parser.add_argument('--output', help="write the run as JSON")
+    parser.add_argument('--compare', help="JSON output of an earlier run to compare against")
+    parser.add_argument('--processes', help="comma separated search process counts, e.g. 1,2,4: time to depth "
+                                            "of the iterative search with each (the first of --depths)")
+    args = parser.parse_args(argv)
+
+    depths = [int(depth) for depth in args.depths.split(',')]
+    modes = args.modes.split(',')
+    engine_options = dict(parse_option(option) for option in args.option)
+
+    if args.processes:
+        process_counts = [int(count) for count in args.processes.split(',')]
+        cores = os.cpu_count() or 1
+        print(f"{cores} cores")
+        if max(process_counts) > cores:
+            print(f"more search processes than cores: the counts above {cores} share them and cannot speed up")
+        run_scaling(depths[0], process_counts, args.backend, engine_options)
+        return 0
+
+    records = run_benchmark(depths, modes, args.backend, engine_options, time_limit=args.time_limit)
+    summary = summarize(records)
+    print(f"total: {summary['nodes']} nodes in {summary['time']:.3f}s, {summary['nps']} nps")
+
+    if args.output:
+        write_results(records, args.output, args.backend, engine_options)
+    if args.compare:
+        rows, totals = compare_results(records, args.compare)
+        print("\nchange against", args.compare)
+        for row in rows:
+            changed = '  (best move changed)' if row['move_changed'] else ''
+            print(f"{row['name']:<13} {row['mode']:<9} depth {row['depth']}: time {row['time']}% "
+                  f"nodes {row['nodes']}% nps {row['nps']}%{changed}")
+        print(f"total: time {totals['time']}% nodes {totals['nodes']}% nps {totals['nps']}%")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
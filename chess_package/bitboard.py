@@ -0,0 +1,679 @@
+from .chess import Chess_State, KING_STEPS, KNIGHT_STEPS
+from .move import Move
+
+# Squares are numbered the same way as Chess_State.board is indexed:
+# square = row * 8 + col, so a8 is bit 0 and h1 is bit 63.
+
+# (row, col) steps for the eight sliding directions
+DIRECTIONS = [(-1, 0), (1, 0), (0, -1), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1)]
+ROOK_DIRECTIONS = (0, 1, 2, 3)
+BISHOP_DIRECTIONS = (4, 5, 6, 7)
+QUEEN_DIRECTIONS = ROOK_DIRECTIONS + BISHOP_DIRECTIONS
+# a ray "increases" when walking it moves to higher square numbers,
+# then the nearest blocker is the lowest set bit, otherwise the highest
+RAY_INCREASES = [dr > 0 or (dr == 0 and dc > 0) for dr, dc in DIRECTIONS]
+
+
+def _step_mask(square, steps):
+    row, col = divmod(square, 8)
+    mask = 0
+    for dr, dc in steps:
+        r, c = row + dr, col + dc
+        if 0 <= r < 8 and 0 <= c < 8:
+            mask |= 1 << (r * 8 + c)
+    return mask
+
+
+def _ray_mask(square, dr, dc):
+    row, col = divmod(square, 8)
+    mask = 0
+    r, c = row + dr, col + dc
+    while 0 <= r < 8 and 0 <= c < 8:
+        mask |= 1 << (r * 8 + c)
+        r += dr
+        c += dc
+    return mask
+
+
+KNIGHT_ATTACKS = [_step_mask(sq, KNIGHT_STEPS) for sq in range(64)]
+KING_ATTACKS = [_step_mask(sq, KING_STEPS) for sq in range(64)]
+# squares a pawn of the given colour standing on `square` attacks
+PAWN_ATTACKS = {
+    'w': [_step_mask(sq, [(-1, -1), (-1, 1)]) for sq in range(64)],
+    'b': [_step_mask(sq, [(1, -1), (1, 1)]) for sq in range(64)],
+}
+RAYS = [[_ray_mask(sq, dr, dc) for sq in range(64)] for dr, dc in DIRECTIONS]
+
+
+# {blockers on the ray: attacked squares} for one ray; the last square of the ray cannot block
+# anything behind it, so it is left out of the key (`mask`)
+def _ray_table(square, d):
+    ray = RAYS[d][square]
+    squares = list(iter_squares(ray))
+    if not RAY_INCREASES[d]:
+        squares.reverse()
+    mask = ray & ~(1 << squares[-1]) if squares else 0
+    inner = squares[:-1]
+    table = {}
+    for subset in range(1 << len(inner)):
+        blockers = 0
+        for index, sq in enumerate(inner):
+            if subset >> index & 1:
+                blockers |= 1 << sq
+        attacks = ray
+        if blockers:
+            nearest = (blockers & -blockers).bit_length() - 1 if RAY_INCREASES[d] else blockers.bit_length() - 1
+            attacks ^= RAYS[d][nearest]
+        table[blockers] = attacks
+    return mask, table
+
+
+def iter_squares(bb):
+    # yields set bits from the lowest square upwards (row-major board order)
+    while bb:
+        low = bb & -bb
+        yield low.bit_length() - 1
+        bb ^= low
+
+
+# per square the (mask, table) pair of each of its rays, so a slider's attacks are one dict
+# lookup per direction instead of a walk to the first blocker
+RAY_TABLES = [[_ray_table(sq, d) for d in range(8)] for sq in range(64)]
+BISHOP_TABLES = [tuple(x for d in BISHOP_DIRECTIONS for x in RAY_TABLES[sq][d]) for sq in range(64)]
+ROOK_TABLES = [tuple(x for d in ROOK_DIRECTIONS for x in RAY_TABLES[sq][d]) for sq in range(64)]
+
+
+def bishop_attacks(square, occupied):
+    m0, t0, m1, t1, m2, t2, m3, t3 = BISHOP_TABLES[square]
+    return t0[occupied & m0] | t1[occupied & m1] | t2[occupied & m2] | t3[occupied & m3]
+
+
+def rook_attacks(square, occupied):
+    m0, t0, m1, t1, m2, t2, m3, t3 = ROOK_TABLES[square]
+    return t0[occupied & m0] | t1[occupied & m1] | t2[occupied & m2] | t3[occupied & m3]
+
+
+# int.bit_count needs Python 3.10
+if hasattr(int, 'bit_count'):
+    popcount = int.bit_count
+else:
+    def popcount(bb):
+        return bin(bb).count('1')
+
+SQUARE_TO_POSITION = [divmod(sq, 8) for sq in range(64)]
+
+
+# (square, bit) of every target square in the order Chess_State.generate_*_moves lists them,
+# ray by ray from the piece outwards; castling targets follow the king steps, king side first
+def _target_order(square, steps=(), directions=(), castling=False):
+    row, col = divmod(square, 8)
+    order = []
+    for dr, dc in steps:
+        if 0 <= row + dr < 8 and 0 <= col + dc < 8:
+            order.append((row + dr) * 8 + col + dc)
+    for dr, dc in directions:
+        r, c = row + dr, col + dc
+        while 0 <= r < 8 and 0 <= c < 8:
+            order.append(r * 8 + c)
+            r += dr
+            c += dc
+    if castling and col == 4 and row in (0, 7):
+        order += [row * 8 + 6, row * 8 + 2]
+    return tuple((target, 1 << target) for target in order)
+
+
+ROOK_ORDER = ((0, -1), (0, 1), (-1, 0), (1, 0))
+BISHOP_ORDER = ((1, 1), (1, -1), (-1, 1), (-1, -1))
+# pawns: push, double push, capture towards the a file, towards the h file
+TARGET_ORDER = {
+    'P': {'w': [_target_order(sq, ((-1, 0), (-2, 0), (-1, -1), (-1, 1))) for sq in range(64)],
+          'b': [_target_order(sq, ((1, 0), (2, 0), (1, -1), (1, 1))) for sq in range(64)]},
+    'N': [_target_order(sq, KNIGHT_STEPS) for sq in range(64)],
+    'B': [_target_order(sq, directions=BISHOP_ORDER) for sq in range(64)],
+    'R': [_target_order(sq, directions=ROOK_ORDER) for sq in range(64)],
+    'Q': [_target_order(sq, directions=BISHOP_ORDER + ROOK_ORDER) for sq in range(64)],
+    'K': [_target_order(sq, KING_STEPS, castling=True) for sq in range(64)],
+}
+PIECES = ('wP', 'wN', 'wB', 'wR', 'wQ', 'wK', 'bP', 'bN', 'bB', 'bR', 'bQ', 'bK')
+# the same target orders as whole move tuples per piece code and square, (bit, move)
+MOVE_ORDER = {piece: [tuple((bit, SQUARE_TO_POSITION[square] + SQUARE_TO_POSITION[target])
+                            for target, bit in (TARGET_ORDER['P'][piece[0]] if piece[1] == 'P'
+                                                else TARGET_ORDER[piece[1]])[square])
+                      for square in range(64)]
+              for piece in PIECES}
+SQUARE_BITS = [1 << square for square in range(64)]
+# square in front of a pawn and two squares in front (0 where it cannot push / double push)
+PAWN_PUSHES = {'w': [1 << (sq - 8) if sq >= 8 else 0 for sq in range(64)],
+               'b': [1 << (sq + 8) if sq < 56 else 0 for sq in range(64)]}
+PAWN_DOUBLE_PUSHES = {'w': [1 << (sq - 16) if sq >> 3 == 6 else 0 for sq in range(64)],
+                      'b': [1 << (sq + 16) if sq >> 3 == 1 else 0 for sq in range(64)]}
+# zobrist keys and signed PST values by piece code and square, the tables make_move reads
+ZOBRIST_KEYS = {piece: [Chess_State.ZOBRIST_TABLE[square >> 3][square & 7][Chess_State.BOARD_PIECE_TO_INDEX[piece]]
+                        for square in range(64)] for piece in PIECES}
+PST_VALUES = {piece: [Chess_State.SIGNED_PST[piece][square >> 3][square & 7] for square in range(64)]
+              for piece in PIECES}
+# the knight squares and the sliding directions in the order Chess_State.find_least_valuable_attacker
+# walks them
+KNIGHT_ORDER = [_target_order(sq, KNIGHT_STEPS) for sq in range(64)]
+EXCHANGE_DIRECTIONS = tuple((DIRECTIONS.index(step), 'BQ' if step[0] and step[1] else 'RQ') for step in KING_STEPS)
+FULL_BOARD = (1 << 64) - 1
+FILE_A = 0x0101010101010101
+FILE_H = FILE_A << 7
+ROW_2 = 0xFF << 16
+ROW_5 = 0xFF << 40
+
+
+def slider_attacks(square, occupied, directions):
+    # every ray up to (and including) its first blocker
+    attacks = 0
+    tables = RAY_TABLES[square]
+    for d in directions:
+        mask, table = tables[d]
+        attacks |= table[occupied & mask]
+    return attacks
+
+
+class Bitboard_State(Chess_State):
+    # Same position and API as Chess_State, but the position lives in 64-bit integer
+    # bitboards: make/undo, move generation, attack detection, the exchange evaluation and the
+    # zobrist, material and PST totals all work on them. `board` stays as the square-to-piece
+    # lookup bitboard engines keep next to the bitboards (make/undo write the squares that
+    # change), so printing, FEN and callers that index it keep working unchanged.
+
+    PIECES = list(PIECES)
+
+    # rebuild the bitboards from `board`, then the zobrist key and eval totals from the bitboards;
+    # call after editing `board`, `castling_rights` or `castled_dict` by hand
+    def sync_incremental_state(self):
+        self.sync_bitboards()
+        bitboards = self.bitboards
+        values = self.SIGNED_PIECE_VALUES
+        hash_value = 0
+        material = 0
+        positional = 0
+        for piece in PIECES:
+            keys = ZOBRIST_KEYS[piece]
+            pst = PST_VALUES[piece]
+            for square in iter_squares(bitboards[piece]):
+                hash_value ^= keys[square]
+                material += values[piece]
+                positional += pst[square]
+        if not self.white_to_move:
+            hash_value ^= self.ZOBRIST_BLACK_TO_MOVE
+        hash_value ^= self.ZOBRIST_CASTLING_BY_MASK[self.castling_mask]
+        self.zobrist_hash = hash_value
+        self.material_score = material
+        self.positional_score = positional
+
+
+    # rebuild every bitboard from `board`
+    def sync_bitboards(self):
+        self.bitboards = {piece: 0 for piece in PIECES}
+        self.occupancy = {'w': 0, 'b': 0}
+        for row in range(8):
+            for col in range(8):
+                piece = self.board[row][col]
+                if piece != '--':
+                    bit = 1 << (row * 8 + col)
+                    self.bitboards[piece] |= bit
+                    self.occupancy[piece[0]] |= bit
+
+
+    def clone(self):
+        other = super().clone()
+        other.bitboards = self.bitboards.copy()
+        other.occupancy = self.occupancy.copy()
+        return other
+
+
+    # same moves, rights and Move deltas as Chess_State.make_move, in one pass over the bitboards
+    def make_move(self, start_row, start_col, end_row, end_col):
+        board = self.board
+        piece = board[start_row][start_col]
+        captured = board[end_row][end_col]
+        color = piece[0]
+        start = start_row * 8 + start_col
+        end = end_row * 8 + end_col
+        from_bb = SQUARE_BITS[start]
+        to_bb = SQUARE_BITS[end]
+        bitboards = self.bitboards
+        occupancy = self.occupancy
+        values = self.SIGNED_PIECE_VALUES
+        prev_rights = self.castling_mask
+
+        bitboards[piece] ^= from_bb
+        occupancy[color] ^= from_bb | to_bb
+        hash_delta = self.ZOBRIST_BLACK_TO_MOVE ^ ZOBRIST_KEYS[piece][start]
+        positional_delta = -PST_VALUES[piece][start]
+        material_delta = 0
+        is_captured = captured != '--'
+        if is_captured:
+            bitboards[captured] ^= to_bb
+            occupancy[captured[0]] ^= to_bb
+            hash_delta ^= ZOBRIST_KEYS[captured][end]
+            positional_delta -= PST_VALUES[captured][end]
+            material_delta -= values[captured]
+
+        # a pawn on the last row becomes a queen
+        end_piece = piece
+        promoted = piece[1] == 'P' and end_row == (0 if color == 'w' else 7)
+        if promoted:
+            end_piece = color + 'Q'
+            material_delta += values[end_piece] - values[piece]
+        bitboards[end_piece] ^= to_bb
+        hash_delta ^= ZOBRIST_KEYS[end_piece][end]
+        positional_delta += PST_VALUES[end_piece][end]
+        board[start_row][start_col] = '--'
+        board[end_row][end_col] = end_piece
+
+        castled = False
+        if piece[1] == 'K':
+            self.castling_mask &= ~self.CASTLING_COLOR_BITS[color]
+            self.king_positions[color] = (end_row, end_col)
+            if abs(start_col - end_col) == 2:
+                self.castled_dict[color] = True
+                if end_col in (6, 2):
+                    castled = True
+                    # whatever stands on the rook's square goes along, like in Chess_State.make_move
+                    rook_col, rook_end_col = (7, 5) if end_col == 6 else (0, 3)
+                    rook = board[end_row][rook_col]
+                    board[end_row][rook_end_col] = rook
+                    board[end_row][rook_col] = '--'
+                    if rook != '--':
+                        rook_from = end_row * 8 + rook_col
+                        rook_to = end_row * 8 + rook_end_col
+                        rook_bb = SQUARE_BITS[rook_from] | SQUARE_BITS[rook_to]
+                        bitboards[rook] ^= rook_bb
+                        occupancy[rook[0]] ^= rook_bb
+                        hash_delta ^= ZOBRIST_KEYS[rook][rook_from] ^ ZOBRIST_KEYS[rook][rook_to]
+                        positional_delta += PST_VALUES[rook][rook_to] - PST_VALUES[rook][rook_from]
+        elif piece[1] == 'R':
+            if start_col == 0:
+                self.castling_mask &= ~self.CASTLING_BITS[color]['Q']
+            elif start_col == 7:
+                self.castling_mask &= ~self.CASTLING_BITS[color]['K']
+
+        hash_delta ^= self.ZOBRIST_CASTLING_BY_MASK[prev_rights ^ self.castling_mask]
+        self.zobrist_hash ^= hash_delta
+        self.white_to_move = not self.white_to_move
+        self.material_score += material_delta
+        self.positional_score += positional_delta
+        return Move(start_row, start_col, end_row, end_col, piece, captured, False, promoted, is_captured, castled,
+                    prev_rights, hash_delta, material_delta, positional_delta)
+
+
+    def undo_move(self, move):
+        self.castling_mask = move.prevCastlingRight
+        self.zobrist_hash ^= move.hashDelta
+        self.white_to_move = not self.white_to_move
+        self.material_score -= move.materialDelta
+        self.positional_score -= move.positionalDelta
+
+        board = self.board
+        bitboards = self.bitboards
+        occupancy = self.occupancy
+        piece = move.moved_piece
+        captured = move.captured_piece
+        color = piece[0]
+        start_row, start_col, end_row, end_col = move.start_row, move.start_col, move.end_row, move.end_col
+        from_bb = SQUARE_BITS[start_row * 8 + start_col]
+        to_bb = SQUARE_BITS[end_row * 8 + end_col]
+
+        board[start_row][start_col] = piece
+        board[end_row][end_col] = captured
+        bitboards[piece] ^= from_bb
+        bitboards[color + 'Q' if move.isPromoted else piece] ^= to_bb
+        occupancy[color] ^= from_bb | to_bb
+        if move.isReallyCaptured:
+            bitboards[captured] ^= to_bb
+            occupancy[captured[0]] ^= to_bb
+
+        if piece[1] == 'K':
+            self.king_positions[color] = (start_row, start_col)
+            if move.hasCastled:
+                self.castled_dict[color] = False
+                rook_col, rook_end_col = (7, 5) if end_col == 6 else (0, 3)
+                rook = board[end_row][rook_end_col]
+                board[end_row][rook_col] = rook
+                board[end_row][rook_end_col] = '--'
+                if rook != '--':
+                    rook_bb = SQUARE_BITS[end_row * 8 + rook_col] | SQUARE_BITS[end_row * 8 + rook_end_col]
+                    bitboards[rook] ^= rook_bb
+                    occupancy[rook[0]] ^= rook_bb
+
+
+    # target squares of a bitboard in the list backend's order, so both backends search the same
+    # move order and find the same moves
+    def _ordered_targets(self, square, piece, targets):
+        order = TARGET_ORDER[piece[1]]
+        if piece[1] == 'P':
+            order = order[piece[0]]
+        return [target for target, bit in order[square] if targets & bit]
+
+
+    # bitboard of target squares for the piece on `square` (castling excluded)
+    def _piece_targets(self, square, piece):
+        color, piece_type = piece
+        own = self.occupancy[color]
+        if piece_type == 'P':
+            return self._pawn_targets(square, color)
+        occupied = own | self.occupancy['b' if color == 'w' else 'w']
+        if piece_type == 'N':
+            targets = KNIGHT_ATTACKS[square]
+        elif piece_type == 'B':
+            targets = bishop_attacks(square, occupied)
+        elif piece_type == 'R':
+            targets = rook_attacks(square, occupied)
+        elif piece_type == 'Q':
+            targets = bishop_attacks(square, occupied) | rook_attacks(square, occupied)
+        elif piece_type == 'K':
+            targets = KING_ATTACKS[square]
+        else:
+            raise Exception("Unknown Piece !")
+        return targets & ~own
+
+
+    def _pawn_targets(self, square, color):
+        enemy = self.occupancy['b' if color == 'w' else 'w']
+        empty = ~(self.occupancy['w'] | self.occupancy['b'])
+        single = PAWN_PUSHES[color][square] & empty
+        double = PAWN_DOUBLE_PUSHES[color][square] & empty if single else 0
+        return single | double | (PAWN_ATTACKS[color][square] & enemy)
+
+
+    # castling needs the right, the rook, empty squares in between, and a
+    # king that is not in check and does not pass through or land on an attacked square
+    def _castling_targets(self, square, color):
+        row, col = SQUARE_TO_POSITION[square]
+        rights = self.castling_mask
+        bits = self.CASTLING_BITS[color]
+        if not rights & self.CASTLING_COLOR_BITS[color]:
+            return 0
+        occupied = self.occupancy['w'] | self.occupancy['b']
+        enemy = 'b' if color == 'w' else 'w'
+        if self._is_attacked(square, enemy, occupied):
+            return 0
+        rooks = self.bitboards[color + 'R']
+        base = row * 8
+        targets = 0
+        if rights & bits['K'] and rooks & (1 << (base + 7)):
+            if not occupied & ((1 << (base + 5)) | (1 << (base + 6))):
+                if not self._is_attacked(base + 5, enemy, occupied) and not self._is_attacked(base + 6, enemy, occupied):
+                    targets |= 1 << (base + 6)
+        if rights & bits['Q'] and rooks & (1 << base):
+            if not occupied & ((1 << (base + 1)) | (1 << (base + 2)) | (1 << (base + 3))):
+                if not self._is_attacked(base + 3, enemy, occupied) and not self._is_attacked(base + 2, enemy, occupied):
+                    targets |= 1 << (base + 2)
+        return targets
+
+
+    # (checkers bitboard, mask of squares that capture or block a single check,
+    #  {pinned square: mask of the pin line it may move along})
+    def _checks_and_pins(self, king_square, color, enemy, occupied):
+        bitboards = self.bitboards
+        own = self.occupancy[color]
+        queens = bitboards[enemy + 'Q']
+        diagonal = bitboards[enemy + 'B'] | queens
+        straight = bitboards[enemy + 'R'] | queens
+
+        checkers = (KNIGHT_ATTACKS[king_square] & bitboards[enemy + 'N']) | \
+                   (PAWN_ATTACKS[color][king_square] & bitboards[enemy + 'P'])
+        check_mask = checkers
+        pins = {}
+        for d in QUEEN_DIRECTIONS:
+            ray = RAYS[d][king_square]
+            blockers = ray & occupied
+            if not blockers:
+                continue
+            sliders = straight if d in ROOK_DIRECTIONS else diagonal
+            if not ray & sliders:
+                continue
+            increases = RAY_INCREASES[d]
+            first = (blockers & -blockers).bit_length() - 1 if increases else blockers.bit_length() - 1
+            first_bb = 1 << first
+            if first_bb & sliders:
+                checkers |= first_bb
+                check_mask |= ray ^ RAYS[d][first]
+            elif first_bb & own:
+                rest = blockers ^ first_bb
+                if rest:
+                    second = (rest & -rest).bit_length() - 1 if increases else rest.bit_length() - 1
+                    if (1 << second) & sliders:
+                        pins[first] = ray ^ RAYS[d][second]
+        return checkers, check_mask, pins
+
+
+    def has_non_pawn_material(self, color):
+        bitboards = self.bitboards
+        return bool(bitboards[color + 'N'] | bitboards[color + 'B'] | bitboards[color + 'R'] | bitboards[color + 'Q'])
+
+
+    def count_pseudo_mobility(self):
+        bitboards = self.bitboards
+        white, black = self.occupancy['w'], self.occupancy['b']
+        occupied = white | black
+        empty = ~occupied & FULL_BOARD
+        counts = []
+        for color, own, enemy in (('w', white, black), ('b', black, white)):
+            # pawns set-wise: pushes and both capture diagonals as shifted bitboards
+            pawns = bitboards[color + 'P']
+            if color == 'w':
+                single = (pawns >> 8) & empty
+                double = ((single & ROW_5) >> 8) & empty
+                captures = (((pawns & ~FILE_A) >> 9) & enemy, ((pawns & ~FILE_H) >> 7) & enemy)
+            else:
+                single = (pawns << 8) & empty
+                double = ((single & ROW_2) << 8) & empty
+                captures = (((pawns & ~FILE_A) << 7) & enemy, ((pawns & ~FILE_H) << 9) & enemy)
+            count = popcount(single) + popcount(double) + popcount(captures[0]) + popcount(captures[1])
+
+            # the pieces one by one, set bits taken off inline (this runs at every evaluation)
+            not_own = ~own
+            count += popcount(KING_ATTACKS[bitboards[color + 'K'].bit_length() - 1] & not_own)
+            pieces = bitboards[color + 'N']
+            while pieces:
+                low = pieces & -pieces
+                pieces ^= low
+                count += popcount(KNIGHT_ATTACKS[low.bit_length() - 1] & not_own)
+            # bishop_attacks / rook_attacks written out, queens take both
+            queens = bitboards[color + 'Q']
+            pieces = bitboards[color + 'B'] | queens
+            while pieces:
+                low = pieces & -pieces
+                pieces ^= low
+                m0, t0, m1, t1, m2, t2, m3, t3 = BISHOP_TABLES[low.bit_length() - 1]
+                attacks = t0[occupied & m0] | t1[occupied & m1] | t2[occupied & m2] | t3[occupied & m3]
+                if low & queens:
+                    m0, t0, m1, t1, m2, t2, m3, t3 = ROOK_TABLES[low.bit_length() - 1]
+                    attacks |= t0[occupied & m0] | t1[occupied & m1] | t2[occupied & m2] | t3[occupied & m3]
+                count += popcount(attacks & not_own)
+            pieces = bitboards[color + 'R']
+            while pieces:
+                low = pieces & -pieces
+                pieces ^= low
+                m0, t0, m1, t1, m2, t2, m3, t3 = ROOK_TABLES[low.bit_length() - 1]
+                count += popcount((t0[occupied & m0] | t1[occupied & m1] | t2[occupied & m2] | t3[occupied & m3])
+                                  & not_own)
+            counts.append(count)
+        return counts[0], counts[1]
+
+
+    def get_piece_moveable_positions(self, row, col):
+        piece = self.board[row][col]
+        square = row * 8 + col
+        targets = self._piece_targets(square, piece)
+        if piece[1] == 'K':
+            targets |= self._castling_targets(square, piece[0])
+        return [SQUARE_TO_POSITION[sq] for sq in self._ordered_targets(square, piece, targets)]
+
+
+    # is `square` attacked by `enemy` once `occupied` is the occupancy and
+    # every enemy piece standing on `removed` has been taken off the board
+    def _is_attacked(self, square, enemy, occupied, removed=0):
+        bitboards = self.bitboards
+        keep = ~removed
+        if KNIGHT_ATTACKS[square] & bitboards[enemy + 'N'] & keep:
+            return True
+        friend = 'b' if enemy == 'w' else 'w'
+        if PAWN_ATTACKS[friend][square] & bitboards[enemy + 'P'] & keep:
+            return True
+        if KING_ATTACKS[square] & bitboards[enemy + 'K'] & keep:
+            return True
+        queens = bitboards[enemy + 'Q']
+        diagonal = (bitboards[enemy + 'B'] | queens) & keep
+        if diagonal and bishop_attacks(square, occupied) & diagonal:
+            return True
+        straight = (bitboards[enemy + 'R'] | queens) & keep
+        if straight and rook_attacks(square, occupied) & straight:
+            return True
+        return False
+
+
+    def is_square_attacked(self, row, col, by_white):
+        occupied = self.occupancy['w'] | self.occupancy['b']
+        return self._is_attacked(row * 8 + col, 'w' if by_white else 'b', occupied)
+
+
+    def is_king_in_check(self, color):
+        occupied = self.occupancy['w'] | self.occupancy['b']
+        return self._is_attacked(self.bitboards[color + 'K'].bit_length() - 1, 'b' if color == 'w' else 'w', occupied)
+
+
+    # cheapest attacker of `color` on `square` among the pieces left in `occupied`, as
+    # (value, square); ties go the way Chess_State.find_least_valuable_attacker breaks them
+    def _least_valuable_attacker(self, square, color, occupied):
+        bitboards = self.bitboards
+        values = self.PIECE_VALUES
+        pawns = PAWN_ATTACKS['b' if color == 'w' else 'w'][square] & bitboards[color + 'P'] & occupied
+        if pawns:
+            return values['P'], (pawns & -pawns).bit_length() - 1
+        knights = KNIGHT_ATTACKS[square] & bitboards[color + 'N'] & occupied
+        if knights:
+            for origin, bit in KNIGHT_ORDER[square]:
+                if knights & bit:
+                    return values['N'], origin
+
+        board = self.board
+        best = None
+        for d, sliders in EXCHANGE_DIRECTIONS:
+            blockers = RAYS[d][square] & occupied
+            if not blockers:
+                continue
+            first = (blockers & -blockers).bit_length() - 1 if RAY_INCREASES[d] else blockers.bit_length() - 1
+            piece = board[first >> 3][first & 7]
+            if piece[0] == color and (piece[1] in sliders or (piece[1] == 'K' and KING_ATTACKS[square] >> first & 1)):
+                value = values[piece[1]]
+                if best is None or value < best[0]:
+                    best = (value, first)
+        return best
+
+
+    def find_least_valuable_attacker(self, row, col, color):
+        occupied = self.occupancy['w'] | self.occupancy['b']
+        best = self._least_valuable_attacker(row * 8 + col, color, occupied)
+        return None if best is None else (best[0],) + SQUARE_TO_POSITION[best[1]]
+
+
+    # Chess_State.static_exchange_evaluation with the exchanged pieces taken out of the occupancy
+    # instead of off the board
+    def static_exchange_evaluation(self, start_row, start_col, end_row, end_col):
+        board = self.board
+        attacker = board[start_row][start_col]
+        captured = board[end_row][end_col]
+        values = self.PIECE_VALUES
+        gain = values[captured[1]] if captured != '--' else 0
+        occupied = (self.occupancy['w'] | self.occupancy['b']) & ~SQUARE_BITS[start_row * 8 + start_col]
+        return gain - self._exchange_value(end_row * 8 + end_col, 'b' if attacker[0] == 'w' else 'w', occupied,
+                                           values[attacker[1]])
+
+
+    # best result for `color` of recapturing a piece worth `target_value` on the square
+    def _exchange_value(self, square, color, occupied, target_value):
+        lva = self._least_valuable_attacker(square, color, occupied)
+        if lva is None:
+            return 0
+        value, origin = lva
+        result = target_value - self._exchange_value(square, 'b' if color == 'w' else 'w', occupied & ~SQUARE_BITS[origin],
+                                                     value)
+        return max(0, result)
+
+
+    def get_all_pseudo_legal_captures(self, is_white_turn):
+        color = 'w' if is_white_turn else 'b'
+        enemy = self.occupancy['b' if is_white_turn else 'w']
+        captures = []
+        for square in iter_squares(self.occupancy[color]):
+            row, col = SQUARE_TO_POSITION[square]
+            piece = self.board[row][col]
+            targets = self._piece_targets(square, piece) & enemy
+            for target in self._ordered_targets(square, piece, targets):
+                captures.append((row, col) + SQUARE_TO_POSITION[target])
+        return captures
+
+
+    def generate_legal_moves(self, is_white_turn, captures_only=False, quiets_only=False):
+        color = 'w' if is_white_turn else 'b'
+        enemy = 'b' if is_white_turn else 'w'
+        board = self.board
+        bitboards = self.bitboards
+        own = self.occupancy[color]
+        them = self.occupancy[enemy]
+        occupied = own | them
+        # every target set is cut down to enemy pieces up front with captures_only, to empty squares
+        # with quiets_only, and to anything but the own pieces otherwise
+        if captures_only:
+            allowed = self.occupancy[enemy]
+        elif quiets_only:
+            allowed = ~occupied & FULL_BOARD
+        else:
+            allowed = ~own & FULL_BOARD
+        king_square = bitboards[color + 'K'].bit_length() - 1
+        checkers, check_mask, pins = self._checks_and_pins(king_square, color, enemy, occupied)
+        if checkers:
+            # in double check only the king can move
+            allowed_others = 0 if checkers & (checkers - 1) else allowed & check_mask
+        else:
+            allowed_others = allowed
+        all_moves_list = []
+
+        pieces = own
+        while pieces:
+            low = pieces & -pieces
+            pieces ^= low
+            square = low.bit_length() - 1
+            piece = board[square >> 3][square & 7]
+            piece_type = piece[1]
+            if piece_type == 'K':
+                # the king leaves its square, so sliders see through it
+                without_king = occupied ^ low
+                targets = KING_ATTACKS[square] & allowed
+                for bit, move in MOVE_ORDER[piece][square]:
+                    if targets & bit and not self._is_attacked(move[2] * 8 + move[3], enemy, without_king, bit):
+                        all_moves_list.append(move)
+                if not captures_only:
+                    castling = self._castling_targets(square, color)
+                    if castling:
+                        all_moves_list += [move for bit, move in MOVE_ORDER[piece][square] if castling & bit]
+                continue
+            if not allowed_others:
+                continue
+            if piece_type == 'P':
+                targets = PAWN_PUSHES[color][square] & ~occupied
+                if targets:
+                    targets |= PAWN_DOUBLE_PUSHES[color][square] & ~occupied
+                targets |= PAWN_ATTACKS[color][square] & them
+            elif piece_type == 'N':
+                targets = KNIGHT_ATTACKS[square]
+            elif piece_type == 'B':
+                targets = bishop_attacks(square, occupied)
+            elif piece_type == 'R':
+                targets = rook_attacks(square, occupied)
+            else:
+                targets = bishop_attacks(square, occupied) | rook_attacks(square, occupied)
+            targets &= allowed_others
+            if square in pins:
+                targets &= pins[square]
+            if targets:
+                all_moves_list += [move for bit, move in MOVE_ORDER[piece][square] if targets & bit]
+
+        return all_moves_list
@@ -0,0 +1,174 @@
+import argparse
+import mmap
+import random
+import struct
+import sys
+
+from .chess import Chess_State
+from .move import pack_move, unpack_move
+
+# Book file: an 8 byte magic, then fixed size records sorted by key (and move):
+# zobrist key (8 bytes), packed from/to squares (2 bytes), weight (2 bytes), big endian
+# bump the version when the zobrist keys change, books built with other keys are rejected
+BOOK_MAGIC = b'CEBOOK02'
+BOOK_RECORD = struct.Struct('>QHH')
+MAX_WEIGHT = 0xFFFF
+
+
+class Opening_Book:
+
+    def __init__(self, path, seed=None):
+        self.path = path
+        self.file = open(path, 'rb')
+        try:
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.file.close()
+            raise Exception(f"Invalid opening book '{path}': empty file")
+        if self.data[:6] == BOOK_MAGIC[:6] and self.data[:len(BOOK_MAGIC)] != BOOK_MAGIC:
+            self.close()
+            raise Exception(f"Opening book '{path}' was built with other position keys, rebuild it")
+        if self.data[:len(BOOK_MAGIC)] != BOOK_MAGIC or (len(self.data) - len(BOOK_MAGIC)) % BOOK_RECORD.size:
+            self.close()
+            raise Exception(f"Invalid opening book '{path}'")
+        self.count = (len(self.data) - len(BOOK_MAGIC)) // BOOK_RECORD.size
+        # used for the weighted choice, seed it for reproducible games
+        self.random = random.Random(seed)
+
+    def __len__(self):
+        return self.count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.data is not None:
+            self.data.close()
+            self.file.close()
+            self.data = None
+
+    def record(self, index):
+        return BOOK_RECORD.unpack_from(self.data, len(BOOK_MAGIC) + index * BOOK_RECORD.size)
+
+    # binary search for the first record with this key
+    def lower_bound(self, key):
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.record(middle)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    # [((start_row, start_col, end_row, end_col), weight), ...] stored for a zobrist key
+    def get_entries(self, key):
+        entries = []
+        index = self.lower_bound(key)
+        while index < self.count:
+            record_key, move, weight = self.record(index)
+            if record_key != key:
+                break
+            entries.append((unpack_move(move), weight))
+            index += 1
+        return entries
+
+    # book moves of the position that are legal in it (guards against key collisions)
+    def get_moves(self, state: Chess_State):
+        entries = self.get_entries(state.zobrist_hash)
+        if not entries:
+            return []
+        legal = set(state.get_all_valid_moves(state.white_to_move))
+        return [(move, weight) for move, weight in entries if move in legal and weight > 0]
+
+    # a book move picked with probability proportional to its weight, None when out of book
+    def choose_move(self, state: Chess_State):
+        moves = self.get_moves(state)
+        if not moves:
+            return None
+        pick = self.random.randrange(sum(weight for _, weight in moves))
+        for move, weight in moves:
+            if pick < weight:
+                return move
+            pick -= weight
+
+
+# Count how often each (position, move) occurs in the games. A game is a sequence of
+# algebraic moves ("e2e4 e7e5 ..." or a list of them) played from `start_fen` or the
+# starting position; only the first `max_ply` moves of a game are used.
+def collect_book_moves(games, max_ply=None, start_fen=None, backend=Chess_State):
+    counts = {}
+    for game_number, game in enumerate(games, start=1):
+        moves = game.split() if isinstance(game, str) else list(game)
+        state = backend()
+        if start_fen:
+            state.load_fen(start_fen)
+        for ply, notation in enumerate(moves[:max_ply] if max_ply else moves):
+            move = state.algebraic_to_index(notation)
+            if move not in state.get_all_valid_moves(state.white_to_move):
+                raise Exception(f"Illegal move '{notation}' at ply {ply + 1} of game {game_number}")
+            key = (state.zobrist_hash, pack_move(move))
+            counts[key] = counts.get(key, 0) + 1
+            state.make_move(*move)
+    return counts
+
+
+# write the counts as a sorted book file; weights above MAX_WEIGHT are scaled down
+def write_book(counts, path):
+    highest = max(counts.values(), default=0)
+    scale = MAX_WEIGHT / highest if highest > MAX_WEIGHT else 1
+    with open(path, 'wb') as f:
+        f.write(BOOK_MAGIC)
+        for (key, move), count in sorted(counts.items()):
+            f.write(BOOK_RECORD.pack(key, move, max(int(count * scale), 1)))
+    return len(counts)
+
+
+def build_book(games, path, max_ply=None, start_fen=None):
+    return write_book(collect_book_moves(games, max_ply, start_fen), path)
+
+
+# one game per line, blank lines and lines starting with # are skipped
+def read_games(lines):
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith('#'):
+            yield line
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or probe an opening book")
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help="build a book from a file of games, one move sequence per line")
+    build.add_argument('games')
+    build.add_argument('book')
+    build.add_argument('--max-ply', type=int, help="only use the first N moves of every game")
+    probe = commands.add_parser('probe', help="list the book moves of a position")
+    probe.add_argument('book')
+    probe.add_argument('--fen', help="position to probe, the starting position by default")
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        with open(args.games) as f:
+            entries = build_book(read_games(f), args.book, args.max_ply)
+        print(f"{entries} entries written to {args.book}")
+        return 0
+
+    state = Chess_State()
+    if args.fen:
+        state.load_fen(args.fen)
+    with Opening_Book(args.book) as book:
+        moves = book.get_moves(state)
+    total = sum(weight for _, weight in moves)
+    for move, weight in sorted(moves, key=lambda entry: -entry[1]):
+        print(f"{state.index_to_algebraic(*move)}: {weight} ({100.0 * weight / total:.1f}%)")
+    if not moves:
+        print("position not in book")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+import sqlite3
+import time
+
+from .move import pack_move, unpack_move
+
+# Bound flags as stored on disk, same meaning as the transposition table flags
+FLAG_CODES = {'EXACT': 0, 'LOWERBOUND': 1, 'UPPERBOUND': 2}
+CODE_FLAGS = {code: flag for flag, code in FLAG_CODES.items()}
+
+# bump when the meaning of stored keys or scores changes (zobrist keys, evaluation or score convention),
+# a cache written by another format is emptied when opened
+CACHE_FORMAT = 3
+
+NO_MOVE = -1
+
+# rows written between two counts of the table, as a fraction of max_entries
+COUNT_INTERVAL = 0.01
+
+
+# zobrist keys are unsigned 64 bit, SQLite integers are signed
+def to_signed(key):
+    return key - (1 << 64) if key >= (1 << 63) else key
+
+
+def to_unsigned(key):
+    return key + (1 << 64) if key < 0 else key
+
+
+class Analysis_Cache:
+    # Persistent {(zobrist key, side): (score, flag, depth, move)} store in SQLite.
+    # WAL mode lets any number of processes read while one writes; writers wait on
+    # each other through the busy timeout. Entries are kept depth-preferred: a write
+    # only replaces an entry searched at most as deep.
+
+    def __init__(self, path, max_entries=1000000, timeout=30.0):
+        self.path = path
+        self.max_entries = max_entries
+        self.connection = sqlite3.connect(path, timeout=timeout)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        with self.connection:
+            self.connection.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER)')
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS entries ('
+                'key INTEGER NOT NULL, white INTEGER NOT NULL, score REAL NOT NULL, flag INTEGER NOT NULL, '
+                'depth INTEGER NOT NULL, move INTEGER NOT NULL, used REAL NOT NULL, '
+                'PRIMARY KEY (key, white)) WITHOUT ROWID')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS entries_by_value ON entries (depth, used)')
+            row = self.connection.execute("SELECT value FROM meta WHERE name = 'format'").fetchone()
+            if row is None or row[0] != CACHE_FORMAT:
+                self.connection.execute('DELETE FROM entries')
+                self.connection.execute("INSERT OR REPLACE INTO meta VALUES ('format', ?)", (CACHE_FORMAT,))
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evicted = 0
+        # an upper bound of the row count: the last count plus every row written since (updates
+        # included, other processes not), so the table is only counted when it may be over the cap
+        self.row_estimate = len(self)
+        self.rows_since_count = 0
+        self.count_interval = max(int(max_entries * COUNT_INTERVAL), 1)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+
+    # (score, flag, depth, move tuple or None) in transposition table form, None on a miss
+    def get(self, key, is_white):
+        row = self.connection.execute('SELECT score, flag, depth, move FROM entries WHERE key = ? AND white = ?',
+                                      (to_signed(key), int(is_white))).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        score, flag, depth, move = row
+        return score, CODE_FLAGS[flag], depth, unpack_move(move) if move != NO_MOVE else None
+
+    # write {(key, is_white): (score, flag, depth, move)} entries in one transaction
+    def store_many(self, entries):
+        now = time.time()
+        rows = [(to_signed(key), int(is_white), score, FLAG_CODES[flag], depth,
+                 pack_move(move) if move is not None else NO_MOVE, now)
+                for (key, is_white), (score, flag, depth, move) in entries.items()]
+        if not rows:
+            return 0
+        with self.connection:
+            self.connection.executemany(
+                'INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT (key, white) DO UPDATE SET score = excluded.score, flag = excluded.flag, '
+                'depth = excluded.depth, move = excluded.move, used = excluded.used '
+                'WHERE excluded.depth >= entries.depth', rows)
+        self.writes += len(rows)
+        self.row_estimate += len(rows)
+        self.rows_since_count += len(rows)
+        self.evict()
+        return len(rows)
+
+    def put(self, key, is_white, score, flag, depth, move=None):
+        return self.store_many({(key, is_white): (score, flag, depth, move)})
+
+    # over max_entries, drop the shallowest and least recently written entries down to 90% of the cap.
+    # The table is counted (a full scan) at most once per count_interval rows written, and only once
+    # the estimate passes the cap; `force` counts it now, e.g. after other processes wrote to it.
+    def evict(self, force=False):
+        if not force and (self.row_estimate <= self.max_entries or self.rows_since_count < self.count_interval):
+            return 0
+        count = len(self)
+        self.row_estimate = count
+        self.rows_since_count = 0
+        if count <= self.max_entries:
+            return 0
+        excess = count - int(self.max_entries * 0.9)
+        with self.connection:
+            self.connection.execute(
+                'DELETE FROM entries WHERE (key, white) IN '
+                '(SELECT key, white FROM entries ORDER BY depth, used LIMIT ?)', (excess,))
+        self.row_estimate -= excess
+        self.evicted += excess
+        return excess
+
+    # the `limit` deepest (then most recent) entries as transposition table items
+    def load_hot_entries(self, limit):
+        rows = self.connection.execute('SELECT key, white, score, flag, depth, move FROM entries '
+                                       'ORDER BY depth DESC, used DESC LIMIT ?', (limit,))
+        return {(to_unsigned(key), bool(white)): (score, CODE_FLAGS[flag], depth,
+                                                   unpack_move(move) if move != NO_MOVE else None)
+                for key, white, score, flag, depth, move in rows}
+
+    def clear(self):
+        with self.connection:
+            self.connection.execute('DELETE FROM entries')
+        self.row_estimate = 0
+        self.rows_since_count = 0
+
+    def get_stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'writes': self.writes, 'evicted': self.evicted}
@@ -1,6 +1,130 @@
-import copy
 import random
-from .move import Move
+from .move import Move, PIECE_CODES, PIECE_TO_CODE
+
+# Zobrist keys come from a fixed seed, so a position has the same key in every process
+# and run; opening books and persistent caches are keyed by it
+ZOBRIST_SEED = 0x5A0B21C7
+_zobrist_random = random.Random(ZOBRIST_SEED)
+
+
+# signed per-square lookups for the incremental eval, white positive and black negative
+def _build_signed_values(piece_values):
+    values = {}
+    for piece_type, value in piece_values.items():
+        values['w' + piece_type] = value
+        values['b' + piece_type] = -value
+    values['--'] = 0
+    return values
+
+
+def _build_signed_pst(pst):
+    tables = {}
+    for piece_type, table in pst.items():
+        tables['w' + piece_type] = [list(row) for row in table]
+        # mirror the rows for black, same as get_positional_score
+        tables['b' + piece_type] = [[-value for value in table[7 - row]] for row in range(8)]
+    tables['--'] = [[0] * 8 for _ in range(8)]
+    return tables
+
+
+# zobrist key of every 4 bit castling mask, the xor of the keys of its rights
+def _build_castling_keys(keys, bits):
+    table = [0] * 16
+    for mask in range(16):
+        for color in bits:
+            for side, bit in bits[color].items():
+                if mask & bit:
+                    table[mask] ^= keys[color][side]
+    return table
+
+
+# Attack tables per square (square = row * 8 + col, a8 = 0), built once for is_square_attacked
+KING_STEPS = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
+KNIGHT_STEPS = ((2, 1), (2, -1), (1, 2), (1, -2), (-2, 1), (-2, -1), (-1, -2), (-1, 2))
+
+
+# the (row, col) squares one step away, for every square
+def _build_step_table(steps):
+    return tuple(tuple((row + dr, col + dc) for dr, dc in steps if 0 <= row + dr < 8 and 0 <= col + dc < 8)
+                 for row in range(8) for col in range(8))
+
+
+# every non-empty ray of a square as (is diagonal, squares from nearest to farthest)
+def _build_rays():
+    rays = []
+    for row in range(8):
+        for col in range(8):
+            square_rays = []
+            for dr, dc in KING_STEPS:
+                ray = []
+                r, c = row + dr, col + dc
+                while 0 <= r < 8 and 0 <= c < 8:
+                    ray.append((r, c))
+                    r += dr
+                    c += dc
+                if ray:
+                    square_rays.append((bool(dr and dc), tuple(ray)))
+            rays.append(tuple(square_rays))
+    return tuple(rays)
+
+
+KING_ATTACKS = _build_step_table(KING_STEPS)
+KNIGHT_ATTACKS = _build_step_table(KNIGHT_STEPS)
+# squares a pawn of the color attacks the square from: white pawns sit one row below (higher row)
+PAWN_ATTACKERS = {'w': _build_step_table(((1, -1), (1, 1))), 'b': _build_step_table(((-1, -1), (-1, 1)))}
+RAYS = _build_rays()
+# sliders of a color that attack along a ray, indexed by the ray's is-diagonal flag
+RAY_ATTACKERS = {color: (frozenset((color + 'R', color + 'Q')), frozenset((color + 'B', color + 'Q')))
+                 for color in 'wb'}
+
+
+# castling_rights[color][side] on top of the state's castling mask, reads and writes go to the mask
+class Castling_Side_Rights:
+    def __init__(self, state, color):
+        self.state = state
+        self.color = color
+
+    def __getitem__(self, side):
+        return bool(self.state.castling_mask & self.state.CASTLING_BITS[self.color][side])
+
+    def __setitem__(self, side, value):
+        bit = self.state.CASTLING_BITS[self.color][side]
+        if value:
+            self.state.castling_mask |= bit
+        else:
+            self.state.castling_mask &= ~bit
+
+    def to_dict(self):
+        return {side: self[side] for side in 'KQ'}
+
+    def __eq__(self, other):
+        return self.to_dict() == (other.to_dict() if isinstance(other, Castling_Side_Rights) else other)
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
+
+class Castling_Rights:
+    def __init__(self, state):
+        self.state = state
+
+    def __getitem__(self, color):
+        if color not in self.state.CASTLING_BITS:
+            raise KeyError(color)
+        return Castling_Side_Rights(self.state, color)
+
+    def items(self):
+        return [(color, self[color]) for color in 'wb']
+
+    def to_dict(self):
+        return {color: self[color].to_dict() for color in 'wb'}
+
+    def __eq__(self, other):
+        return self.to_dict() == (other.to_dict() if isinstance(other, Castling_Rights) else other)
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
 
 class Chess_State:
 
@@ -77,12 +201,48 @@ class Chess_State:
         ],
     }
 
+    SIGNED_PIECE_VALUES = _build_signed_values(PIECE_VALUES)
+    SIGNED_PST = _build_signed_pst(PST)
+
+    # weight of one extra move for the mobility term
+    MOBILITY_WEIGHT = 0.1
+    # 'pseudo' counts pseudo-legal destinations, 'legal' generates both legal move lists (slow)
+    MOBILITY_MODES = ('pseudo', 'legal')
+    # the per-position mobility cache is emptied once it holds this many entries
+    MOBILITY_CACHE_LIMIT = 200000
+
     # to induce zobrist hashing
-    ZOBRIST_TABLE = [[[random.getrandbits(64) for _ in range(12)] for _ in range(8)] for _ in range(8)]
+    ZOBRIST_TABLE = [[[_zobrist_random.getrandbits(64) for _ in range(12)] for _ in range(8)] for _ in range(8)]
     PIECE_TO_INDEX = {
         'P': 0, 'N': 1, 'B': 2, 'R': 3, 'Q': 4, 'K': 5,
         'p': 6, 'n': 7, 'b': 8, 'r': 9, 'q': 10, 'k': 11,
     }
+    # same indices keyed by board piece codes, so make_move skips the case conversion
+    BOARD_PIECE_TO_INDEX = {
+        'wP': 0, 'wN': 1, 'wB': 2, 'wR': 3, 'wQ': 4, 'wK': 5,
+        'bP': 6, 'bN': 7, 'bB': 8, 'bR': 9, 'bQ': 10, 'bK': 11,
+    }
+    # Binary snapshot: one byte per square (0 empty, 1-12 in BOARD_PIECE_TO_INDEX order)
+    # followed by one flags byte, 65 bytes in total
+    SNAPSHOT_PIECES = PIECE_CODES
+    SNAPSHOT_CODES = PIECE_TO_CODE
+    SNAPSHOT_SIZE = 65
+    # flag bits: side to move, the castling mask in bits 1-4, and who has castled already
+    SNAPSHOT_WHITE_TO_MOVE = 1
+    SNAPSHOT_CASTLING_SHIFT = 1
+    SNAPSHOT_CASTLED = {'w': 32, 'b': 64}
+
+    # xor-ed in while black is to move
+    ZOBRIST_BLACK_TO_MOVE = _zobrist_random.getrandbits(64)
+    # one key per castling right. Whether a side has castled already is left out: a FEN cannot
+    # tell, and the same position has to get the same key however it was set up (book, cache)
+    ZOBRIST_CASTLING = {color: {side: _zobrist_random.getrandbits(64) for side in 'KQ'} for color in 'wb'}
+
+    # castling rights as a 4 bit mask, so make/undo only copy an int
+    CASTLING_BITS = {'w': {'K': 1, 'Q': 2}, 'b': {'K': 4, 'Q': 8}}
+    CASTLING_COLOR_BITS = {'w': 3, 'b': 12}
+    ALL_CASTLING_RIGHTS = 15
+    ZOBRIST_CASTLING_BY_MASK = _build_castling_keys(ZOBRIST_CASTLING, CASTLING_BITS)
 
     
     def __init__(self):
@@ -97,11 +257,8 @@ class Chess_State:
             ['wR', 'wN', 'wB', 'wQ', 'wK', 'wB', 'wN', 'wR']
         ]
 
-        # track whether eligible for castling or not
-        self.castling_rights = {
-            'w': {'K': True, 'Q': True},
-            'b': {'K': True, 'Q': True}
-        }
+        # track whether eligible for castling or not (CASTLING_BITS, castling_rights is a view of it)
+        self.castling_mask = self.ALL_CASTLING_RIGHTS
 
         self.castled_dict ={
             'w':False,
@@ -111,6 +268,59 @@ class Chess_State:
         # track the moevment of king
         self.king_positions = {'w': (7, 4), 'b': (0, 4)}  # Starting positions
 
+        # flipped by every make_move/undo_move
+        self.white_to_move = True
+
+        # when set, every evaluation cross-checks the running totals against a full recompute
+        self.debug_eval = False
+
+        # how get_mobility_score counts moves, and an optional {zobrist_hash: score} cache
+        self.mobility_mode = 'pseudo'
+        self.mobility_cache = None
+
+        # running zobrist key and eval totals, updated in make_move/undo_move
+        self.sync_incremental_state()
+
+
+    # castling_rights['w']['K'] style access to the castling mask, assigning a dict sets the mask
+    @property
+    def castling_rights(self):
+        return Castling_Rights(self)
+
+    @castling_rights.setter
+    def castling_rights(self, rights):
+        mask = 0
+        for color, bits in self.CASTLING_BITS.items():
+            for side, bit in bits.items():
+                if rights[color][side]:
+                    mask |= bit
+        self.castling_mask = mask
+
+
+    # recompute everything make_move/undo_move maintain incrementally,
+    # call after editing `board`, `castling_rights` or `castled_dict` by hand
+    # (one pass over the board; compute_* stay the separate reference scans for debug_eval)
+    def sync_incremental_state(self):
+        piece_index = self.BOARD_PIECE_TO_INDEX
+        values = self.SIGNED_PIECE_VALUES
+        pst = self.SIGNED_PST
+        zobrist = self.ZOBRIST_TABLE
+        hash_value = 0
+        material = 0
+        positional = 0
+        for row, board_row in enumerate(self.board):
+            for col, piece in enumerate(board_row):
+                if piece != '--':
+                    hash_value ^= zobrist[row][col][piece_index[piece]]
+                    material += values[piece]
+                    positional += pst[piece][row][col]
+
+        if not self.white_to_move:
+            hash_value ^= self.ZOBRIST_BLACK_TO_MOVE
+        hash_value ^= self.ZOBRIST_CASTLING_BY_MASK[self.castling_mask]
+        self.zobrist_hash = hash_value
+        self.material_score = material
+        self.positional_score = positional
 
 
 
@@ -139,6 +349,24 @@ class Chess_State:
     # TODO: improve board evaluation logic (eg position in center, piece development etc)
 
     def get_material_score(self):
+        if self.debug_eval:
+            self.check_incremental_eval()
+        return self.material_score
+
+    def get_positional_score(self):
+        if self.debug_eval:
+            self.check_incremental_eval()
+        return self.positional_score
+
+    # raise if the running totals drifted away from a full board scan
+    def check_incremental_eval(self):
+        material = self.compute_material_score()
+        positional = self.compute_positional_score()
+        if material != self.material_score or positional != self.positional_score:
+            raise Exception(f"Incremental eval mismatch: material {self.material_score} != {material} "
+                            f"or positional {self.positional_score} != {positional}")
+
+    def compute_material_score(self):
         score = 0
         for row in range(8):
             for col in range(8):
@@ -154,7 +382,7 @@ class Chess_State:
                 score += piece_value  if color == 'w' else - piece_value
         return score
     
-    def get_positional_score(self):
+    def compute_positional_score(self):
         score = 0
         for row in range(8):
             for col in range(8):
@@ -173,18 +401,66 @@ class Chess_State:
         return score
     
     def get_mobility_score(self):
-        score = 0
+        cache = self.mobility_cache
+        if cache is not None:
+            score = cache.get(self.zobrist_hash)
+            if score is not None:
+                return score
+
         # more no of available moves means more advantage
-        white_moves_count = self.get_all_valid_moves(True)
-        black_moves_count = self.get_all_valid_moves(False)
-        score += 0.1 * (len(white_moves_count) - len(black_moves_count))
+        if self.mobility_mode == 'legal':
+            white_moves_count = len(self.get_all_valid_moves(True))
+            black_moves_count = len(self.get_all_valid_moves(False))
+        elif self.mobility_mode == 'pseudo':
+            white_moves_count, black_moves_count = self.count_pseudo_mobility()
+        else:
+            raise Exception(f"Unknown mobility mode '{self.mobility_mode}', expected one of {self.MOBILITY_MODES}")
+        score = self.MOBILITY_WEIGHT * (white_moves_count - black_moves_count)
+
+        if cache is not None:
+            if len(cache) >= self.MOBILITY_CACHE_LIMIT:
+                cache.clear()
+            cache[self.zobrist_hash] = score
         return score
+
+    # turn on caching of the mobility term per position (zobrist key)
+    def enable_mobility_cache(self):
+        self.mobility_cache = {}
+
+    # pickling (e.g. to send a position to a search process) leaves the mobility cache
+    # and the methods wrapped by a search profiler behind
+    def __getstate__(self):
+        data = self.__dict__.copy()
+        if data.get('mobility_cache') is not None:
+            data['mobility_cache'] = {}
+        for name in data.pop('_profiled', ()):
+            del data[name]
+        return data
+
+    # (white, black) count of pseudo-legal destinations, castling left out;
+    # one pass over the board and no make/undo or check detection
+    def count_pseudo_mobility(self):
+        counts = {'w': 0, 'b': 0}
+        board = self.board
+        for row in range(8):
+            for col in range(8):
+                piece = board[row][col]
+                if piece == '--':
+                    continue
+                if piece[1] == 'K':
+                    for dr, dc in KING_STEPS:
+                        r, c = row + dr, col + dc
+                        if 0 <= r < 8 and 0 <= c < 8 and board[r][c][0] != piece[0]:
+                            counts[piece[0]] += 1
+                else:
+                    counts[piece[0]] += len(self.get_piece_moveable_positions(row, col))
+        return counts['w'], counts['b']
     
     def get_castling_bonus(self):
         score = 0
         # add castling bonus
         for color in ['w', 'b']:
-            if self.castling_rights[color]['K'] or self.castling_rights[color]['Q']:
+            if self.castling_mask & self.CASTLING_COLOR_BITS[color]:
                 score += 10 if color == 'w' else -10
             if self.castled_dict.get(color, False):
                 score += 30 if color == 'w' else -30
@@ -198,7 +474,7 @@ class Chess_State:
         castled = False
         moving_piece = self.board[start_row][start_col]
         captured_piece = self.board[end_row][end_col]
-        prev_rights = copy.deepcopy(self.castling_rights)
+        prev_rights = self.castling_mask
 
         # actual motion
         self.board[end_row][end_col] = moving_piece
@@ -214,16 +490,15 @@ class Chess_State:
         
         # restrict castling if king moved
         if moving_piece[1] == 'K':
-            self.castling_rights[moving_piece[0]]['K'] = False
-            self.castling_rights[moving_piece[0]]['Q'] = False
+            self.castling_mask &= ~self.CASTLING_COLOR_BITS[moving_piece[0]]
             # track the king motion
             self.king_positions[moving_piece[0]] = (end_row, end_col)
         # restrict casting to one side if that side rook moved
         if moving_piece[1] == 'R':
             if start_col == 0: # queen side a-file
-                self.castling_rights[moving_piece[0]]['Q'] = False
+                self.castling_mask &= ~self.CASTLING_BITS[moving_piece[0]]['Q']
             if start_col == 7: # king side h-file
-                self.castling_rights[moving_piece[0]]['K'] = False
+                self.castling_mask &= ~self.CASTLING_BITS[moving_piece[0]]['K']
         
 
         # TODO: uncomment when you imp restrict castling when pieces are between king and rook
@@ -241,11 +516,49 @@ class Chess_State:
                 self.board[end_row][0] = '--'
                 castled = True
 
-        return Move(start_row, start_col, end_row, end_col, moving_piece, captured_piece, checked, promoted, captured, castled, prev_rights)
+        # zobrist delta of this move, undo_move xors the same value back out
+        table = self.ZOBRIST_TABLE
+        index = self.BOARD_PIECE_TO_INDEX
+        hash_delta = self.ZOBRIST_BLACK_TO_MOVE
+        hash_delta ^= table[start_row][start_col][index[moving_piece]]
+        hash_delta ^= table[end_row][end_col][index[self.board[end_row][end_col]]]
+        if captured:
+            hash_delta ^= table[end_row][end_col][index[captured_piece]]
+        if castled:
+            rook_col, rook_end_col = (7, 5) if end_col == 6 else (0, 3)
+            rook = self.board[end_row][rook_end_col]
+            if rook != '--':
+                hash_delta ^= table[end_row][rook_col][index[rook]] ^ table[end_row][rook_end_col][index[rook]]
+        hash_delta ^= self.ZOBRIST_CASTLING_BY_MASK[prev_rights ^ self.castling_mask]
+        self.zobrist_hash ^= hash_delta
+        self.white_to_move = not self.white_to_move
+
+        # material and PST deltas, same idea: undo_move subtracts them again
+        pst = self.SIGNED_PST
+        end_piece = self.board[end_row][end_col]
+        positional_delta = pst[end_piece][end_row][end_col] - pst[moving_piece][start_row][start_col]
+        material_delta = 0
+        if captured:
+            positional_delta -= pst[captured_piece][end_row][end_col]
+            material_delta -= self.SIGNED_PIECE_VALUES[captured_piece]
+        if promoted:
+            material_delta += self.SIGNED_PIECE_VALUES[end_piece] - self.SIGNED_PIECE_VALUES[moving_piece]
+        if castled:
+            rook = self.board[end_row][rook_end_col]
+            positional_delta += pst[rook][end_row][rook_end_col] - pst[rook][end_row][rook_col]
+        self.material_score += material_delta
+        self.positional_score += positional_delta
+
+        return Move(start_row, start_col, end_row, end_col, moving_piece, captured_piece, checked, promoted, captured, castled, prev_rights,
+                    hash_delta, material_delta, positional_delta)
     
 
     def undo_move(self, move: Move):
-        self.castling_rights = move.prevCastlingRight
+        self.castling_mask = move.prevCastlingRight
+        self.zobrist_hash ^= move.hashDelta
+        self.white_to_move = not self.white_to_move
+        self.material_score -= move.materialDelta
+        self.positional_score -= move.positionalDelta
         if move.isPromoted:
             # undo the pawn promotion
             self.board[move.start_row][move.start_col] = move.moved_piece
@@ -271,6 +584,25 @@ class Chess_State:
                         self.board[move.end_row][3] = "--"
 
 
+    # pass the move to the other side (null-move pruning); the board does not change
+    def make_null_move(self):
+        self.white_to_move = not self.white_to_move
+        self.zobrist_hash ^= self.ZOBRIST_BLACK_TO_MOVE
+
+
+    def undo_null_move(self):
+        self.make_null_move()
+
+
+    # any knight, bishop, rook or queen left; without them a null move is unsafe (zugzwang)
+    def has_non_pawn_material(self, color):
+        for row in self.board:
+            for piece in row:
+                if piece[0] == color and piece[1] in 'NBRQ':
+                    return True
+        return False
+
+
     def get_all_pseudo_legal_captures(self, is_white_turn):
         color = 'w' if is_white_turn else 'b'
         captures = []
@@ -283,28 +615,248 @@ class Chess_State:
                             captures.append((r, c, tr, tc))
         return captures
 
+    # legal moves without make/undo: checkers and pinned pieces are found once,
+    # then every piece only keeps the targets that resolve the check and stay on its pin line
     def get_all_valid_moves(self, is_white_turn, verbose=False):
+        all_moves_list = self.generate_legal_moves(is_white_turn)
+        if verbose: # for debuggging purpose only
+            print(f"Total moves for {'White' if is_white_turn else 'Black'}: {len(all_moves_list)}")
+        return all_moves_list
+
+
+    # legal captures only, for quiescence search
+    def get_all_valid_captures(self, is_white_turn):
+        return self.generate_legal_moves(is_white_turn, captures_only=True)
+
+
+    # legal moves to empty squares (castling included), the last stage of the staged search ordering
+    def get_all_valid_quiets(self, is_white_turn):
+        return self.generate_legal_moves(is_white_turn, quiets_only=True)
+
+
+    # legal pawn pushes to the last row; promotions that capture are among the captures
+    def get_all_valid_promotions(self, is_white_turn):
+        color = 'w' if is_white_turn else 'b'
+        row, end_row = (1, 0) if is_white_turn else (6, 7)
+        board = self.board
+        return [(row, col, end_row, col) for col in range(8)
+                if board[row][col] == color + 'P' and board[end_row][col] == '--'
+                and self.is_legal_move((row, col, end_row, col), is_white_turn)]
+
+
+    # is a move that comes from elsewhere (hash or killer move) legal here, without generating
+    # the whole list: a target of the piece that does not leave the own king in check
+    def is_legal_move(self, move, is_white_turn):
+        start_row, start_col, end_row, end_col = move
+        color = 'w' if is_white_turn else 'b'
+        if self.board[start_row][start_col][0] != color:
+            return False
+        if (end_row, end_col) not in self.get_piece_moveable_positions(start_row, start_col):
+            return False
+        move_obj = self.make_move(start_row, start_col, end_row, end_col)
+        legal = not self.is_king_in_check(color)
+        self.undo_move(move_obj)
+        return legal
+
+
+    def generate_legal_moves(self, is_white_turn, captures_only=False, quiets_only=False):
         player_color = 'w' if is_white_turn else 'b'
+        enemy_color = 'b' if is_white_turn else 'w'
         all_moves_list = [] # list element is tupe of format (start_row, start_col, end_row, end_col)
+        board = self.board
+        king_row, king_col = self.king_positions[player_color]
+        checkers, check_squares, pins = self.find_checks_and_pins(player_color)
 
-        for row_num, row in enumerate(self.board):
+        for row_num, row in enumerate(board):
             for col_num, piece in enumerate(row):
                 # eval. moves for one color only whichever having its turn at current
                 # Also filters out the empty sqaures
+                if piece[0] != player_color:
+                    continue
+                if piece[1] == 'K':
+                    if captures_only:
+                        targets = [(row_num + dr, col_num + dc) for dr, dc in KING_STEPS
+                                   if 0 <= row_num + dr < 8 and 0 <= col_num + dc < 8
+                                   and board[row_num + dr][col_num + dc][0] == enemy_color]
+                    else:
+                        targets = self.generate_king_moves(row_num, col_num)
+                        if quiets_only:
+                            targets = [(r, c) for r, c in targets if board[r][c] == '--']
+                    # castling is already checked for attacks inside generate_king_moves
+                    for (end_row, end_col) in targets:
+                        if abs(end_col - col_num) == 2 or self.is_king_step_safe(row_num, col_num, end_row, end_col):
+                            all_moves_list.append((row_num, col_num, end_row, end_col))
+                    continue
+                # in double check only the king can move
+                if checkers > 1:
+                    continue
+                pin_direction = pins.get((row_num, col_num))
+                for (end_row, end_col) in self.get_piece_moveable_positions(row_num, col_num):
+                    if captures_only and board[end_row][end_col] == '--':
+                        continue
+                    if quiets_only and board[end_row][end_col] != '--':
+                        continue
+                    if checkers and (end_row, end_col) not in check_squares:
+                        continue
+                    if pin_direction is not None and self.direction_between(king_row, king_col, end_row, end_col) != pin_direction:
+                        continue
+                    all_moves_list.append((row_num, col_num, end_row, end_col))
+
+        return all_moves_list
+
+
+    # reference generator: plays every pseudo-legal move and tests for check,
+    # kept to cross-check the fast generator (e.g. from perft)
+    def get_all_valid_moves_by_make_undo(self, is_white_turn):
+        player_color = 'w' if is_white_turn else 'b'
+        all_moves_list = []
+        for row_num, row in enumerate(self.board):
+            for col_num, piece in enumerate(row):
                 if piece[0] == player_color:
-                    # list of tuples contaiing end_row and end_col (the available next positions)
-                    available_positions_to_move = self.get_piece_moveable_positions(row_num, col_num)
-                    for (end_row, end_col) in available_positions_to_move:
-                        # check if the move left the king cheked
+                    for (end_row, end_col) in self.get_piece_moveable_positions(row_num, col_num):
                         move_obj = self.make_move(row_num, col_num, end_row, end_col)
                         if not self.is_king_in_check(player_color):
-                            all_moves_list.append((row_num,col_num,end_row,end_col))
+                            all_moves_list.append((row_num, col_num, end_row, end_col))
                         self.undo_move(move_obj)
-
-        if verbose: # for debuggging purpose only
-            print(f"Total moves for {'White' if is_white_turn else 'Black'}: {len(all_moves_list)}")
         return all_moves_list
-    
+
+
+    # returns (number of checkers, squares that capture or block a single check, {pinned square: direction from king})
+    def find_checks_and_pins(self, color):
+        board = self.board
+        enemy = 'b' if color == 'w' else 'w'
+        king_row, king_col = self.king_positions[color]
+        checkers = 0
+        check_squares = set()
+        pins = {}
+
+        for dr, dc in KING_STEPS:
+            # rooks and queens pin/check along lines, bishops and queens along diagonals
+            sliders = 'BQ' if dr and dc else 'RQ'
+            blocker = None
+            between = []
+            r, c = king_row + dr, king_col + dc
+            while 0 <= r < 8 and 0 <= c < 8:
+                square = board[r][c]
+                if square == '--':
+                    between.append((r, c))
+                elif square[0] == color:
+                    if blocker is not None:
+                        break
+                    blocker = (r, c)
+                else:
+                    if square[1] in sliders:
+                        if blocker is None:
+                            checkers += 1
+                            check_squares.update(between)
+                            check_squares.add((r, c))
+                        else:
+                            pins[blocker] = (dr, dc)
+                    break
+                r += dr
+                c += dc
+
+        for dr, dc in KNIGHT_STEPS:
+            r, c = king_row + dr, king_col + dc
+            if 0 <= r < 8 and 0 <= c < 8 and board[r][c] == enemy + 'N':
+                checkers += 1
+                check_squares.add((r, c))
+
+        # enemy pawns attack the king from the row in front of it
+        pawn_row = king_row - 1 if color == 'w' else king_row + 1
+        if 0 <= pawn_row < 8:
+            for c in (king_col - 1, king_col + 1):
+                if 0 <= c < 8 and board[pawn_row][c] == enemy + 'P':
+                    checkers += 1
+                    check_squares.add((pawn_row, c))
+
+        return checkers, check_squares, pins
+
+
+    # unit step from one square towards another, None if they share no line
+    def direction_between(self, from_row, from_col, to_row, to_col):
+        dr, dc = to_row - from_row, to_col - from_col
+        if dr and dc and abs(dr) != abs(dc):
+            return None
+        if not dr and not dc:
+            return None
+        return ((dr > 0) - (dr < 0), (dc > 0) - (dc < 0))
+
+
+    # cheapest piece of `color` attacking the square as (value, row, col), None if there is none
+    def find_least_valuable_attacker(self, row, col, color):
+        board = self.board
+        # pawns of `color` attack from the row behind the square, seen from their side
+        pawn_row = row + 1 if color == 'w' else row - 1
+        if 0 <= pawn_row < 8:
+            for c in (col - 1, col + 1):
+                if 0 <= c < 8 and board[pawn_row][c] == color + 'P':
+                    return self.PIECE_VALUES['P'], pawn_row, c
+        for dr, dc in KNIGHT_STEPS:
+            r, c = row + dr, col + dc
+            if 0 <= r < 8 and 0 <= c < 8 and board[r][c] == color + 'N':
+                return self.PIECE_VALUES['N'], r, c
+
+        best = None
+        for dr, dc in KING_STEPS:
+            sliders = 'BQ' if dr and dc else 'RQ'
+            r, c = row + dr, col + dc
+            distance = 1
+            while 0 <= r < 8 and 0 <= c < 8:
+                square = board[r][c]
+                if square != '--':
+                    if square[0] == color and (square[1] in sliders or (square[1] == 'K' and distance == 1)):
+                        value = self.PIECE_VALUES[square[1]]
+                        if best is None or value < best[0]:
+                            best = (value, r, c)
+                    break
+                r += dr
+                c += dc
+                distance += 1
+        return best
+
+
+    # static exchange evaluation: material the side making this capture wins
+    # (in PIECE_VALUES units) if both sides keep recapturing on the target square
+    # with their cheapest attacker; pieces are lifted off the board so x-rays count
+    def static_exchange_evaluation(self, start_row, start_col, end_row, end_col):
+        board = self.board
+        attacker = board[start_row][start_col]
+        captured = board[end_row][end_col]
+        gain = self.PIECE_VALUES[captured[1]] if captured != '--' else 0
+
+        board[end_row][end_col] = attacker
+        board[start_row][start_col] = '--'
+        gain -= self._exchange_value(end_row, end_col, 'b' if attacker[0] == 'w' else 'w')
+        board[start_row][start_col] = attacker
+        board[end_row][end_col] = captured
+        return gain
+
+
+    # best result for `color` of recapturing on the square, 0 when it is better to stop
+    def _exchange_value(self, row, col, color):
+        lva = self.find_least_valuable_attacker(row, col, color)
+        if lva is None:
+            return 0
+        _, r, c = lva
+        board = self.board
+        attacker, target = board[r][c], board[row][col]
+        board[row][col] = attacker
+        board[r][c] = '--'
+        value = self.PIECE_VALUES[target[1]] - self._exchange_value(row, col, 'b' if color == 'w' else 'w')
+        board[r][c] = attacker
+        board[row][col] = target
+        return max(0, value)
+
+
+    # would the king be safe on the target square (the king itself no longer blocks sliders)
+    def is_king_step_safe(self, row, col, end_row, end_col):
+        king = self.board[row][col]
+        self.board[row][col] = '--'
+        safe = not self.is_square_attacked(end_row, end_col, by_white=(king[0] == 'b'))
+        self.board[row][col] = king
+        return safe
+
 
     # returns ordered moves with valuable captures as priority
     # this improves alpha beta pruning
@@ -443,13 +995,21 @@ class Chess_State:
                 if self.board[new_row][new_col] == '--' or self.board[new_row][new_col][0] != color:
                     available_moves.append((new_row, new_col))
 
-        # append castling moves too
-        if self.castling_rights[color]['K'] == True: # KING SIDE
-            if self.board[row][5] == "--" and self.board[row][6] == "--":
-                available_moves.append((row, 6))
-        if self.castling_rights[color]['Q'] == True: # QUEEN SIDE
-            if self.board[row][1] == "--" and self.board[row][2] == "--" and self.board[row][3] == "--":
-                available_moves.append((row, 2))
+        # append castling moves too: the rook must still be there, and the king
+        # may not castle out of, through or into check
+        by_white = color == 'b'
+        rights = self.castling_mask
+        bits = self.CASTLING_BITS[color]
+        if rights & self.CASTLING_COLOR_BITS[color]:
+            if not self.is_square_attacked(row, col, by_white):
+                if rights & bits['K'] and self.board[row][7] == color + 'R': # KING SIDE
+                    if self.board[row][5] == "--" and self.board[row][6] == "--":
+                        if not self.is_square_attacked(row, 5, by_white) and not self.is_square_attacked(row, 6, by_white):
+                            available_moves.append((row, 6))
+                if rights & bits['Q'] and self.board[row][0] == color + 'R': # QUEEN SIDE
+                    if self.board[row][1] == "--" and self.board[row][2] == "--" and self.board[row][3] == "--":
+                        if not self.is_square_attacked(row, 3, by_white) and not self.is_square_attacked(row, 2, by_white):
+                            available_moves.append((row, 2))
 
         return available_moves
 
@@ -477,6 +1037,132 @@ class Chess_State:
         return available_moves
 
 
+    # set up the position from a FEN string; en passant and the move clocks
+    # are accepted but ignored, the engine does not track them
+    def load_fen(self, fen):
+        fields = fen.split()
+        if len(fields) < 2:
+            raise Exception(f"Invalid FEN '{fen}'")
+        ranks = fields[0].split('/')
+        if len(ranks) != 8:
+            raise Exception(f"Invalid FEN '{fen}': expected 8 ranks")
+
+        board = []
+        king_positions = {}
+        for row, rank in enumerate(ranks):
+            board_row = []
+            for char in rank:
+                if char.isdigit():
+                    board_row.extend(['--'] * int(char))
+                elif char.upper() in self.PIECE_VALUES:
+                    color = 'w' if char.isupper() else 'b'
+                    board_row.append(color + char.upper())
+                    if char.upper() == 'K':
+                        king_positions[color] = (row, len(board_row) - 1)
+                else:
+                    raise Exception(f"Invalid FEN '{fen}': unknown piece '{char}'")
+            if len(board_row) != 8:
+                raise Exception(f"Invalid FEN '{fen}': rank {8 - row} does not have 8 squares")
+            board.append(board_row)
+        if set(king_positions) != {'w', 'b'}:
+            raise Exception(f"Invalid FEN '{fen}': both kings are required")
+
+        if fields[1] not in ('w', 'b'):
+            raise Exception(f"Invalid FEN '{fen}': side to move must be 'w' or 'b'")
+        castling = fields[2] if len(fields) > 2 else '-'
+
+        self.board = board
+        self.king_positions = king_positions
+        self.white_to_move = fields[1] == 'w'
+        self.castling_rights = {
+            'w': {'K': 'K' in castling, 'Q': 'Q' in castling},
+            'b': {'K': 'k' in castling, 'Q': 'q' in castling}
+        }
+        self.castled_dict = {'w': False, 'b': False}
+        self.sync_incremental_state()
+
+
+    # FEN of the position; no en passant square and fresh move clocks, the engine keeps neither
+    def to_fen(self):
+        ranks = []
+        for row in self.board:
+            rank = ''
+            empty = 0
+            for piece in row:
+                if piece == '--':
+                    empty += 1
+                    continue
+                if empty:
+                    rank += str(empty)
+                    empty = 0
+                rank += piece[1] if piece[0] == 'w' else piece[1].lower()
+            if empty:
+                rank += str(empty)
+            ranks.append(rank)
+
+        castling = ''
+        for color, side in (('w', 'K'), ('w', 'Q'), ('b', 'K'), ('b', 'Q')):
+            if self.castling_rights[color][side]:
+                castling += side if color == 'w' else side.lower()
+        return f"{'/'.join(ranks)} {'w' if self.white_to_move else 'b'} {castling or '-'} - 0 1"
+
+
+    # 65 byte snapshot of the position, see SNAPSHOT_PIECES for the layout
+    def to_snapshot(self):
+        codes = self.SNAPSHOT_CODES
+        flags = self.SNAPSHOT_WHITE_TO_MOVE if self.white_to_move else 0
+        flags |= self.castling_mask << self.SNAPSHOT_CASTLING_SHIFT
+        for color, bit in self.SNAPSHOT_CASTLED.items():
+            if self.castled_dict[color]:
+                flags |= bit
+        return bytes([codes[piece] for row in self.board for piece in row] + [flags])
+
+
+    # restore a position from to_snapshot(); the board reuses the piece strings of SNAPSHOT_PIECES
+    def load_snapshot(self, data):
+        if len(data) != self.SNAPSHOT_SIZE:
+            raise Exception(f"Invalid snapshot: expected {self.SNAPSHOT_SIZE} bytes, got {len(data)}")
+        pieces = self.SNAPSHOT_PIECES
+        try:
+            board = [[pieces[code] for code in data[start:start + 8]] for start in range(0, 64, 8)]
+            white_king = data.index(self.SNAPSHOT_CODES['wK'], 0, 64)
+            black_king = data.index(self.SNAPSHOT_CODES['bK'], 0, 64)
+        except (IndexError, ValueError):
+            raise Exception("Invalid snapshot: unknown piece code or missing king")
+
+        flags = data[64]
+        self.board = board
+        self.king_positions = {'w': divmod(white_king, 8), 'b': divmod(black_king, 8)}
+        self.white_to_move = bool(flags & self.SNAPSHOT_WHITE_TO_MOVE)
+        self.castling_mask = (flags >> self.SNAPSHOT_CASTLING_SHIFT) & self.ALL_CASTLING_RIGHTS
+        self.castled_dict = {color: bool(flags & bit) for color, bit in self.SNAPSHOT_CASTLED.items()}
+        self.sync_incremental_state()
+
+
+    @classmethod
+    def from_fen(cls, fen):
+        state = cls()
+        state.load_fen(fen)
+        return state
+
+
+    @classmethod
+    def from_snapshot(cls, data):
+        state = cls()
+        state.load_snapshot(data)
+        return state
+
+
+    # independent copy of the position, much cheaper than copy.deepcopy
+    def clone(self):
+        other = self.__class__.__new__(self.__class__)
+        other.__dict__.update(self.__getstate__())
+        other.board = [row[:] for row in self.board]
+        other.castled_dict = self.castled_dict.copy()
+        other.king_positions = self.king_positions.copy()
+        return other
+
+
     # convert human friendly move-denotion to machine friendly
     def algebraic_to_index(self, move_str):
         # (e2e4) --> ((6,4), (4,4))
@@ -503,6 +1189,7 @@ class Chess_State:
         return self.is_square_attacked(king_row, king_col, by_white=(color == 'b'))
 
     
+    # full recompute, make_move/undo_move keep `zobrist_hash` up to date incrementally
     def compute_zobrist_hash(self):
         hash_value = 0
         for row in range(8):
@@ -512,52 +1199,43 @@ class Chess_State:
                     piece_char = piece[1].upper() if piece[0] == 'w' else piece[1].lower()
                     idx = self.PIECE_TO_INDEX[piece_char]
                     hash_value ^= self.ZOBRIST_TABLE[row][col][idx]
+        if not self.white_to_move:
+            hash_value ^= self.ZOBRIST_BLACK_TO_MOVE
+        for color in ['w', 'b']:
+            for side in ['K', 'Q']:
+                if self.castling_rights[color][side]:
+                    hash_value ^= self.ZOBRIST_CASTLING[color][side]
         return hash_value
 
     # check if the current square is under attack by any piece
     def is_square_attacked(self, row, col, by_white):
-        enemy_color = 'w' if by_white else 'b'
-        directions = [(-1, -1), (-1, 1), (1, -1), (1, 1), (1, 0), (0, -1), (1, 1), (0, 1)]  # All directions
-
-        # Check for pawn attacks
-        pawn_dir = -1 if by_white else 1
-        for dc in [-1, 1]:
-            r, c = row + pawn_dir, col + dc
-            if 0 <= r < 8 and 0 <= c < 8:
-                if self.board[r][c] == enemy_color + 'P':
-                    return True
-
-        # Check for knight attacks
-        knight_moves = [(-2, -1), (-1, -2), (-2, 1), (-1, 2), (1, -2), (2, -1), (2, 1), (1, 2)]
-        for dr, dc in knight_moves:
-            r, c = row + dr, col + dc
-            if 0 <= r < 8 and 0 <= c < 8:
-                if self.board[r][c] == enemy_color + 'N':
-                    return True
-
-        # Check for sliding piece attacks (bishops, rooks, queens)
-        sliding_dirs = {
-            'B': [(-1, -1), (-1, 1), (1, -1), (1, 1)],
-            'R': [(-1, 0), (1, 0), (0, -1), (0, 1)],
-            'Q': [(-1, -1), (-1, 1), (1, -1), (1, 1), (-1, 0), (1, 0), (0, -1), (0, 1)]
-        }
-        for piece, dirs in sliding_dirs.items():
-            for dr, dc in dirs:
-                r, c = row + dr, col + dc
-                while 0 <= r < 8 and 0 <= c < 8:
-                    square = self.board[r][c]
-                    if square != '--':
-                        if square[0] == enemy_color and square[1] in piece:
-                            return True
-                        break
-                    r += dr
-                    c += dc
-
-        # Check for king attack
-        for dr, dc in directions:
-            r, c = row + dr, col + dc
-            if 0 <= r < 8 and 0 <= c < 8:
-                if self.board[r][c] == enemy_color + 'K':
-                    return True
+        board = self.board
+        enemy = 'w' if by_white else 'b'
+        square = row * 8 + col
+
+        pawn = enemy + 'P'
+        for r, c in PAWN_ATTACKERS[enemy][square]:
+            if board[r][c] == pawn:
+                return True
+
+        knight = enemy + 'N'
+        for r, c in KNIGHT_ATTACKS[square]:
+            if board[r][c] == knight:
+                return True
+
+        king = enemy + 'K'
+        for r, c in KING_ATTACKS[square]:
+            if board[r][c] == king:
+                return True
+
+        # every direction once: the first piece on the ray decides it
+        attackers = RAY_ATTACKERS[enemy]
+        for diagonal, ray in RAYS[square]:
+            for r, c in ray:
+                piece = board[r][c]
+                if piece != '--':
+                    if piece in attackers[diagonal]:
+                        return True
+                    break
 
         return False
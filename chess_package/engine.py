@@ -1,16 +1,241 @@
+import multiprocessing
 import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from .chess import Chess_State
+from .tt import Transposition_Table
+
+
+class Search_Aborted(Exception):
+    # Raised inside the search once the time or node budget is used up
+    pass
+
 
 class Engine:
 
-    def __init__(self):
+    # Scores are negamax style, from the side to move. A mate found `ply` plies from the root
+    # scores MATE_SCORE - ply, anything beyond MATE_BOUND is a mate score; the full window
+    # is finite so null windows around it stay valid
+    MATE_SCORE = 100000
+    MATE_BOUND = MATE_SCORE - 1000
+    INFINITE_SCORE = 1000000
+
+    # Slack on top of the captured piece's value before delta pruning drops a capture,
+    # covers the positional terms a capture can swing (in PIECE_VALUES units)
+    DELTA_MARGIN = 2
+
+    # Time/node budget is checked every this many nodes (main search and quiescence)
+    ABORT_CHECK_INTERVAL = 64
+    # seconds between limit checks while a split node waits for its search processes
+    POOL_POLL_INTERVAL = 0.01
+    # only PV nodes with at least this much depth left are split (the root included): the moves of
+    # shallower ones, and the shallow iterations, are too small to hand out. What the main process
+    # stores in the shared table meanwhile warms up the search processes
+    PARALLEL_MIN_DEPTH = 3
+    # Half width of the first aspiration window around the previous iteration's score,
+    # it grows by ASPIRATION_GROWTH on every fail before falling back to a full window
+    ASPIRATION_WINDOW = 1.0
+    ASPIRATION_GROWTH = 4
+    ASPIRATION_TRIES = 2
+    # No new iteration is started once this share of the move's time is gone,
+    # the next one would most likely not finish
+    SOFT_TIME_FRACTION = 0.5
+    # Clock handling: expected moves left when the clock has no moves-to-go, the share of
+    # the increment spent per move, and a safety margin kept on the clock (seconds)
+    DEFAULT_MOVES_TO_GO = 30
+    INCREMENT_SHARE = 0.75
+    CLOCK_SAFETY_MARGIN = 0.05
+
+    # Selective search. Null move: skip a turn and search R plies less (R grows with the
+    # depth), a fail high means the real moves will fail high too
+    NULL_MOVE_MIN_DEPTH = 3
+    NULL_MOVE_REDUCTION = 2
+    NULL_MOVE_DEEP_REDUCTION = 3
+    NULL_MOVE_DEEP_DEPTH = 6
+    # width of the null window used by PVS and the null move, scores are floats in steps
+    # of at least 0.05 (PST halves and the 0.1 mobility weight)
+    NULL_WINDOW = 0.01
+    # Late move reductions: quiet moves from this index on are searched one ply less
+    # (two from LMR_DEEP_MOVES on) and searched again at full depth if they improve
+    LMR_MIN_DEPTH = 3
+    LMR_MIN_MOVES = 3
+    LMR_DEEP_MOVES = 6
+    # Futility pruning: quiet moves are skipped when the static eval plus this margin
+    # (by remaining depth) cannot reach the window
+    FUTILITY_MARGINS = {1: 3, 2: 6}
+    # Razoring: hopeless nodes near the leaves drop into quiescence
+    RAZOR_MARGINS = {1: 4, 2: 8}
+
+    # counters summed up from the search processes
+    MERGED_STATS = ('branch', 'pruned', 'hit', 'node_cnt', 'qnode_cnt', 'cutoffs', 'first_move_cutoffs',
+                    'pvs_researches', 'null_move_tries', 'null_move_cutoffs', 'lmr_reductions', 'lmr_researches',
+                    'futility_pruned', 'razor_cutoffs', 'quiet_generations')
+
+    # only nodes with at least this much depth left are looked up in / written to the persistent cache,
+    # shallower ones are cheaper to search than to fetch
+    CACHE_MIN_DEPTH = 2
+
+    def __init__(self, use_transposition_table=True, use_quiescence=True, use_move_ordering=True, processes=1, book=None,
+                 cache=None, cache_warm_start=0, use_null_move=True, use_late_move_reductions=True,
+                 use_futility_pruning=True, use_razoring=True, profile=False, profile_log=None, tt_size_mb=16,
+                 use_staged_generation=True):
+        # Search features, switchable so they can be A/B benchmarked
+        self.use_transposition_table = use_transposition_table
+        self.use_quiescence = use_quiescence
+        self.use_move_ordering = use_move_ordering
+        self.use_null_move = use_null_move
+        self.use_late_move_reductions = use_late_move_reductions
+        self.use_futility_pruning = use_futility_pruning
+        self.use_razoring = use_razoring
+        # with move ordering, moves are generated stage by stage (see staged_moves) instead of all at once
+        self.use_staged_generation = use_staged_generation
+        # processes > 1 splits the moves of the PV nodes over a process pool (started on first use)
+        self.processes = processes
+        self.pool = None
+        # futures handed to the pool and not finished yet
+        self.pool_futures = set()
+        self.search_id = 0
+        # shared with the search processes: the id of the last search stopped, its split moves abort
+        self.stopped_search = None
+        # opening book (an Opening_Book or the path of a book file) asked before searching
+        self.owns_book = isinstance(book, str)
+        if self.owns_book:
+            # imported here so `python -m chess_package.book` does not import itself twice
+            from .book import Opening_Book
+            book = Opening_Book(book)
+        self.book = book
+        self.book_move = False
+        # persistent analysis cache (an Analysis_Cache or the path of its SQLite file), probed when
+        # the in-memory table misses; entries found or written are counted apart from `hit`
+        self.owns_cache = isinstance(cache, str)
+        if self.owns_cache:
+            from .cache import Analysis_Cache
+            cache = Analysis_Cache(cache)
+        self.cache = cache
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # keys stored in the table this search and due for the cache, and keys known to be missing
+        self.cache_pending = set()
+        self.cache_missing = set()
+        # warm start: the cache's deepest entries, put back into the table whenever it is cleared
+        self.warm_entries = cache.load_hot_entries(cache_warm_start) if cache is not None and cache_warm_start else {}
+        # per-phase timers and nodes per ply (off by default, the search then runs unwrapped),
+        # and a JSON lines file that gets one record per search
+        self.profiler = None
+        if profile:
+            from .profiler import Search_Profiler
+            self.profiler = Search_Profiler()
+        self.profile_log = profile_log
+
         # Initialize tracking variables and transposition table
         self.principle_list = []
         self.branch = 0
         self.pruned = 0
-        self.transposition_table = {}
+        # fixed size table of `tt_size_mb` megabytes, in shared memory for the search processes to
+        # use too; it is kept from one search to the next, entries of earlier searches being replaced first
+        self.tt_size_mb = tt_size_mb
+        self.transposition_table = Transposition_Table(tt_size_mb, shared=processes > 1)
         self.hit = 0
         self.node_cnt = 0
+        self.qnode_cnt = 0
+        # Search limits, only set while an iterative search runs
+        self.deadline = None
+        self.node_limit = None
+        self.stop_event = None
+        self.time_limit = None
+        self.abort_countdown = self.ABORT_CHECK_INTERVAL
+        self.aborted = False
+        # Move ordering state: two killer moves per ply, history scores per side and move
+        self.killer_moves = {}
+        self.history = {}
+        # principal variation of the last iteration, keyed by position so it is tried first again
+        self.pv_moves = {}
+        # beta cutoffs, and how many of them came from the first move searched
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        # null window searches of later moves that had to be repeated with the full window
+        self.pvs_researches = 0
+        # selective search counters
+        self.null_move_tries = self.null_move_cutoffs = 0
+        self.lmr_reductions = self.lmr_researches = 0
+        self.futility_pruned = self.razor_cutoffs = 0
+        # nodes whose staged generation got as far as the quiet moves
+        self.quiet_generations = 0
+        # nodes the search processes searched (in the counts above too), the rest ran here one after another
+        self.pool_nodes = 0
+        # Result of the last search
+        self.best_score = None
+        self.completed_depth = 0
+
+    def get_nodes(self):
+        # main search and quiescence nodes: what node limits, nps and the `nodes` counts mean everywhere
+        return self.node_cnt + self.qnode_cnt
+
+    def get_stats(self):
+        # Counters of the last search as a dict
+        stats = {
+            'branch': self.branch,
+            'pruned': self.pruned,
+            'hit': self.hit,
+            'nodes': self.get_nodes(),
+            'node_cnt': self.node_cnt,
+            'qnode_cnt': self.qnode_cnt,
+            'qnode_share': round(self.qnode_cnt / (self.node_cnt + self.qnode_cnt), 4) if self.qnode_cnt else 0.0,
+            'aborted': self.aborted,
+            'book_move': self.book_move,
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'cutoffs': self.cutoffs,
+            'first_move_cutoffs': self.first_move_cutoffs,
+            'first_move_cutoff_rate': round(self.first_move_cutoffs / self.cutoffs, 4) if self.cutoffs else None,
+            'pvs_researches': self.pvs_researches,
+            'null_move_tries': self.null_move_tries,
+            'null_move_cutoffs': self.null_move_cutoffs,
+            'lmr_reductions': self.lmr_reductions,
+            'lmr_researches': self.lmr_researches,
+            'futility_pruned': self.futility_pruned,
+            'razor_cutoffs': self.razor_cutoffs,
+            'quiet_generations': self.quiet_generations,
+            'pool_nodes': self.pool_nodes,
+            'tt_fill_rate': round(self.transposition_table.fill_rate(), 4),
+            'tt_collisions': self.transposition_table.collisions,
+            'completed_depth': self.completed_depth,
+            'best_score': self.best_score,
+        }
+        if self.profiler is not None:
+            stats['profile'] = self.profiler.get_stats()
+        return stats
+
+    def get_options(self):
+        # the switches a search process builds its own engine with
+        return {
+            'use_transposition_table': self.use_transposition_table,
+            'use_quiescence': self.use_quiescence,
+            'use_move_ordering': self.use_move_ordering,
+            'use_null_move': self.use_null_move,
+            'use_late_move_reductions': self.use_late_move_reductions,
+            'use_futility_pruning': self.use_futility_pruning,
+            'use_razoring': self.use_razoring,
+            'use_staged_generation': self.use_staged_generation,
+            'profile': self.profiler is not None,
+            'tt_size_mb': self.tt_size_mb,
+        }
+
+    def close(self):
+        # stop the search processes: split moves still running abort, queued ones are cancelled
+        # (shutdown(cancel_futures=True) needs Python 3.9)
+        if self.pool is not None:
+            self.stopped_search.value = self.search_id
+            for future in self.pool_futures:
+                future.cancel()
+            self.pool.shutdown()
+            self.pool = None
+            self.pool_futures = set()
+        if self.owns_book and self.book is not None:
+            self.book.close()
+            self.book = None
+        if self.owns_cache and self.cache is not None:
+            self.cache.close()
+            self.cache = None
 
     def get_principle_list(self):
         # Return principle variation if available
@@ -18,151 +243,814 @@ class Engine:
             raise Exception("Please use 'get_best_move' function to set the game state")
         return self.principle_list
 
+    def reset_stats(self):
+        self.branch = self.pruned = self.hit = self.node_cnt = self.qnode_cnt = 0
+        self.cutoffs = self.first_move_cutoffs = self.pvs_researches = 0
+        self.null_move_tries = self.null_move_cutoffs = 0
+        self.lmr_reductions = self.lmr_researches = 0
+        self.futility_pruned = self.razor_cutoffs = self.quiet_generations = 0
+        self.pool_nodes = 0
+        self.aborted = self.book_move = False
+        self.cache_hits = self.cache_misses = 0
+        self.transposition_table.reset_stats()
+        if self.profiler is not None:
+            self.profiler.reset()
+
     def get_best_move(self, state: Chess_State, depth, is_white_move: bool):
         # Reset stats for new search
-        self.branch = self.pruned = self.hit = self.node_cnt = 0
-        score, move = self.__minimax(state, depth, is_white_move, -float('inf'), float('inf'))
+        self.reset_stats()
+        book_move = self.probe_book(state, is_white_move)
+        if book_move is not None:
+            return book_move
+        self.search_id += 1
+        self.killer_moves.clear()
+        self.history.clear()
+        self.pv_moves.clear()
+        self.transposition_table.new_search()
+        if not self.transposition_table:
+            self.transposition_table.update(self.warm_entries)
+        if self.profiler is not None:
+            self.profiler.attach(state, self)
+        try:
+            score, move = self.__search_root(state, depth, is_white_move)
+        finally:
+            self.flush_cache()
+            if self.profiler is not None:
+                self.profiler.detach(state, self)
+        self.best_score = score
+        self.completed_depth = depth
+        self.log_search(state, depth, move)
         return move
 
-    def get_best_move_iterative(self, state: Chess_State, max_depth, is_white_move: bool, time_limit=3.0):
+    def get_best_move_iterative(self, state: Chess_State, max_depth, is_white_move: bool, time_limit=3.0, node_limit=None,
+                                stop_event=None, on_iteration=None):
+        # stop_event: a threading.Event another thread sets to end the search early;
+        # on_iteration(depth, score, move) is called after every finished iteration
         best_move = None
-        self.branch = self.pruned = self.hit = self.node_cnt = 0
+        self.reset_stats()
+        book_move = self.probe_book(state, is_white_move)
+        if book_move is not None:
+            return book_move
+        self.best_score = None
+        self.completed_depth = 0
+        self.transposition_table.new_search()
+        if not self.transposition_table:
+            self.transposition_table.update(self.warm_entries)
+        self.search_id += 1
+        # killers and history carry over from one iteration to the next
+        self.killer_moves.clear()
+        self.history.clear()
+        self.pv_moves.clear()
+
+        self.start_time = time.perf_counter()
+        self.time_limit = time_limit
+        # hard limits, checked inside the search
+        self.deadline = self.start_time + time_limit if time_limit is not None else None
+        self.node_limit = node_limit
+        self.stop_event = stop_event
+        self.abort_countdown = self.ABORT_CHECK_INTERVAL
+
+        if self.profiler is not None:
+            self.profiler.attach(state, self)
+        try:
+            for depth in range(1, max_depth + 1):
+                # Check if we've run out of time (a new iteration would not finish anyway);
+                # the limit is read from the engine, set_time_limit can change it meanwhile
+                if self.time_limit is not None and depth > 1 and \
+                        time.perf_counter() - self.start_time > self.time_limit * self.SOFT_TIME_FRACTION:
+                    break
+                if stop_event is not None and stop_event.is_set():
+                    break
+                try:
+                    score, move = self.__aspiration_search(state, depth, is_white_move)
+                except Search_Aborted:
+                    # An unfinished iteration still has a usable move once its first
+                    # root move (the previous best) was searched completely
+                    self.aborted = True
+                    if self.root_best_move is not None:
+                        best_move = self.root_best_move
+                        self.best_score = self.root_best_score
+                    break
+                if move:
+                    best_move = move
+                    self.best_score = score
+                self.completed_depth = depth
+                # nothing is reported once stopped, the caller is about to send the final move
+                if on_iteration is not None and not (stop_event is not None and stop_event.is_set()):
+                    on_iteration(depth, score, move)
+        finally:
+            self.deadline = None
+            self.node_limit = None
+            self.stop_event = None
+            self.flush_cache()
+            if self.profiler is not None:
+                self.profiler.detach(state, self)
+
+        self.log_search(state, max_depth, best_move)
+        return best_move
+
+    def log_search(self, state: Chess_State, depth, move):
+        # one JSON line per search in profile_log: position, move and get_stats()
+        if self.profile_log is None:
+            return
+        from .profiler import append_record
+        record = {'search_id': self.search_id, 'backend': state.__class__.__name__, 'fen': state.to_fen(),
+                  'depth': depth, 'move': state.index_to_algebraic(move.start_row, move.start_col,
+                                                                  move.end_row, move.end_col) if move else None}
+        record.update(self.get_stats())
+        append_record(self.profile_log, record)
+
+    def clear_transposition_table(self):
+        # empty the table, the warm start entries of the persistent cache stay in it
         self.transposition_table.clear()
+        self.transposition_table.update(self.warm_entries)
+
+    def probe_cache(self, tt_key, depth):
+        # look a position up in the persistent cache, a usable entry also goes into the table
+        if self.cache is None or depth < self.CACHE_MIN_DEPTH or tt_key in self.cache_missing:
+            return None
+        entry = self.cache.get(*tt_key)
+        self.cache_missing.add(tt_key)
+        if entry is None:
+            self.cache_misses += 1
+            return None
+        # a shallower entry still gives the hash move, but it is not a hit
+        if entry[2] >= depth:
+            self.cache_hits += 1
+        else:
+            self.cache_misses += 1
+        self.transposition_table[tt_key] = entry
+        return entry
+
+    def flush_cache(self):
+        # write the entries this search stored (deep enough for the cache) in one transaction
+        if self.cache is not None and self.cache_pending:
+            table = self.transposition_table
+            entries = {key: table.get(key) for key in self.cache_pending}
+            # entries replaced in the table since they were stored are gone
+            self.cache.store_many({key: entry for key, entry in entries.items() if entry is not None})
+        self.cache_pending.clear()
+        self.cache_missing.clear()
+
+    def probe_book(self, state: Chess_State, is_white_move: bool):
+        # a weighted book move as a Move object, None when there is no book or the position is not in it
+        if self.book is None or is_white_move != state.white_to_move:
+            return None
+        move = self.book.choose_move(state)
+        if move is None:
+            return None
+        self.book_move = True
+        self.best_score = None
+        self.completed_depth = 0
+        self.principle_list = [move]
+        return self.__root_move(state, move)
+
+    def allocate_time(self, remaining, increment=0.0, moves_to_go=None):
+        # Seconds to spend on this move from a game clock (remaining time plus increment)
+        moves_to_go = moves_to_go or self.DEFAULT_MOVES_TO_GO
+        budget = remaining / moves_to_go + increment * self.INCREMENT_SHARE
+        # never plan to use more than half of what is left, and keep a margin for overhead
+        budget = min(budget, remaining * 0.5, remaining - self.CLOCK_SAFETY_MARGIN)
+        return max(budget, 0.01)
 
+    def get_best_move_clock(self, state: Chess_State, is_white_move: bool, white_time, black_time,
+                            white_increment=0.0, black_increment=0.0, moves_to_go=None, max_depth=64):
+        # Iterative search under a game clock, times in seconds
+        remaining = white_time if is_white_move else black_time
+        increment = white_increment if is_white_move else black_increment
+        time_limit = self.allocate_time(remaining, increment, moves_to_go)
+        return self.get_best_move_iterative(state, max_depth, is_white_move, time_limit=time_limit)
+
+    def __aspiration_search(self, state: Chess_State, depth, is_white_move):
+        # Search a narrow window around the last score first and widen it on a fail
+        previous = self.best_score
+        if depth == 1 or previous is None or abs(previous) >= self.MATE_BOUND:
+            return self.__search_root(state, depth, is_white_move)
+
+        window = self.ASPIRATION_WINDOW
+        for _ in range(self.ASPIRATION_TRIES):
+            alpha, beta = previous - window, previous + window
+            score, move = self.__search_root(state, depth, is_white_move, alpha, beta)
+            if alpha < score < beta:
+                return score, move
+            window *= self.ASPIRATION_GROWTH
+        return self.__search_root(state, depth, is_white_move)
+
+    def set_time_limit(self, time_limit):
+        # Give a running iterative search (e.g. one without limit, pondering) a time limit from now on
         self.start_time = time.perf_counter()
         self.time_limit = time_limit
+        self.deadline = self.start_time + time_limit if time_limit is not None else None
+
+    def check_limits(self):
+        # Called every ABORT_CHECK_INTERVAL nodes from the search
+        self.abort_countdown = self.ABORT_CHECK_INTERVAL
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            raise Search_Aborted()
+        if self.stop_event is not None and self.stop_event.is_set():
+            raise Search_Aborted()
+        if self.node_limit is not None and self.get_nodes() >= self.node_limit:
+            raise Search_Aborted()
+
+    def __search_root(self, state: Chess_State, depth, is_white_move, alpha=None, beta=None):
+        # the root call, then the principal variation is kept for the next search
+        alpha = -self.INFINITE_SCORE if alpha is None else alpha
+        beta = self.INFINITE_SCORE if beta is None else beta
+        self.pv_table = {}
+        self.root_best_move = None
+        self.root_best_score = None
+        if self.processes > 1 and depth >= self.PARALLEL_MIN_DEPTH:
+            score, move = self.__parallel_node(state, depth, is_white_move, alpha, beta)
+        else:
+            score, move = self.__negamax(state, depth, is_white_move, alpha, beta)
+        self.principle_list = self.pv_table.get(0, [])
+        self.remember_principal_variation(state)
+        return score, move
+
+    def __parallel_node(self, state: Chess_State, depth, is_white, alpha, beta, ply=0):
+        # Split node along the principal variation: the first (PV) move is searched here to get a
+        # bound, splitting its own moves the same way while deep enough, and the other moves go to
+        # the process pool, a new one handed out with the current window whenever one finishes.
+        # The processes share the transposition table and start from this process' killers and history
+        all_moves = state.get_all_valid_moves(is_white)
+        if len(all_moves) < 2:
+            return self.__negamax(state, depth, is_white, alpha, beta, ply)
+        self.node_cnt += 1
+        if self.profiler is not None:
+            self.profiler.count_node(ply)
+        self.pv_table[ply] = []
+
+        tt_key = (state.zobrist_hash, is_white)
+        tt_entry = self.transposition_table.get(tt_key) if self.use_transposition_table else None
+        hash_move = self.pv_moves.get(state.zobrist_hash)
+        if tt_entry is not None:
+            tt_score, flag, tt_depth, tt_move = tt_entry
+            if hash_move is None:
+                hash_move = tt_move
+            # below the root a deep enough entry ends the node, like in __negamax
+            if ply > 0 and tt_depth >= depth:
+                tt_score = self.score_from_table(tt_score, ply)
+                if flag == 'EXACT' or (flag == 'LOWERBOUND' and tt_score >= beta) \
+                        or (flag == 'UPPERBOUND' and tt_score <= alpha):
+                    self.hit += 1
+                    return tt_score, None
+        if self.use_move_ordering:
+            all_moves = self.order_moves(state, all_moves, ply, is_white, hash_move)
+
+        alpha_orig = alpha
+        best_score = -self.INFINITE_SCORE
+        best_move_tuple = None
+
+        first = all_moves[0]
+        move_obj = state.make_move(*first)
+        self.branch += 1
+        try:
+            if depth - 1 >= self.PARALLEL_MIN_DEPTH:
+                score = -self.__parallel_node(state, depth - 1, not is_white, -beta, -alpha, ply + 1)[0]
+            else:
+                score = -self.__negamax(state, depth - 1, not is_white, -beta, -alpha, ply + 1)[0]
+        finally:
+            state.undo_move(move_obj)
+        results = [(first, score, self.pv_table.get(ply + 1, []))]
 
-        for depth in range(1, max_depth + 1):
-            # Check if we've run out of time
-            if time.perf_counter() - self.start_time > self.time_limit:
+        # futures of earlier searches that have finished since
+        self.pool_futures = {future for future in self.pool_futures if not future.done()}
+        if self.pool is None:
+            self.stopped_search = multiprocessing.RawValue('q', 0)
+            self.pool = ProcessPoolExecutor(max_workers=self.processes, initializer=_init_search_process,
+                                            initargs=(self.get_options(), self.stopped_search,
+                                                      self.transposition_table.buffers))
+        pending = {}
+        # nodes handed to the moves still running, the node budget is shared out among them
+        budgets = {}
+        remaining = list(enumerate(all_moves))[1:]
+        ordering = (self.killer_moves, self.history)
+        aborted = False
+        while results or pending:
+            # take in the finished moves, best move and window first
+            for move, score, line in results:
+                if score is None:
+                    aborted = True
+                    continue
+                if score > best_score:
+                    best_score = score
+                    best_move_tuple = move
+                    self.pv_table[ply] = [move] + line
+                    if ply == 0 and score > alpha_orig:
+                        self.root_best_move = self.__root_move(state, move)
+                        self.root_best_score = score
+                alpha = max(alpha, score)
+            results = []
+            if alpha >= beta or aborted:
+                if alpha >= beta:
+                    self.pruned += 1
+                    self.record_cutoff(state, best_move_tuple, ply, depth, is_white, all_moves.index(best_move_tuple))
+                # an aborted move ends the whole search, the moves still running stop with it
+                if aborted:
+                    self.stopped_search.value = self.search_id
+                for future in pending:
+                    future.cancel()
+                remaining = []
+
+            while remaining and len(pending) < self.processes:
+                move_index, move = remaining.pop(0)
+                self.branch += 1
+                reduction = self.__late_move_reduction(state, move, move_index, depth, is_white, ply)
+                time_left, node_limit = self.__remaining_limits(sum(budgets.values()), self.processes - len(pending))
+                future = self.pool.submit(_search_split_move, self.search_id, self.transposition_table.age, state,
+                                          move, depth - 1, is_white, alpha, beta, ply, reduction, self.pv_moves,
+                                          ordering, time_left, node_limit)
+                pending[future] = move
+                budgets[future] = node_limit or 0
+                self.pool_futures.add(future)
+            if not pending:
                 break
-            score, move = self.__minimax(state, depth, is_white_move, -float('inf'), float('inf'))
-            if move:
-                best_move = move
 
-        return best_move
+            done = self.__wait_pool(pending)
+            for future in done:
+                move = pending.pop(future)
+                budgets.pop(future, None)
+                self.pool_futures.discard(future)
+                if future.cancelled():
+                    continue
+                score, line, stats = future.result()
+                for name in self.MERGED_STATS:
+                    setattr(self, name, getattr(self, name) + stats[name])
+                self.pool_nodes += stats['node_cnt'] + stats['qnode_cnt']
+                if self.profiler is not None and 'profile' in stats:
+                    self.profiler.merge(stats['profile'])
+                results.append((move, score, line))
+
+        if aborted:
+            raise Search_Aborted()
+        self.store_entry(tt_key, best_score, alpha_orig, beta, depth, ply, best_move_tuple)
+        return best_score, self.__root_move(state, best_move_tuple)
+
+    def __late_move_reduction(self, state: Chess_State, move, move_index, depth, is_white, ply):
+        # plies a split move is searched less, the late move reduction __negamax would give it
+        if ply == 0 or not self.use_late_move_reductions or depth < self.LMR_MIN_DEPTH \
+                or move_index < self.LMR_MIN_MOVES or move in self.killer_moves.get(ply, ()):
+            return 0
+        board = state.board
+        sr, sc, er, ec = move
+        if board[er][ec] != '--' or (board[sr][sc][1] == 'P' and er in (0, 7)) \
+                or state.is_king_in_check('w' if is_white else 'b'):
+            return 0
+        move_obj = state.make_move(sr, sc, er, ec)
+        gives_check = state.is_king_in_check('b' if is_white else 'w')
+        state.undo_move(move_obj)
+        if gives_check:
+            return 0
+        return 2 if move_index >= self.LMR_DEEP_MOVES and depth > 3 else 1
+
+    def __wait_pool(self, pending):
+        # the finished split moves; the limits (stop included) are checked while the processes search,
+        # once they are hit the processes abort their moves and the iteration is given up
+        while True:
+            done, _ = wait(pending, timeout=self.POOL_POLL_INTERVAL, return_when=FIRST_COMPLETED)
+            if done:
+                return done
+            try:
+                self.check_limits()
+            except Search_Aborted:
+                self.stopped_search.value = self.search_id
+                for future in pending:
+                    future.cancel()
+                raise
+
+    def __root_move(self, state: Chess_State, move):
+        # a Move object for a move searched in another process
+        move_obj = state.make_move(*move)
+        state.undo_move(move_obj)
+        return move_obj
+
+    def __remaining_limits(self, reserved=0, slots=1):
+        # time (seconds) and nodes a search process may still spend: the nodes left that are not
+        # `reserved` by the moves already running, shared between the `slots` about to start
+        time_left = None
+        if self.deadline is not None:
+            time_left = max(self.deadline - time.perf_counter(), 0.0)
+        node_limit = None
+        if self.node_limit is not None:
+            node_limit = max((self.node_limit - self.get_nodes() - reserved) // slots, 1)
+        return time_left, node_limit
+
+    def search_move(self, state: Chess_State, move, depth, is_white, alpha, beta, ply=0, reduction=0, time_left=None,
+                    node_limit=None):
+        # Score one move of a split node `ply` plies from the root (for the side playing it) in a search
+        # process, null window first like PVS and `reduction` plies shallower for a late quiet move:
+        # (score or None once aborted, PV after it, counters)
+        self.reset_stats()
+        self.pv_table = {}
+        self.deadline = time.perf_counter() + time_left if time_left is not None else None
+        self.node_limit = node_limit
+        self.abort_countdown = self.ABORT_CHECK_INTERVAL
+        if self.profiler is not None:
+            self.profiler.attach(state, self)
+        move_obj = state.make_move(*move)
+        try:
+            if reduction:
+                self.lmr_reductions += 1
+            score = -self.__negamax(state, depth - reduction, not is_white, -alpha - self.NULL_WINDOW, -alpha, ply + 1)[0]
+            if reduction and score > alpha:
+                self.lmr_researches += 1
+                score = -self.__negamax(state, depth, not is_white, -alpha - self.NULL_WINDOW, -alpha, ply + 1)[0]
+            if alpha < score < beta:
+                self.pvs_researches += 1
+                score = -self.__negamax(state, depth, not is_white, -beta, -alpha, ply + 1)[0]
+        except Search_Aborted:
+            score = None
+        finally:
+            state.undo_move(move_obj)
+            self.deadline = None
+            self.node_limit = None
+            self.stop_event = None
+            if self.profiler is not None:
+                self.profiler.detach(state, self)
+        stats = {name: getattr(self, name) for name in self.MERGED_STATS}
+        if self.profiler is not None:
+            stats['profile'] = self.profiler.get_stats()
+        return score, self.pv_table.get(ply + 1, []), stats
+
+    def remember_principal_variation(self, state: Chess_State):
+        # Walk the PV on the board and note each position's move, so the next
+        # iteration searches the whole line first
+        self.pv_moves.clear()
+        played = []
+        for move in self.principle_list:
+            self.pv_moves[state.zobrist_hash] = move
+            played.append(state.make_move(*move))
+        for move_obj in reversed(played):
+            state.undo_move(move_obj)
 
-    def __minimax(self, state: Chess_State, depth, is_maximising, alpha, beta):
+    def order_moves(self, state: Chess_State, moves, ply, is_white, hash_move):
+        # PV/hash move, then captures and promotions by MVV-LVA, then killers, then quiets by history
+        first = []
+        tactical = []
+        quiet = []
+        board = state.board
+        for move in moves:
+            if move == hash_move:
+                first.append(move)
+            elif board[move[2]][move[3]] != '--' or (board[move[0]][move[1]][1] == 'P' and move[2] in (0, 7)):
+                tactical.append(move)
+            else:
+                quiet.append(move)
+
+        killers = [move for move in self.killer_moves.get(ply, ()) if move in quiet]
+        history = self.history
+        quiet = [move for move in quiet if move not in killers]
+        quiet.sort(key=lambda move: history.get((is_white, move), 0), reverse=True)
+        return first + state.get_all_valid_moves_as_ordered(tactical) + killers + quiet
+
+    def staged_moves(self, state: Chess_State, ply, is_white, hash_move):
+        # The legal moves stage by stage, each generated only once the search gets to it: hash move,
+        # winning captures (MVV-LVA), quiet promotions, killers, the captures that lose material,
+        # then quiet moves by history. A cutoff on an early move saves generating the quiet moves.
+        # Losing captures go before the quiets: tried last they cost far more nodes in this search
+        tried = []
+        if hash_move is not None and state.is_legal_move(hash_move, is_white):
+            tried.append(hash_move)
+            yield hash_move
+
+        board = state.board
+        values = state.PIECE_VALUES
+        losing = []
+        for move in state.get_all_valid_moves_as_ordered(state.get_all_valid_captures(is_white)):
+            if move in tried:
+                continue
+            sr, sc, er, ec = move
+            # taking a piece worth at least the attacker cannot lose material, the rest needs the exchange
+            if values[board[er][ec][1]] < values[board[sr][sc][1]] and state.static_exchange_evaluation(sr, sc, er, ec) < 0:
+                losing.append(move)
+            else:
+                yield move
+
+        for move in state.get_all_valid_promotions(is_white):
+            if move not in tried:
+                tried.append(move)
+                yield move
+
+        for move in tuple(self.killer_moves.get(ply, ())):
+            if move not in tried and board[move[2]][move[3]] == '--' and state.is_legal_move(move, is_white):
+                tried.append(move)
+                yield move
+
+        yield from losing
+
+        self.quiet_generations += 1
+        history = self.history
+        quiet = [move for move in state.get_all_valid_quiets(is_white) if move not in tried]
+        quiet.sort(key=lambda move: history.get((is_white, move), 0), reverse=True)
+        yield from quiet
+
+    def record_cutoff(self, state: Chess_State, move, ply, depth, is_white, move_index):
+        self.cutoffs += 1
+        if move_index == 0:
+            self.first_move_cutoffs += 1
+        # only quiet moves feed the killer and history tables, captures are ordered by MVV-LVA anyway
+        if state.board[move[2]][move[3]] != '--':
+            return
+        killers = self.killer_moves.setdefault(ply, [])
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[2:]
+        key = (is_white, move)
+        self.history[key] = self.history.get(key, 0) + depth * depth
+
+    def score_to_table(self, score, ply):
+        # mate scores are stored as distance from this node, so they stay right from other paths
+        if score >= self.MATE_BOUND:
+            return score + ply
+        if score <= -self.MATE_BOUND:
+            return score - ply
+        return score
+
+    def score_from_table(self, score, ply):
+        if score >= self.MATE_BOUND:
+            return score - ply
+        if score <= -self.MATE_BOUND:
+            return score + ply
+        return score
+
+    def store_entry(self, tt_key, best_score, alpha_orig, beta, depth, ply, best_move_tuple):
+        # Store result in transposition table with the bound it proves
+        if not self.use_transposition_table:
+            return
+        flag = 'EXACT'
+        if best_score <= alpha_orig:
+            flag = 'UPPERBOUND'
+        elif best_score >= beta:
+            flag = 'LOWERBOUND'
+        self.transposition_table[tt_key] = (self.score_to_table(best_score, ply), flag, depth, best_move_tuple)
+        if self.cache is not None and depth >= self.CACHE_MIN_DEPTH:
+            self.cache_pending.add(tt_key)
+
+    def __negamax(self, state: Chess_State, depth, is_white, alpha, beta, ply=0, allow_null=True):
+        # Principal variation search; scores are from the side to move (`is_white`)
         # Count total nodes visited
         self.node_cnt += 1
-        alpha_orig = alpha
+        self.abort_countdown -= 1
+        if self.abort_countdown <= 0:
+            self.check_limits()
+        if self.profiler is not None:
+            self.profiler.count_node(ply)
+        self.pv_table[ply] = []
 
         # Terminal condition: switch to quiescence search
-        if depth == 0:
-            return self.quiescence_search(state, alpha, beta, is_maximising), None
+        if depth <= 0:
+            if not self.use_quiescence:
+                return (state.evaluate_board() if is_white else -state.evaluate_board()), None
+            return self.quiescence_search(state, alpha, beta, is_white), None
 
-        best_score = -float('inf') if is_maximising else float('inf')
-        best_move = None
+        # Transposition table lookup (the root always searches, it has to return a move)
+        tt_key = (state.zobrist_hash, is_white)
+        hash_move = self.pv_moves.get(state.zobrist_hash)
+        tt_entry = None
+        if self.use_transposition_table:
+            tt_entry = self.transposition_table.get(tt_key)
+            if tt_entry is None and self.cache is not None:
+                tt_entry = self.probe_cache(tt_key, depth)
+        if tt_entry is not None:
+            tt_score, flag, tt_depth, tt_move = tt_entry
+            if hash_move is None:
+                hash_move = tt_move
+            if ply > 0 and tt_depth >= depth:
+                self.hit += 1
+                tt_score = self.score_from_table(tt_score, ply)
+                if flag == 'EXACT':
+                    return tt_score, None
+                elif flag == 'LOWERBOUND':
+                    alpha = max(alpha, tt_score)
+                elif flag == 'UPPERBOUND':
+                    beta = min(beta, tt_score)
+                if alpha >= beta:
+                    self.pruned += 1
+                    return tt_score, None
+
+        # window after the table narrowed it, used to flag the stored score
+        alpha_orig = alpha
+        # a null window means a PVS scout search, the pruning below only runs in those
+        # (twice the width: -alpha - NULL_WINDOW does not round trip exactly in floats)
+        pv_node = beta - alpha > 2 * self.NULL_WINDOW
+
+        # Selective search, never at the root or when in check
+        color = 'w' if is_white else 'b'
+        enemy = 'b' if is_white else 'w'
+        in_check = False
+        static_eval = None
+        selective = ply > 0 and (self.use_null_move or self.use_late_move_reductions
+                                 or self.use_futility_pruning or self.use_razoring)
+        if selective:
+            in_check = state.is_king_in_check(color)
+            selective = not in_check
+        if selective and (depth in self.FUTILITY_MARGINS or
+                          (self.use_null_move and allow_null and depth >= self.NULL_MOVE_MIN_DEPTH)):
+            static_eval = state.evaluate_board() if is_white else -state.evaluate_board()
+
+        # Razoring: far below the window near the leaves, let quiescence confirm the fail low
+        if selective and not pv_node and self.use_razoring and self.use_quiescence and depth in self.RAZOR_MARGINS \
+                and static_eval + self.RAZOR_MARGINS[depth] <= alpha:
+            score = self.quiescence_search(state, alpha, beta, is_white)
+            if score <= alpha:
+                self.razor_cutoffs += 1
+                return score, None
+
+        # Null move: if passing still fails high, a real move will as well. Skipped without
+        # pieces (zugzwang), right after another null move, and against mate scores
+        if selective and not pv_node and self.use_null_move and allow_null and depth >= self.NULL_MOVE_MIN_DEPTH \
+                and static_eval >= beta and abs(beta) < self.MATE_BOUND and state.has_non_pawn_material(color):
+            reduction = self.NULL_MOVE_DEEP_REDUCTION if depth >= self.NULL_MOVE_DEEP_DEPTH else self.NULL_MOVE_REDUCTION
+            self.null_move_tries += 1
+            state.make_null_move()
+            try:
+                score = -self.__negamax(state, depth - 1 - reduction, not is_white,
+                                        -beta, -beta + self.NULL_WINDOW, ply + 1, False)[0]
+            finally:
+                state.undo_null_move()
+            if score >= beta:
+                self.null_move_cutoffs += 1
+                return beta, None
 
         # Order moves to maximize pruning potential
-        all_moves = state.get_all_valid_moves(is_maximising)
+        if self.use_move_ordering and self.use_staged_generation:
+            all_moves = self.staged_moves(state, ply, is_white, hash_move)
+        else:
+            all_moves = state.get_all_valid_moves(is_white)
+            if self.use_move_ordering:
+                all_moves = self.order_moves(state, all_moves, ply, is_white, hash_move)
 
-        for move in all_moves:
+        best_score = -self.INFINITE_SCORE
+        best_move = None
+        best_move_tuple = None
+        futility_margin = self.FUTILITY_MARGINS.get(depth) if selective and not pv_node and self.use_futility_pruning else None
+        reduce_late = selective and self.use_late_move_reductions and depth >= self.LMR_MIN_DEPTH
+        killers = self.killer_moves.get(ply, ())
+        board = state.board
+        searched = 0
+
+        for move_index, move in enumerate(all_moves):
             sr, sc, er, ec = move
+            quiet = board[er][ec] == '--' and not (board[sr][sc][1] == 'P' and er in (0, 7))
             move_obj = state.make_move(sr, sc, er, ec)
 
-            # # Transposition table lookup
-            # key = state.compute_zobrist_hash()
-            # tt_key = (key, is_maximising)
-
-            # if tt_key in self.transposition_table:
-            #     tt_score, flag, tt_depth = self.transposition_table[tt_key]
-            #     if tt_depth >= depth:
-            #         self.hit += 1
-            #         if flag == 'EXACT':
-            #             score = tt_score
-            #         elif flag == 'LOWERBOUND':
-            #             score = tt_score
-            #             alpha = max(alpha, tt_score)
-            #         elif flag == 'UPPERBOUND':
-            #             score = tt_score
-            #             beta = min(beta, tt_score)
-            #         if alpha >= beta:
-            #             state.undo_move(move_obj)
-            #             self.pruned += 1
-            #             return score, None
-            #     else:
-            #         self.branch += 1
-            #         score, _ = self.__minimax(state, depth - 1, not is_maximising, alpha, beta)
-            # else:
-            self.branch += 1
-            score, _ = self.__minimax(state, depth - 1, not is_maximising, alpha, beta)
-
+            # Futility: a quiet move that gives no check cannot lift a hopeless eval into the window.
+            # Never the first move, so a node that prunes has a searched move and a best score
+            futile = False
+            late = reduce_late and quiet and move_index >= self.LMR_MIN_MOVES and move not in killers
+            if futility_margin is not None and quiet and searched > 0:
+                futile = static_eval + futility_margin <= alpha
+            if (futile or late) and state.is_king_in_check(enemy):
+                futile = late = False
+            if futile:
+                state.undo_move(move_obj)
+                self.futility_pruned += 1
+                continue
 
-            state.undo_move(move_obj)
+            self.branch += 1
+            try:
+                if searched == 0:
+                    # first move: full window
+                    score = -self.__negamax(state, depth - 1, not is_white, -beta, -alpha, ply + 1)[0]
+                else:
+                    # later moves: null window scout, reduced for late quiet moves
+                    reduction = 0
+                    if late:
+                        reduction = 2 if move_index >= self.LMR_DEEP_MOVES and depth > 3 else 1
+                        self.lmr_reductions += 1
+                    score = -self.__negamax(state, depth - 1 - reduction, not is_white,
+                                            -alpha - self.NULL_WINDOW, -alpha, ply + 1)[0]
+                    if reduction and score > alpha:
+                        self.lmr_researches += 1
+                        score = -self.__negamax(state, depth - 1, not is_white,
+                                                -alpha - self.NULL_WINDOW, -alpha, ply + 1)[0]
+                    # it beat alpha: search it again with the real window to get its score
+                    if alpha < score < beta:
+                        self.pvs_researches += 1
+                        score = -self.__negamax(state, depth - 1, not is_white, -beta, -alpha, ply + 1)[0]
+            finally:
+                # also runs when the search is aborted, so the position is always restored
+                state.undo_move(move_obj)
+            searched += 1
 
-            # Update best score and alpha-beta window
-            if is_maximising:
-                if score > best_score:
-                    best_score = score
-                    best_move = move_obj
-                    alpha = max(alpha, best_score)
-            else:
-                if score < best_score:
-                    best_score = score
-                    best_move = move_obj
-                    beta = min(beta, best_score)
+            if score > best_score:
+                best_score = score
+                best_move = move_obj
+                best_move_tuple = move
+                # extend the principal variation with the child's line
+                self.pv_table[ply] = [move] + self.pv_table.get(ply + 1, [])
+                # a root move that beat the window is safe to play if the iteration gets cut off
+                if ply == 0 and score > alpha_orig:
+                    self.root_best_move = move_obj
+                    self.root_best_score = score
+            if score > alpha:
+                alpha = score
 
             # Alpha-beta pruning condition
             if alpha >= beta:
                 self.pruned += 1
+                self.record_cutoff(state, move, ply, depth, is_white, move_index)
                 break
 
-        # Store result in transposition table with appropriate flag
-        # flag = 'EXACT'
-        # if best_score <= alpha_orig:
-        #     flag = 'UPPERBOUND'
-        # elif best_score >= beta:
-        #     flag = 'LOWERBOUND'
-        # self.transposition_table[(state.compute_zobrist_hash(), is_maximising)] = (best_score, flag, depth)
+        if searched == 0:
+            # no legal move: checkmate (sooner is worse) or stalemate
+            if in_check or state.is_king_in_check(color):
+                return -(self.MATE_SCORE - ply), None
+            return 0, None
 
+        self.store_entry(tt_key, best_score, alpha_orig, beta, depth, ply, best_move_tuple)
         return best_score, best_move
 
     def quiescence_search(self, state: Chess_State, alpha, beta, is_white_turn, depth=4):
+        # Captures only, fail hard, negamax scores from the side to move like the main search
+        self.qnode_cnt += 1
+        self.abort_countdown -= 1
+        if self.abort_countdown <= 0:
+            self.check_limits()
+        stand_pat = state.evaluate_board() if is_white_turn else -state.evaluate_board()
+
         # Basic depth limit
         if depth == 0:
-            return state.evaluate_board()
-
-        eval = state.evaluate_board()
+            return stand_pat
 
         # Stand-pat check
-        if is_white_turn:
-            if eval >= beta:
-                return beta
-            if alpha < eval:
-                alpha = eval
-        else:
-            if eval <= alpha:
-                return alpha
-            if beta > eval:
-                beta = eval
-
-        # Generate only capture moves for quiescence search
-        all_moves = state.get_all_valid_moves(is_white_turn)
-        capture_moves = []
-        for move in all_moves:
-            sr, sc, er, ec = move
-            if state.board[er][ec] != '--':
-                capture_moves.append(move)
+        if stand_pat >= beta:
+            return beta
+        if alpha < stand_pat:
+            alpha = stand_pat
 
-        ordered_moves = state.get_all_valid_moves_as_ordered(capture_moves)
+        # Only legal captures, most valuable victim first
+        ordered_moves = state.get_all_valid_moves_as_ordered(state.get_all_valid_captures(is_white_turn))
+        board = state.board
+        values = state.PIECE_VALUES
 
-        # Evaluate captures recursively
         for move in ordered_moves:
             sr, sc, er, ec = move
+            attacker = board[sr][sc][1]
+            gain = values[board[er][ec][1]]
+            # a pawn capturing onto the last row also turns into a queen
+            if attacker == 'P' and (er == 0 or er == 7):
+                gain += values['Q'] - values['P']
+
+            # Delta pruning: even winning the victim for free cannot reach the window
+            if stand_pat + gain + self.DELTA_MARGIN <= alpha:
+                continue
+
+            # Skip captures that lose material once the exchange is played out; taking a piece
+            # worth at least the attacker cannot, as in staged_moves
+            if gain < values[attacker] and state.static_exchange_evaluation(sr, sc, er, ec) < 0:
+                continue
+
             move_obj = state.make_move(sr, sc, er, ec)
-            score = -self.quiescence_search(state, -beta, -alpha, not is_white_turn, depth - 1)
-            state.undo_move(move_obj)
+            try:
+                score = -self.quiescence_search(state, -beta, -alpha, not is_white_turn, depth - 1)
+            finally:
+                state.undo_move(move_obj)
+
+            if score >= beta:
+                return beta
+            if score > alpha:
+                alpha = score
+
+        return alpha
+
+
+# Engine of a search process, its table and move ordering state live for the whole pool
+_process_engine = None
+_process_search_id = None
+
+
+class _Search_Stop:
+    # stop_event of a search process: set once the main process stopped this search
+
+    def __init__(self, stopped_search, search_id):
+        self.stopped_search = stopped_search
+        self.search_id = search_id
+
+    def is_set(self):
+        return self.stopped_search.value >= self.search_id
+
+
+def _init_search_process(options, stopped_search, tt_buffers):
+    global _process_engine
+    _process_engine = Engine(**options)
+    _process_engine.stopped_search = stopped_search
+    # the main process' table, in shared memory
+    _process_engine.transposition_table = Transposition_Table(_process_engine.tt_size_mb, buffers=tt_buffers)
 
-            if is_white_turn:
-                if score >= beta:
-                    return beta
-                if score > alpha:
-                    alpha = score
-            else:
-                if score <= alpha:
-                    return alpha
-                if score < beta:
-                    beta = score
 
-        return alpha if is_white_turn else beta
+def _search_split_move(search_id, age, state, move, depth, is_white, alpha, beta, ply, reduction, pv_moves, ordering,
+                       time_left, node_limit):
+    global _process_search_id
+    engine = _process_engine
+    # a new search starts from the main process' killers and history (filled by the shallow iterations
+    # and the first move), the process then keeps its own for the rest of the search
+    if search_id != _process_search_id:
+        _process_search_id = search_id
+        killer_moves, history = ordering
+        engine.killer_moves = {ply: list(killers) for ply, killers in killer_moves.items()}
+        engine.history = dict(history)
+    engine.transposition_table.age = age
+    engine.pv_moves = pv_moves
+    engine.stop_event = _Search_Stop(engine.stopped_search, search_id)
+    return engine.search_move(state, move, depth, is_white, alpha, beta, ply, reduction, time_left, node_limit)
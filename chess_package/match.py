@@ -0,0 +1,317 @@
+import argparse
+import itertools
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from . import BACKENDS
+from .batch import read_positions
+from .benchmark import parse_option
+from .engine import Engine
+
+# balanced positions a few moves into common openings, each is played once with either engine as white
+OPENINGS = (
+    'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1',
+    'r1bqkbnr/pppp1ppp/2n5/1B2p3/4P3/5N2/PPPP1PPP/RNBQK2R b KQkq - 3 3',
+    'rnbqkb1r/pp2pppp/3p1n2/8/3NP3/8/PPP2PPP/RNBQKB1R w KQkq - 1 5',
+    'rnbqkb1r/ppp1pppp/5n2/3p4/2PP4/8/PP2PPPP/RNBQKBNR w KQkq - 1 3',
+    'rnbqkbnr/pp2pppp/2p5/3p4/3PP3/8/PPP2PPP/RNBQKBNR w KQkq - 0 3',
+    'rnbqkb1r/pppp1ppp/4pn2/8/2PP4/8/PP2PPPP/RNBQKBNR w KQkq - 0 3',
+    'rnbqkbnr/pp3ppp/4p3/2pp4/3PP3/8/PPPN1PPP/R1BQKBNR w KQkq - 0 4',
+    'r1bqkb1r/pppp1ppp/2n2n2/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4',
+)
+
+# draw once this many plies have passed without a capture or a pawn move
+FIFTY_MOVE_PLIES = 100
+# a position seen this many times (same side to move and castling rights) is a draw
+REPETITIONS = 3
+# deepest iteration of a timed search
+MAX_DEPTH = 64
+
+RESULT_SCORES = {'1-0': 1.0, '0-1': 0.0, '1/2-1/2': 0.5}
+
+
+# only kings, or kings and a single knight or bishop: nobody can mate
+def is_insufficient_material(state):
+    pieces = [piece[1] for row in state.board for piece in row if piece != '--' and piece[1] != 'K']
+    return not pieces or (len(pieces) == 1 and pieces[0] in 'NB')
+
+
+# checkmate or stalemate when the side to move has no legal move, else (None, None)
+def game_end(state):
+    is_white = state.white_to_move
+    if state.get_all_valid_moves(is_white):
+        return None, None
+    if state.is_king_in_check('w' if is_white else 'b'):
+        return ('0-1' if is_white else '1-0'), 'checkmate'
+    return '1/2-1/2', 'stalemate'
+
+
+# the halfmove clock field of a FEN, 0 when it is missing
+def fen_halfmove_clock(fen):
+    fields = fen.split()
+    return int(fields[4]) if len(fields) > 4 and fields[4].isdigit() else 0
+
+
+# a search under either a fixed time per move or the side's game clock, (move tuple or None, seconds used)
+def play_move(engine: Engine, state, movetime, clock, increment, max_depth):
+    is_white = state.white_to_move
+    time_limit = movetime if movetime is not None else engine.allocate_time(clock, increment)
+    start_time = time.perf_counter()
+    move = engine.get_best_move_iterative(state, max_depth, is_white, time_limit=time_limit)
+    elapsed = time.perf_counter() - start_time
+    if move is not None:
+        return (move.start_row, move.start_col, move.end_row, move.end_col), elapsed
+    # cut off before the first iteration finished: any legal move
+    moves = state.get_all_valid_moves(is_white)
+    return (moves[0] if moves else None), elapsed
+
+
+# One game from `fen`, engine_a playing white when `a_is_white`. Returns a record with the result
+# ('1-0', '0-1' or '1/2-1/2'), the reason it ended, engine A's score and the moves played.
+# `game_time` (seconds per side, plus `increment` per move) is used when there is no `movetime`.
+def play_game(index, fen, a_is_white, options_a, options_b, movetime=None, game_time=None, increment=0.0,
+              backend='list', max_depth=MAX_DEPTH):
+    if movetime is None and game_time is None:
+        raise Exception("Either a time per move or a game time is required")
+    state = BACKENDS[backend]()
+    state.load_fen(fen)
+    engine_a = Engine(**options_a)
+    engine_b = Engine(**options_b)
+    engines = {True: engine_a if a_is_white else engine_b, False: engine_b if a_is_white else engine_a}
+    clocks = {True: game_time, False: game_time}
+    # the state does not track the halfmove clock or the position history, the game does
+    seen = {state.zobrist_hash: 1}
+    quiet_plies = fen_halfmove_clock(fen)
+    moves = []
+    result, reason = game_end(state)
+    try:
+        while result is None:
+            is_white = state.white_to_move
+            move, elapsed = play_move(engines[is_white], state, movetime, clocks[is_white], increment, max_depth)
+            if game_time is not None:
+                clocks[is_white] -= elapsed
+                if clocks[is_white] < 0:
+                    result, reason = ('0-1' if is_white else '1-0'), 'time forfeit'
+                    break
+                clocks[is_white] += increment
+            moves.append(state.index_to_algebraic(*move))
+            move_obj = state.make_move(*move)
+            # a mate on the last move counts over any draw rule
+            result, reason = game_end(state)
+            if result is not None:
+                break
+
+            quiet_plies = 0 if move_obj.moved_piece[1] == 'P' or move_obj.isReallyCaptured else quiet_plies + 1
+            seen[state.zobrist_hash] = seen.get(state.zobrist_hash, 0) + 1
+            if seen[state.zobrist_hash] >= REPETITIONS:
+                result, reason = '1/2-1/2', 'repetition'
+            elif quiet_plies >= FIFTY_MOVE_PLIES:
+                result, reason = '1/2-1/2', 'fifty moves'
+            elif is_insufficient_material(state):
+                result, reason = '1/2-1/2', 'insufficient material'
+    finally:
+        engine_a.close()
+        engine_b.close()
+
+    score = RESULT_SCORES[result]
+    return {'index': index, 'fen': fen, 'white': 'A' if a_is_white else 'B', 'result': result, 'reason': reason,
+            'score': score if a_is_white else 1.0 - score, 'plies': len(moves), 'moves': moves}
+
+
+# expected score of a player `elo` points stronger
+def expected_score(elo):
+    return 1.0 / (1.0 + 10.0 ** (-elo / 400.0))
+
+
+def score_to_elo(score):
+    score = min(max(score, 1e-6), 1.0 - 1e-6)
+    return 400.0 * math.log10(score / (1.0 - score))
+
+
+# Elo difference of A over B with its 95% interval, from (wins, draws, losses) of A
+def elo_difference(wins, draws, losses):
+    games = wins + draws + losses
+    if not games:
+        return 0.0, 0.0, 0.0
+    score = (wins + 0.5 * draws) / games
+    variance = (wins * (1.0 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+    margin = 1.96 * math.sqrt(variance / games)
+    return score_to_elo(score), score_to_elo(score - margin), score_to_elo(score + margin)
+
+
+# Log likelihood ratio of H1 (A is elo1 stronger) against H0 (elo0 stronger), in the normal
+# approximation of the game scores (the GSPRT of fishtest); 0 until the scores vary
+def sprt_llr(wins, draws, losses, elo0, elo1):
+    games = wins + draws + losses
+    if not games:
+        return 0.0
+    score = (wins + 0.5 * draws) / games
+    variance = (wins * (1.0 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+    if variance <= 0:
+        return 0.0
+    score0, score1 = expected_score(elo0), expected_score(elo1)
+    return (score1 - score0) * (2.0 * score - score0 - score1) * games / (2.0 * variance)
+
+
+# (lower, upper) LLR bounds: below lower H0 is accepted, above upper H1
+def sprt_bounds(alpha, beta):
+    return math.log(beta / (1.0 - alpha)), math.log((1.0 - beta) / alpha)
+
+
+class Match_Result:
+    # Wins, draws and losses of engine A, the Elo estimate and the SPRT state
+
+    def __init__(self, elo0=0.0, elo1=10.0, alpha=0.05, beta=0.05):
+        self.elo0 = elo0
+        self.elo1 = elo1
+        self.lower, self.upper = sprt_bounds(alpha, beta)
+        self.wins = self.draws = self.losses = 0
+        self.reasons = {}
+
+    def add(self, record):
+        if record['score'] == 1.0:
+            self.wins += 1
+        elif record['score'] == 0.0:
+            self.losses += 1
+        else:
+            self.draws += 1
+        self.reasons[record['reason']] = self.reasons.get(record['reason'], 0) + 1
+
+    def games(self):
+        return self.wins + self.draws + self.losses
+
+    def llr(self):
+        return sprt_llr(self.wins, self.draws, self.losses, self.elo0, self.elo1)
+
+    # 'H1' (A is better by elo1), 'H0' (not better than elo0) or None while undecided
+    def decision(self):
+        llr = self.llr()
+        if llr >= self.upper:
+            return 'H1'
+        if llr <= self.lower:
+            return 'H0'
+        return None
+
+    def get_stats(self):
+        elo, elo_low, elo_high = elo_difference(self.wins, self.draws, self.losses)
+        return {
+            'games': self.games(), 'wins': self.wins, 'draws': self.draws, 'losses': self.losses,
+            'elo': round(elo, 1), 'elo_interval': [round(elo_low, 1), round(elo_high, 1)],
+            'llr': round(self.llr(), 3), 'bounds': [round(self.lower, 3), round(self.upper, 3)],
+            'elo0': self.elo0, 'elo1': self.elo1, 'decision': self.decision(), 'reasons': dict(self.reasons),
+        }
+
+
+# (index, fen, a_is_white) of every game: each opening twice with the colors swapped, the
+# openings repeated in order until `games` are scheduled
+def schedule_games(openings, games):
+    return [(index, openings[index // 2 % len(openings)], index % 2 == 0) for index in range(games)]
+
+
+# Play engine A (options_a) against B over a process pool. Records are yielded as games finish,
+# with the Match_Result updated; the match stops early once the SPRT accepts either hypothesis
+def run_match(options_a, options_b, openings=OPENINGS, games=100, movetime=None, game_time=None, increment=0.0,
+              backend='list', processes=None, result=None, max_depth=MAX_DEPTH):
+    if movetime is None and game_time is None:
+        raise Exception("Either a time per move or a game time is required")
+    if backend not in BACKENDS:
+        raise Exception(f"Unknown backend '{backend}'")
+    if not openings:
+        raise Exception("No opening positions")
+    result = result or Match_Result()
+    processes = processes or os.cpu_count() or 1
+    jobs = iter(schedule_games(list(openings), games))
+
+    # one game per process at a time, the engines would compete for the CPU otherwise
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        pending = set()
+        try:
+            while True:
+                if result.decision() is None:
+                    for index, fen, a_is_white in itertools.islice(jobs, processes - len(pending)):
+                        pending.add(pool.submit(play_game, index, fen, a_is_white, options_a, options_b,
+                                                movetime, game_time, increment, backend, max_depth))
+                if not pending:
+                    break
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    record = future.result()
+                    result.add(record)
+                    yield record
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+# "10+0.1" -> (10.0, 0.1) seconds per side and increment
+def parse_time_control(text):
+    base, _, increment = text.partition('+')
+    return float(base), float(increment or 0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Self-play match of two engine configurations with an SPRT stop")
+    parser.add_argument('--option-a', action='append', default=[], metavar='NAME=VALUE',
+                        help="Engine keyword argument of engine A, e.g. use_staged_generation=true (repeatable)")
+    parser.add_argument('--option-b', action='append', default=[], metavar='NAME=VALUE',
+                        help="Engine keyword argument of engine B (repeatable)")
+    parser.add_argument('--openings', help="file with one FEN (or id;FEN) per line, a built-in set by default")
+    parser.add_argument('--games', type=int, default=200, help="most games to play")
+    parser.add_argument('--movetime', type=float, help="seconds per move")
+    parser.add_argument('--tc', help="game time per side in seconds, with an optional increment, e.g. 10+0.1")
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default='list')
+    parser.add_argument('--processes', type=int, help="games played at once, defaults to the CPU count")
+    parser.add_argument('--elo0', type=float, default=0.0, help="SPRT H0: A is not this much stronger")
+    parser.add_argument('--elo1', type=float, default=10.0, help="SPRT H1: A is at least this much stronger")
+    parser.add_argument('--alpha', type=float, default=0.05)
+    parser.add_argument('--beta', type=float, default=0.05)
+    parser.add_argument('--output', help="write one JSON line per game here")
+    args = parser.parse_args(argv)
+
+    if args.movetime is None and args.tc is None:
+        parser.error("one of --movetime or --tc is required")
+    game_time, increment = parse_time_control(args.tc) if args.tc else (None, 0.0)
+    openings = OPENINGS
+    if args.openings:
+        with open(args.openings) as source:
+            openings = [position if isinstance(position, str) else position[1] for position in read_positions(source)]
+    options_a = dict(parse_option(option) for option in args.option_a)
+    options_b = dict(parse_option(option) for option in args.option_b)
+
+    result = Match_Result(args.elo0, args.elo1, args.alpha, args.beta)
+    output = open(args.output, 'w') if args.output else None
+    try:
+        for record in run_match(options_a, options_b, openings, args.games, args.movetime, game_time, increment,
+                                args.backend, args.processes, result):
+            if output is not None:
+                output.write(json.dumps(record) + '\n')
+                output.flush()
+            stats = result.get_stats()
+            side = 'white' if record['white'] == 'A' else 'black'
+            print(f"game {record['index'] + 1}: {record['result']} ({record['reason']}, A {side}) "
+                  f"+{stats['wins']} ={stats['draws']} -{stats['losses']} elo {stats['elo']:+.1f} "
+                  f"llr {stats['llr']:.2f} {stats['bounds']}")
+    finally:
+        if output is not None:
+            output.close()
+
+    stats = result.get_stats()
+    low, high = stats['elo_interval']
+    print(f"\n{stats['games']} games: +{stats['wins']} ={stats['draws']} -{stats['losses']}, "
+          f"elo {stats['elo']:+.1f} [{low:+.1f}, {high:+.1f}]")
+    print("end reasons:", ', '.join(f"{reason} {count}" for reason, count in sorted(stats['reasons'].items())))
+    if stats['decision'] == 'H1':
+        print(f"SPRT: H1 accepted, A is at least {args.elo1:g} Elo stronger")
+    elif stats['decision'] == 'H0':
+        print(f"SPRT: H0 accepted, A is not {args.elo1:g} Elo stronger")
+    else:
+        print(f"SPRT: undecided after {stats['games']} games (llr {stats['llr']:.2f}, bounds {stats['bounds']})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
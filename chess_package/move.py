@@ -1,7 +1,31 @@
-import copy
+# piece codes shared by the packed move encoding and the position snapshots
+PIECE_CODES = ('--', 'wP', 'wN', 'wB', 'wR', 'wQ', 'wK', 'bP', 'bN', 'bB', 'bR', 'bQ', 'bK')
+PIECE_TO_CODE = {piece: code for code, piece in enumerate(PIECE_CODES)}
+
+# flag bits of the packed encoding, above from (6 bits), to (6), piece (4) and captured piece (4)
+PROMOTED_FLAG = 1 << 20
+CAPTURED_FLAG = 1 << 21
+CASTLED_FLAG = 1 << 22
+
+
+# (start_row, start_col, end_row, end_col) <-> 12 bit int, the from/to part of a packed move
+def pack_move(move):
+    return (move[0] * 8 + move[1]) | ((move[2] * 8 + move[3]) << 6)
+
+
+def unpack_move(code):
+    start, end = code & 63, (code >> 6) & 63
+    return (start >> 3, start & 7, end >> 3, end & 7)
+
 
 class Move:
-    def __init__(self, start_row, start_col, end_row, end_col, moved_piece, captured_piece, isCheck=False, isPromoted=False, isReallyCaptured=False, hasCastled=False, prevCastlingRight=None):
+    # fixed attributes, no per-move __dict__; make_move builds one per call
+    __slots__ = ('start_row', 'start_col', 'end_row', 'end_col', 'moved_piece', 'captured_piece',
+                 'isCheck', 'isPromoted', 'isReallyCaptured', 'hasCastled', 'prevCastlingRight',
+                 'hashDelta', 'materialDelta', 'positionalDelta')
+
+    # prevCastlingRight is the 4 bit castling mask from before the move
+    def __init__(self, start_row, start_col, end_row, end_col, moved_piece, captured_piece, isCheck=False, isPromoted=False, isReallyCaptured=False, hasCastled=False, prevCastlingRight=0, hashDelta=0, materialDelta=0, positionalDelta=0):
         self.start_row = start_row
         self.start_col = start_col
         self.end_row = end_row
@@ -12,7 +36,30 @@ class Move:
         self.isPromoted = isPromoted
         self.isReallyCaptured = isReallyCaptured
         self.hasCastled = hasCastled
-        self.prevCastlingRight = copy.deepcopy(prevCastlingRight)
+        self.prevCastlingRight = prevCastlingRight
+        self.hashDelta = hashDelta
+        self.materialDelta = materialDelta
+        self.positionalDelta = positionalDelta
+
+    # the move as one int: squares, moved and captured piece codes and the flags
+    def encode(self):
+        code = pack_move((self.start_row, self.start_col, self.end_row, self.end_col))
+        code |= PIECE_TO_CODE[self.moved_piece] << 12 | PIECE_TO_CODE[self.captured_piece] << 16
+        if self.isPromoted:
+            code |= PROMOTED_FLAG
+        if self.isReallyCaptured:
+            code |= CAPTURED_FLAG
+        if self.hasCastled:
+            code |= CASTLED_FLAG
+        return code
+
+    # Move from encode(); the undo deltas are not part of the encoding
+    @classmethod
+    def decode(cls, code):
+        start_row, start_col, end_row, end_col = unpack_move(code)
+        return cls(start_row, start_col, end_row, end_col, PIECE_CODES[(code >> 12) & 15], PIECE_CODES[(code >> 16) & 15],
+                   isPromoted=bool(code & PROMOTED_FLAG), isReallyCaptured=bool(code & CAPTURED_FLAG),
+                   hasCastled=bool(code & CASTLED_FLAG))
 
     def __str__(self):
         return f"{self.moved_piece} from ({self.start_row},{self.start_col}) to ({self.end_row},{self.end_col}) {', captured ' + self.captured_piece if self.isReallyCaptured else ''}"
@@ -0,0 +1,189 @@
+import argparse
+import csv
+import json
+import sys
+import time
+
+from . import BACKENDS
+from .chess import Chess_State
+
+START_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+
+# shortest record (seconds) compared on its own in regression mode
+MIN_RECORD_TIME = 0.05
+
+# Standard perft positions with their published node counts. The engine has no
+# en passant and only promotes to a queen, so each position is only listed up to
+# the depth where neither rule shows up yet and the published count still holds.
+# At the first depth with en passant captures, those are all leaves: the count is
+# the published one minus them (kiwipete 2039 - 1, position3 2812 - 2).
+REFERENCE_POSITIONS = [
+    ('startpos', START_FEN, [20, 400, 8902, 197281]),
+    ('kiwipete', 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1', [48, 2038]),
+    ('position3', '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1', [14, 191, 2810]),
+    ('position4', 'r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1', [6]),
+    ('position6', 'r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10', [46, 2079, 89890]),
+]
+
+
+# count leaf nodes of the legal move tree; with `validate` every node also
+# compares the generator against the make/undo reference generator
+def perft(state: Chess_State, depth, is_white_turn, validate=False):
+    if depth == 0:
+        return 1
+    moves = state.get_all_valid_moves(is_white_turn)
+    if validate:
+        reference = state.get_all_valid_moves_by_make_undo(is_white_turn)
+        if sorted(moves) != sorted(reference):
+            raise Exception(f"Move generator mismatch, missing {set(reference) - set(moves)}, "
+                            f"extra {set(moves) - set(reference)}")
+    # bulk counting: the leaves are the moves themselves
+    if depth == 1 and not validate:
+        return len(moves)
+
+    nodes = 0
+    for sr, sc, er, ec in moves:
+        move_obj = state.make_move(sr, sc, er, ec)
+        nodes += perft(state, depth - 1, not is_white_turn, validate)
+        state.undo_move(move_obj)
+    return nodes
+
+
+# perft split by root move, as {'e2e4': nodes, ...}
+def divide(state: Chess_State, depth, is_white_turn, validate=False):
+    results = {}
+    for sr, sc, er, ec in state.get_all_valid_moves(is_white_turn):
+        move_obj = state.make_move(sr, sc, er, ec)
+        results[state.index_to_algebraic(sr, sc, er, ec)] = perft(state, depth - 1, not is_white_turn, validate)
+        state.undo_move(move_obj)
+    return results
+
+
+# run one perft and time it, the position must come back unchanged
+def run_perft(fen, depth, backend='list', validate=False):
+    state = BACKENDS[backend]()
+    state.load_fen(fen)
+    key_before = state.zobrist_hash
+
+    start_time = time.perf_counter()
+    nodes = perft(state, depth, state.white_to_move, validate)
+    elapsed = time.perf_counter() - start_time
+
+    if state.zobrist_hash != key_before or state.compute_zobrist_hash() != key_before:
+        raise Exception("Position changed during perft, make_move/undo_move are out of sync")
+    return nodes, elapsed
+
+
+# run every reference position up to `max_depth` and return one record per (position, depth)
+def run_suite(max_depth, backend='list', validate=False, positions=REFERENCE_POSITIONS):
+    records = []
+    for name, fen, counts in positions:
+        for depth, expected in enumerate(counts[:max_depth], start=1):
+            nodes, elapsed = run_perft(fen, depth, backend, validate)
+            records.append(make_record(name, backend, depth, nodes, expected, elapsed))
+    return records
+
+
+def make_record(name, backend, depth, nodes, expected, elapsed):
+    return {
+        'name': name,
+        'backend': backend,
+        'depth': depth,
+        'nodes': nodes,
+        'expected': expected,
+        'ok': expected is None or nodes == expected,
+        'time': round(elapsed, 6),
+        'nps': round(nodes / elapsed) if elapsed > 0 else 0,
+    }
+
+
+def total_nps(records):
+    nodes = sum(record['nodes'] for record in records)
+    elapsed = sum(record['time'] for record in records)
+    return nodes / elapsed if elapsed > 0 else 0
+
+
+def write_records(records, path):
+    if path.endswith('.csv'):
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(records[0].keys()))
+            writer.writeheader()
+            writer.writerows(records)
+    else:
+        with open(path, 'w') as f:
+            json.dump({'records': records, 'total_nps': round(total_nps(records))}, f, indent=2)
+
+
+# compare against a stored JSON run; returns the failure messages (empty when fine).
+# Records that ran under `min_time` seconds in either run are too short to time reliably,
+# they only count towards the total
+def check_regression(records, baseline_path, max_drop_percent, min_time=MIN_RECORD_TIME):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+
+    failures = []
+    previous = {(r['name'], r['depth']): r for r in baseline['records']}
+    for record in records:
+        old = previous.get((record['name'], record['depth']))
+        if old is None or not old['nps'] or min(old['time'], record['time']) < min_time:
+            continue
+        drop = 100.0 * (old['nps'] - record['nps']) / old['nps']
+        if drop > max_drop_percent:
+            failures.append(f"{record['name']} depth {record['depth']}: {record['nps']} nps, "
+                            f"{drop:.1f}% below baseline {old['nps']}")
+
+    old_total = baseline.get('total_nps') or total_nps(baseline['records'])
+    new_total = total_nps(records)
+    if old_total and 100.0 * (old_total - new_total) / old_total > max_drop_percent:
+        failures.append(f"total: {new_total:.0f} nps against baseline {old_total:.0f}")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Perft move generation benchmark and correctness suite")
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default='list')
+    parser.add_argument('--depth', type=int, default=3, help="maximum depth (per position for the suite)")
+    parser.add_argument('--fen', help="run a single position instead of the reference suite")
+    parser.add_argument('--divide', action='store_true', help="print node counts per root move (with --fen)")
+    parser.add_argument('--validate', action='store_true', help="cross-check every node against make/undo generation")
+    parser.add_argument('--output', help="write the records to a .json or .csv file")
+    parser.add_argument('--baseline', help="JSON output of an earlier run to compare throughput against")
+    parser.add_argument('--max-drop', type=float, default=10.0, help="allowed NPS drop against the baseline, in percent")
+    parser.add_argument('--min-time', type=float, default=MIN_RECORD_TIME,
+                        help="records faster than this (seconds) only count towards the total NPS")
+    args = parser.parse_args(argv)
+
+    if args.fen:
+        state = BACKENDS[args.backend]()
+        state.load_fen(args.fen)
+        if args.divide:
+            results = divide(state, args.depth, state.white_to_move, args.validate)
+            for move, nodes in results.items():
+                print(f"{move}: {nodes}")
+            print(f"\nmoves: {len(results)}\nnodes: {sum(results.values())}")
+            return 0
+        nodes, elapsed = run_perft(args.fen, args.depth, args.backend, args.validate)
+        records = [make_record('fen', args.backend, args.depth, nodes, None, elapsed)]
+    else:
+        records = run_suite(args.depth, args.backend, args.validate)
+
+    failed = False
+    for record in records:
+        status = 'ok' if record['ok'] else f"FAIL (expected {record['expected']})"
+        print(f"{record['name']:<10} depth {record['depth']}: {record['nodes']:>9} nodes "
+              f"{record['time']:>9.3f}s {record['nps']:>8} nps  {status}")
+        failed = failed or not record['ok']
+    print(f"total: {total_nps(records):.0f} nps")
+
+    if args.output:
+        write_records(records, args.output)
+    if args.baseline:
+        failures = check_regression(records, args.baseline, args.max_drop, args.min_time)
+        for failure in failures:
+            print(f"regression: {failure}")
+        failed = failed or bool(failures)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
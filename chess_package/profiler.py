@@ -0,0 +1,198 @@
+import argparse
+import cProfile
+import inspect
+import io
+import json
+import pstats
+import sys
+import time
+
+from . import BACKENDS
+from .engine import Engine
+
+# position methods timed per phase; a phase called inside another one (the check
+# detection inside move generation) is only counted in the inner phase
+STATE_PHASES = {
+    'move_generation': ('generate_legal_moves', 'get_all_pseudo_legal_captures', 'get_all_valid_promotions'),
+    'legality': ('find_checks_and_pins', '_checks_and_pins', 'is_king_in_check', 'is_square_attacked', 'is_legal_move'),
+    'make_undo': ('make_move', 'undo_move', 'make_null_move', 'undo_null_move'),
+    'evaluation': ('evaluate_board',),
+    'exchange': ('static_exchange_evaluation',),
+}
+
+# engine methods timed per phase, quiescence only keeps the time not spent in the phases above.
+# With staged generation (the default) the ordering is the work of the staged_moves generator
+ENGINE_PHASES = {
+    'ordering': ('order_moves', 'staged_moves'),
+    'quiescence': ('quiescence_search',),
+}
+
+PHASES = tuple(STATE_PHASES) + tuple(ENGINE_PHASES)
+
+
+class Search_Profiler:
+    # Calls and exclusive seconds per phase, plus main search nodes per ply. The methods are
+    # wrapped on the position and engine instances only while a search runs, so an engine
+    # without a profiler runs the plain methods.
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.calls = dict.fromkeys(PHASES, 0)
+        self.times = dict.fromkeys(PHASES, 0.0)
+        self.nodes_per_ply = {}
+        self.search_time = 0.0
+        # time spent in nested timed calls, one slot per open call
+        self.child_times = []
+        self.start_time = None
+
+    def wrap(self, phase, method):
+        calls, times, child_times = self.calls, self.times, self.child_times
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            child_times.append(0.0)
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                times[phase] += elapsed - child_times.pop()
+                calls[phase] += 1
+                if child_times:
+                    child_times[-1] += elapsed
+        return timed
+
+    # a generator is timed while it works out its next item, not while the caller uses it;
+    # it counts as one call however many items it yields
+    def wrap_generator(self, phase, method):
+        calls, times, child_times = self.calls, self.times, self.child_times
+
+        def timed(*args, **kwargs):
+            generator = method(*args, **kwargs)
+            calls[phase] += 1
+            try:
+                while True:
+                    start = time.perf_counter()
+                    child_times.append(0.0)
+                    try:
+                        item = next(generator)
+                    except StopIteration:
+                        return
+                    finally:
+                        elapsed = time.perf_counter() - start
+                        times[phase] += elapsed - child_times.pop()
+                        if child_times:
+                            child_times[-1] += elapsed
+                    yield item
+            finally:
+                generator.close()
+        return timed
+
+    def patch(self, target, phases):
+        names = []
+        for phase, methods in phases.items():
+            for name in methods:
+                if hasattr(target, name):
+                    method = getattr(target, name)
+                    wrap = self.wrap_generator if inspect.isgeneratorfunction(method) else self.wrap
+                    setattr(target, name, wrap(phase, method))
+                    names.append(name)
+        return names
+
+    # wrap the methods of the position and the engine for one search
+    def attach(self, state, engine):
+        # pickling or cloning the position leaves the wrappers behind (see Chess_State.__getstate__)
+        state._profiled = self.patch(state, STATE_PHASES)
+        engine._profiled = self.patch(engine, ENGINE_PHASES)
+        self.start_time = time.perf_counter()
+
+    def detach(self, state, engine):
+        if self.start_time is not None:
+            self.search_time += time.perf_counter() - self.start_time
+            self.start_time = None
+        for target in (state, engine):
+            for name in target.__dict__.pop('_profiled', ()):
+                target.__dict__.pop(name, None)
+
+    def count_node(self, ply):
+        self.nodes_per_ply[ply] = self.nodes_per_ply.get(ply, 0) + 1
+
+    # add the counters of a search process
+    def merge(self, stats):
+        for phase, row in stats['phases'].items():
+            self.calls[phase] += row['calls']
+            self.times[phase] += row['time']
+        for ply, count in stats['nodes_per_ply'].items():
+            self.nodes_per_ply[ply] = self.nodes_per_ply.get(ply, 0) + count
+
+    def get_stats(self):
+        # phase times of search processes are summed in, so they can add up to more than search_time
+        timed = sum(self.times.values())
+        return {
+            'search_time': round(self.search_time, 6),
+            'phases': {phase: {'calls': self.calls[phase], 'time': round(self.times[phase], 6)} for phase in PHASES},
+            'other_time': round(max(self.search_time - timed, 0.0), 6),
+            'nodes_per_ply': dict(sorted(self.nodes_per_ply.items())),
+        }
+
+
+# append one JSON record per line
+def append_record(path, record):
+    with open(path, 'a') as f:
+        f.write(json.dumps(record) + '\n')
+
+
+# run a fixed depth search under cProfile: (best move, report sorted by `sort`)
+def profile_search(engine: Engine, state, depth, is_white_move, sort='cumulative', limit=30):
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        move = engine.get_best_move(state, depth, is_white_move)
+    finally:
+        profile.disable()
+    report = io.StringIO()
+    pstats.Stats(profile, stream=report).sort_stats(sort).print_stats(limit)
+    return move, report.getvalue()
+
+
+def print_phases(stats):
+    profile = stats['profile']
+    print(f"search {profile['search_time']:.3f}s, {stats['node_cnt']} nodes, {stats['qnode_cnt']} qnodes "
+          f"(quiescence share {stats['qnode_share']})")
+    for phase, row in profile['phases'].items():
+        print(f"{phase:<16} {row['calls']:>9} calls {row['time']:>9.3f}s")
+    print(f"{'other':<16} {'':>15} {profile['other_time']:>9.3f}s")
+    print("nodes per ply:", ' '.join(f"{ply}:{count}" for ply, count in profile['nodes_per_ply'].items()))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-phase profile of one search")
+    parser.add_argument('--fen', help="position to search, the starting position by default")
+    parser.add_argument('--depth', type=int, default=4)
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default='list')
+    parser.add_argument('--cprofile', action='store_true', help="print a cProfile report instead of the phase times")
+    parser.add_argument('--sort', default='cumulative', help="cProfile sort key, e.g. tottime")
+    parser.add_argument('--limit', type=int, default=30, help="functions in the cProfile report")
+    parser.add_argument('--output', help="append the search record to this JSON lines file")
+    args = parser.parse_args(argv)
+
+    state = BACKENDS[args.backend]()
+    if args.fen:
+        state.load_fen(args.fen)
+    # the phase timers would show up in the cProfile report, so it runs without them
+    engine = Engine(profile=not args.cprofile, profile_log=args.output)
+    try:
+        if args.cprofile:
+            _, report = profile_search(engine, state, args.depth, state.white_to_move, args.sort, args.limit)
+            print(report)
+        else:
+            engine.get_best_move(state, args.depth, state.white_to_move)
+            print_phases(engine.get_stats())
+    finally:
+        engine.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+import argparse
+import copy
+import json
+import pickle
+import sys
+import time
+import tracemalloc
+
+from . import BACKENDS
+from .benchmark import SEARCH_POSITIONS
+
+
+# microseconds per call of `function`, best of `repeat` runs of `number` calls
+def time_call(function, number, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        for _ in range(number):
+            function()
+        elapsed = time.perf_counter() - start_time
+        best = elapsed if best is None else min(best, elapsed)
+    return best / number * 1e6
+
+
+# one make_move/undo_move pair per legal move: mean microseconds, and mean peak bytes
+# allocated while the pair runs (measured in a separate pass, tracemalloc slows it down)
+def measure_make_undo(state, number):
+    moves = state.get_all_valid_moves(state.white_to_move)
+    if not moves:
+        return None, None
+
+    def make_undo_all():
+        for move in moves:
+            state.undo_move(state.make_move(*move))
+
+    micros = time_call(make_undo_all, max(number // len(moves), 1)) / len(moves)
+    total = 0
+    # tracing restarts for every pair, so the peak starts from zero (reset_peak needs Python 3.9)
+    for move in moves:
+        tracemalloc.start()
+        try:
+            state.undo_move(state.make_move(*move))
+            total += tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return micros, round(total / len(moves))
+
+
+# clone and serialize costs of one position, each as (microseconds per call, bytes);
+# bytes are the serialized size, or the allocation per pair for make_undo
+def measure_state(state, number):
+    backend = state.__class__
+    pickled = pickle.dumps(state, pickle.HIGHEST_PROTOCOL)
+    fen = state.to_fen()
+    snapshot = state.to_snapshot()
+    target = backend()
+
+    return {
+        'deepcopy': (time_call(lambda: copy.deepcopy(state), number), None),
+        'clone': (time_call(state.clone, number), None),
+        'pickle_dump': (time_call(lambda: pickle.dumps(state, pickle.HIGHEST_PROTOCOL), number), len(pickled)),
+        'pickle_load': (time_call(lambda: pickle.loads(pickled), number), len(pickled)),
+        'fen_dump': (time_call(state.to_fen, number), len(fen)),
+        'fen_load': (time_call(lambda: target.load_fen(fen), number), len(fen)),
+        'snapshot_dump': (time_call(state.to_snapshot, number), len(snapshot)),
+        'snapshot_load': (time_call(lambda: target.load_snapshot(snapshot), number), len(snapshot)),
+        'make_undo': measure_make_undo(state, number),
+    }
+
+
+def run_state_benchmark(backend='list', number=2000, positions=SEARCH_POSITIONS, verbose=True):
+    records = []
+    for name, category, fen in positions:
+        state = BACKENDS[backend]()
+        state.load_fen(fen)
+        for operation, (micros, size) in measure_state(state, number).items():
+            if micros is None:
+                continue
+            record = {'name': name, 'backend': backend, 'operation': operation,
+                      'us_per_call': round(micros, 3), 'bytes': size}
+            records.append(record)
+            if verbose:
+                print(f"{name:<13} {operation:<14} {micros:>9.2f} us" + (f" {size:>5} bytes" if size else ""))
+    return records
+
+
+# mean microseconds and bytes per operation over all positions
+def summarize(records):
+    totals = {}
+    for record in records:
+        totals.setdefault(record['operation'], []).append(record)
+    summary = {}
+    for operation, rows in totals.items():
+        sizes = [row['bytes'] for row in rows if row['bytes'] is not None]
+        summary[operation] = {
+            'us_per_call': round(sum(row['us_per_call'] for row in rows) / len(rows), 3),
+            'bytes': round(sum(sizes) / len(sizes)) if sizes else None,
+        }
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Clone and serialization cost of positions")
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default='list')
+    parser.add_argument('--number', type=int, default=2000, help="calls per timing run")
+    parser.add_argument('--output', help="write the records as JSON")
+    args = parser.parse_args(argv)
+
+    records = run_state_benchmark(args.backend, args.number)
+    summary = summarize(records)
+    print("\nmean per call (make_undo: per make/undo pair):")
+    baseline = summary['deepcopy']['us_per_call']
+    for operation, result in summary.items():
+        micros, size = result['us_per_call'], result['bytes']
+        print(f"{operation:<14} {micros:>9.2f} us  ({baseline / micros:.1f}x deepcopy)" + (f" {size:>5} bytes" if size else ""))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'backend': args.backend, 'summary': summary, 'records': records}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
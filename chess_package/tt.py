@@ -0,0 +1,154 @@
+import ctypes
+import multiprocessing
+from array import array
+
+from .move import pack_move, unpack_move
+
+# Entry layout: the zobrist key xor the data word in one 64 bit word, everything else packed
+# in the data word; an entry half written by another process then fails the key check
+#   bits 0-11  move (pack_move)       bit 12     a move is stored
+#   bits 13-14 bound flag (0 = empty) bits 15-22 depth
+#   bits 23-30 age (search number)    bit 31     white to move
+#   bits 32-63 score in thousandths of a pawn, offset to stay unsigned
+ENTRY_BYTES = 16
+FLAG_CODES = {'EXACT': 1, 'LOWERBOUND': 2, 'UPPERBOUND': 3}
+CODE_FLAGS = (None, 'EXACT', 'LOWERBOUND', 'UPPERBOUND')
+MOVE_BIT = 1 << 12
+WHITE_BIT = 1 << 31
+AGE_SHIFT = 23
+SCORE_SCALE = 1000
+SCORE_OFFSET = 1 << 31
+# a shared table counts its entries over this many slots, other processes write to it too
+FILL_SAMPLE_SLOTS = 4096
+
+
+class Transposition_Table:
+    # Fixed size {(zobrist key, is_white): (score, flag, depth, move)} table in two flat
+    # arrays, sized from a memory budget. A key maps to a bucket of two slots (key modulo
+    # the bucket count): the first keeps the deepest entry of the current search, the
+    # second always takes what the first turned down. Entries of earlier searches
+    # (another age) are replaced first.
+    # shared=True puts the arrays in shared memory, search processes attach to them by
+    # passing `buffers` (of the table in the main process) and all use the same entries.
+
+    def __init__(self, size_mb=16, shared=False, buffers=None):
+        self.size_mb = size_mb
+        self.buckets = max(int(size_mb * 1024 * 1024) // (2 * ENTRY_BYTES), 1)
+        self.slots = 2 * self.buckets
+        self.age = 0
+        self.buffers = buffers
+        if shared and buffers is None:
+            self.buffers = (multiprocessing.RawArray('Q', self.slots), multiprocessing.RawArray('Q', self.slots))
+        if self.buffers is not None:
+            if len(self.buffers[0]) != self.slots:
+                raise Exception(f"Shared table of {len(self.buffers[0])} slots attached as a {size_mb} MB table")
+            self.keys, self.data = (memoryview(buffer).cast('B').cast('Q') for buffer in self.buffers)
+        # attaching keeps what the other processes stored
+        self.used = 0
+        self.reset_stats()
+        if buffers is None:
+            self.clear()
+
+    def clear(self):
+        if self.buffers is not None:
+            for buffer in self.buffers:
+                ctypes.memset(buffer, 0, ctypes.sizeof(buffer))
+        else:
+            self.keys = array('Q', [0]) * self.slots
+            self.data = array('Q', [0]) * self.slots
+        self.used = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stores = 0
+        self.collisions = 0
+
+    # a new search: what the table holds now ages and is evicted before newer entries
+    def new_search(self):
+        self.age = (self.age + 1) & 255
+
+    def __len__(self):
+        if self.buffers is None:
+            return self.used
+        # shared: the other processes' entries are not in `used`, count the occupied slots
+        sample = min(self.slots, FILL_SAMPLE_SLOTS)
+        occupied = sum(1 for entry in self.data[:sample] if entry)
+        return occupied if sample == self.slots else round(occupied * self.slots / sample)
+
+    def find(self, key, is_white):
+        # slot of the position, -1 when it is not stored
+        slot = key % self.buckets * 2
+        white = WHITE_BIT if is_white else 0
+        keys, data = self.keys, self.data
+        entry = data[slot]
+        if entry and keys[slot] ^ entry == key and entry & WHITE_BIT == white:
+            return slot
+        entry = data[slot + 1]
+        if entry and keys[slot + 1] ^ entry == key and entry & WHITE_BIT == white:
+            return slot + 1
+        return -1
+
+    def get(self, tt_key, default=None):
+        index = self.find(*tt_key)
+        if index < 0:
+            return default
+        entry = self.data[index]
+        # another process may have replaced the entry since it was found
+        if self.buffers is not None and (self.keys[index] ^ entry != tt_key[0]
+                                         or bool(entry & WHITE_BIT) != bool(tt_key[1])):
+            return default
+        return (((entry >> 32) - SCORE_OFFSET) / SCORE_SCALE, CODE_FLAGS[(entry >> 13) & 3], (entry >> 15) & 255,
+                unpack_move(entry & 4095) if entry & MOVE_BIT else None)
+
+    def __getitem__(self, tt_key):
+        entry = self.get(tt_key)
+        if entry is None:
+            raise KeyError(tt_key)
+        return entry
+
+    def __contains__(self, tt_key):
+        return self.find(*tt_key) >= 0
+
+    def __setitem__(self, tt_key, value):
+        key, is_white = tt_key
+        score, flag, depth, move = value
+        age = self.age
+        white = WHITE_BIT if is_white else 0
+        entry = ((round(score * SCORE_SCALE) + SCORE_OFFSET) << 32 | age << AGE_SHIFT | white
+                 | min(depth, 255) << 15 | FLAG_CODES[flag] << 13)
+        if move is not None:
+            entry |= MOVE_BIT | pack_move(move)
+
+        slot = key % self.buckets * 2
+        keys, data = self.keys, self.data
+        first = data[slot]
+        # depth-preferred slot: empty, older search, same position or not deeper than this one
+        if not first or (first >> AGE_SHIFT) & 255 != age or (keys[slot] ^ first == key and first & WHITE_BIT == white) \
+                or depth >= (first >> 15) & 255:
+            index = slot
+            second = data[slot + 1]
+            # the same position in the always-replace slot is now out of date
+            if second and keys[slot + 1] ^ second == key and second & WHITE_BIT == white:
+                data[slot + 1] = 0
+                self.used -= 1
+        else:
+            index = slot + 1
+        old = data[index]
+        if not old:
+            self.used += 1
+        elif (old >> AGE_SHIFT) & 255 == age and (keys[index] ^ old != key or old & WHITE_BIT != white):
+            self.collisions += 1
+        keys[index] = key ^ entry
+        data[index] = entry
+        self.stores += 1
+
+    def update(self, entries):
+        for tt_key, value in entries.items():
+            self[tt_key] = value
+
+    def fill_rate(self):
+        return len(self) / self.slots
+
+    def get_stats(self):
+        return {'size_mb': self.size_mb, 'slots': self.slots, 'used': len(self),
+                'fill_rate': round(self.fill_rate(), 4), 'stores': self.stores, 'collisions': self.collisions}
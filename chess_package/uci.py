@@ -0,0 +1,286 @@
+import sys
+import threading
+import time
+
+from . import BACKENDS
+from .engine import Engine
+
+ENGINE_NAME = 'Chess-Engine'
+ENGINE_AUTHOR = 'divyanshuyadav-dev'
+
+# deepest iteration of a search without a depth limit (go infinite, ponder, clock)
+MAX_DEPTH = 64
+
+# name: (UCI option declaration, Engine keyword or None for options of the front-end)
+OPTIONS = {
+    'Hash': ('type spin default 16 min 1 max 1024', 'tt_size_mb'),
+    'Threads': ('type spin default 1 min 1 max 64', 'processes'),
+    'Ponder': ('type check default true', None),
+    'Backend': ('type combo default list var bitboard var list', None),
+    'BookFile': ('type string default <empty>', 'book'),
+}
+
+
+# "e7e8" -> "e7e8q" when it is a pawn reaching the last rank (the engine always promotes to a queen)
+def move_to_uci(state, move):
+    start_row, start_col, end_row, end_col = move
+    text = state.index_to_algebraic(start_row, start_col, end_row, end_col)
+    if state.board[start_row][start_col][1] == 'P' and end_row in (0, 7):
+        text += 'q'
+    return text
+
+
+# UCI score of a side to move score: centipawns, or moves to mate
+def format_score(score):
+    if abs(score) >= Engine.MATE_BOUND:
+        moves = (Engine.MATE_SCORE - abs(score) + 1) // 2
+        return f"mate {int(moves if score > 0 else -moves)}"
+    return f"cp {round(score * 100)}"
+
+
+# "go" arguments as a dict, e.g. {'wtime': 60000, 'infinite': True}
+def parse_go(tokens):
+    params = {}
+    index = 0
+    while index < len(tokens):
+        token = tokens[index]
+        if token in ('infinite', 'ponder'):
+            params[token] = True
+        elif token in ('depth', 'nodes', 'movetime', 'wtime', 'btime', 'winc', 'binc', 'movestogo') \
+                and index + 1 < len(tokens):
+            params[token] = int(tokens[index + 1])
+            index += 1
+        index += 1
+    return params
+
+
+# stdin lines read without the buffered reader: a search process forked while this thread
+# waits for input inherits the reader's lock held, and hangs when it closes stdin at startup
+def read_commands(stream=None):
+    raw = (stream or sys.stdin).buffer.raw
+    while True:
+        line = raw.readline()
+        if not line:
+            return
+        yield line.decode(errors='replace')
+
+
+class Uci_Protocol:
+    # UCI front-end: commands are read on the calling thread, the search runs in a
+    # background thread, so `isready`, `stop` and `ponderhit` are answered while it thinks
+
+    def __init__(self, output=sys.stdout):
+        self.output = output
+        self.output_lock = threading.Lock()
+        self.options = {'Hash': '16', 'Threads': '1', 'Ponder': 'true', 'Backend': 'list', 'BookFile': '<empty>'}
+        self.engine = None
+        self.state = self.new_state()
+        self.search_thread = None
+        # set by `stop`, ends the search
+        self.stop_event = None
+        # set by `stop` or `ponderhit`, lets an infinite or pondering search send its bestmove
+        self.release_event = None
+        self.pondering = False
+        self.ponder_budget = None
+        self.search_start = None
+
+    def send(self, line):
+        with self.output_lock:
+            self.output.write(line + '\n')
+            self.output.flush()
+
+    def new_state(self):
+        return BACKENDS[self.options['Backend']]()
+
+    def get_engine(self):
+        # built on first use after the options changed
+        if self.engine is None:
+            options = {}
+            for name, (_, keyword) in OPTIONS.items():
+                value = self.options[name]
+                if keyword == 'book':
+                    if value not in ('', '<empty>'):
+                        options[keyword] = value
+                elif keyword is not None:
+                    options[keyword] = int(value)
+            self.engine = Engine(**options)
+        return self.engine
+
+    def run(self, lines=None):
+        for line in (lines if lines is not None else read_commands()):
+            if not self.handle(line):
+                break
+        self.quit()
+
+    # one command, False once the front-end should exit
+    def handle(self, line):
+        tokens = line.split()
+        if not tokens:
+            return True
+        command, args = tokens[0], tokens[1:]
+        if command == 'uci':
+            self.send(f"id name {ENGINE_NAME}")
+            self.send(f"id author {ENGINE_AUTHOR}")
+            for name, (declaration, _) in OPTIONS.items():
+                self.send(f"option name {name} {declaration}")
+            self.send("uciok")
+        elif command == 'isready':
+            self.send("readyok")
+        elif command == 'setoption':
+            self.set_option(args)
+        elif command == 'ucinewgame':
+            self.wait_search()
+            if self.engine is not None:
+                self.engine.clear_transposition_table()
+            self.state = self.new_state()
+        elif command == 'position':
+            self.wait_search()
+            self.set_position(args)
+        elif command == 'go':
+            self.wait_search()
+            self.go(parse_go(args))
+        elif command == 'stop':
+            self.stop()
+        elif command == 'ponderhit':
+            self.ponderhit()
+        elif command == 'quit':
+            return False
+        else:
+            self.send(f"info string unknown command '{command}'")
+        return True
+
+    def set_option(self, args):
+        # setoption name <name with spaces> [value <value>]
+        if 'name' not in args:
+            return
+        value_at = args.index('value') if 'value' in args else len(args)
+        name = ' '.join(args[args.index('name') + 1:value_at])
+        value = ' '.join(args[value_at + 1:])
+        option = next((known for known in OPTIONS if known.lower() == name.lower()), None)
+        if option is None:
+            self.send(f"info string unknown option '{name}'")
+            return
+        self.wait_search()
+        self.options[option] = value
+        if option == 'Backend':
+            self.state = self.new_state()
+        elif OPTIONS[option][1] is not None and self.engine is not None:
+            self.engine.close()
+            self.engine = None
+
+    def set_position(self, args):
+        # position startpos|fen <fen> [moves <move> ...]
+        moves_at = args.index('moves') if 'moves' in args else len(args)
+        state = self.new_state()
+        if args and args[0] == 'fen':
+            state.load_fen(' '.join(args[1:moves_at]))
+        for text in args[moves_at + 1:]:
+            move = state.algebraic_to_index(text)
+            if move not in state.get_all_valid_moves(state.white_to_move):
+                self.send(f"info string illegal move '{text}'")
+                break
+            state.make_move(*move)
+        self.state = state
+
+    # seconds for this move from the go arguments, None when the search has no time limit
+    def time_budget(self, params, is_white):
+        if 'movetime' in params:
+            return params['movetime'] / 1000.0
+        remaining = params.get('wtime' if is_white else 'btime')
+        if remaining is None:
+            return None
+        increment = params.get('winc' if is_white else 'binc', 0)
+        return self.get_engine().allocate_time(remaining / 1000.0, increment / 1000.0, params.get('movestogo'))
+
+    def go(self, params):
+        state = self.state.clone()
+        budget = self.time_budget(params, state.white_to_move)
+        # without any limit the search runs until `stop`
+        infinite = params.get('infinite', False) or \
+            not any(key in params for key in ('depth', 'nodes', 'movetime', 'wtime', 'btime'))
+        self.pondering = params.get('ponder', False)
+        self.ponder_budget = budget
+        self.stop_event = threading.Event()
+        self.release_event = threading.Event()
+        self.search_start = time.perf_counter()
+        engine = self.get_engine()
+        self.search_thread = threading.Thread(
+            target=self.search, daemon=True,
+            args=(engine, state, params.get('depth', MAX_DEPTH), None if self.pondering or infinite else budget,
+                  params.get('nodes'), infinite or self.pondering))
+        self.search_thread.start()
+
+    def search(self, engine, state, max_depth, time_limit, node_limit, wait_for_release):
+        move = engine.get_best_move_iterative(state, max_depth, state.white_to_move, time_limit=time_limit,
+                                              node_limit=node_limit, stop_event=self.stop_event,
+                                              on_iteration=lambda depth, score, _: self.send_info(engine, state, depth, score))
+        line = list(engine.principle_list)
+        if move is not None:
+            best = (move.start_row, move.start_col, move.end_row, move.end_col)
+        else:
+            # stopped before the first iteration finished: any legal move
+            moves = state.get_all_valid_moves(state.white_to_move)
+            best = moves[0] if moves else None
+        # in infinite and ponder mode the bestmove must wait for `stop` or `ponderhit`
+        if wait_for_release:
+            self.release_event.wait()
+        if best is None:
+            self.send("bestmove 0000")
+            return
+        text = f"bestmove {move_to_uci(state, best)}"
+        if len(line) > 1 and line[0] == best and self.options['Ponder'] == 'true':
+            move_obj = state.make_move(*best)
+            text += f" ponder {move_to_uci(state, line[1])}"
+            state.undo_move(move_obj)
+        self.send(text)
+
+    def send_info(self, engine: Engine, state, depth, score):
+        elapsed = time.perf_counter() - self.search_start
+        nodes = engine.get_nodes()
+        # the PV in UCI notation, played out on the board for the promotion suffixes
+        pv = []
+        played = []
+        for move in engine.principle_list:
+            pv.append(move_to_uci(state, move))
+            played.append(state.make_move(*move))
+        for move_obj in reversed(played):
+            state.undo_move(move_obj)
+        self.send(f"info depth {depth} score {format_score(score)} nodes {nodes} "
+                  f"nps {round(nodes / elapsed) if elapsed > 0 else 0} time {round(elapsed * 1000)} "
+                  f"hashfull {round(engine.transposition_table.fill_rate() * 1000)} pv {' '.join(pv)}")
+
+    def stop(self):
+        if self.stop_event is not None:
+            self.stop_event.set()
+            self.release_event.set()
+
+    def ponderhit(self):
+        # the opponent played the expected move: the pondering search goes on, now on our clock
+        if self.search_thread is None or not self.pondering:
+            return
+        self.pondering = False
+        if self.ponder_budget is not None:
+            self.engine.set_time_limit(self.ponder_budget)
+        self.release_event.set()
+
+    def wait_search(self):
+        # a new command that needs the position or engine first ends the running search
+        if self.search_thread is not None:
+            self.stop()
+            self.search_thread.join()
+            self.search_thread = None
+
+    def quit(self):
+        self.wait_search()
+        if self.engine is not None:
+            self.engine.close()
+            self.engine = None
+
+
+def main():
+    Uci_Protocol().run()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
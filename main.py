@@ -2,8 +2,8 @@ from chess_package import *
 
 
 # quick play
-def play_game(depth):
-    state = Chess_State()
+def play_game(depth, backend='list'):
+    state = BACKENDS[backend]()
     engine = Engine()
 
     white_to_move = True
@@ -36,18 +36,19 @@ def play_game(depth):
                 break
             state.make_move(best_move.start_row, best_move.start_col,
                       best_move.end_row, best_move.end_col)
-            print(f"AI played:{best_move.moved_piece} {state.index_to_algebraic(best_move.start_row, best_move.start_col,
-                      best_move.end_row, best_move.end_col)}")
+            notation = state.index_to_algebraic(best_move.start_row, best_move.start_col,
+                      best_move.end_row, best_move.end_col)
+            print(f"AI played:{best_move.moved_piece} {notation}")
 
         white_to_move = not white_to_move
 
 
 
-def stats(depth):
+def stats(depth, backend='list'):
     # Tests
     import time
     engine = Engine()
-    state = Chess_State()
+    state = BACKENDS[backend]()
 
     start_time = time.perf_counter()
     move = engine.get_best_move(state, depth, True)
@@ -57,7 +58,9 @@ def stats(depth):
 
     print(f"depth:{depth}")
     print(f"search time {end_time-start_time}")
+    print(f"nodes per second:{engine.node_cnt / (end_time-start_time):.0f}")
     print(f"branches:{engine.branch}\nprunings:{engine.pruned}\nposition-hit:{engine.hit}\nnodes:{engine.node_cnt}")
+    print(f"first-move cutoff rate:{engine.get_stats()['first_move_cutoff_rate']}")
 
 
 
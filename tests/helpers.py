@@ -0,0 +1,32 @@
+import random
+
+from chess_package import Bitboard_State, Chess_State
+
+# Positions and helpers shared by the tests
+
+START_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+KIWIPETE = 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1'
+POSITION3 = '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1'
+POSITION6 = 'r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10'
+MIDDLEGAME = 'r1bq1rk1/pp2ppbp/2np1np1/8/3NP3/2N1BP2/PPPQ2PP/R3KB1R w KQ - 3 9'
+
+# both position backends, tests that take a state class run for each
+STATE_CLASSES = (Chess_State, Bitboard_State)
+
+
+# Seeded random games from each FEN, played on one state per class at once: the tuple of
+# states is yielded at the start and after every ply (the same objects, moved on in place)
+def random_games(fens, state_classes=STATE_CLASSES, games=1, plies=60, seed=0):
+    rng = random.Random(seed)
+    for fen in fens:
+        for _ in range(games):
+            states = tuple(state_class.from_fen(fen) for state_class in state_classes)
+            yield states
+            for _ in range(plies):
+                moves = states[0].get_all_valid_moves(states[0].white_to_move)
+                if not moves:
+                    break
+                move = rng.choice(moves)
+                for state in states:
+                    state.make_move(*move)
+                yield states
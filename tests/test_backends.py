@@ -0,0 +1,70 @@
+import unittest
+
+from chess_package import Bitboard_State, Engine, Move
+from helpers import KIWIPETE, MIDDLEGAME, POSITION3, START_FEN, STATE_CLASSES, random_games
+
+# castling both ways, promotions and captures on the rook squares
+FENS = (START_FEN, KIWIPETE, MIDDLEGAME, POSITION3, 'r3k2r/1P4P1/8/8/8/8/1p4p1/R3K2R w KQkq - 0 1')
+
+
+class Test_Backend_Order(unittest.TestCase):
+    # the bitboard backend lists moves in the list backend's order, so searches agree
+
+    def test_same_move_lists(self):
+        for lists, bitboards in random_games((START_FEN, KIWIPETE), games=10, plies=100, seed=7):
+            is_white = lists.white_to_move
+            self.assertEqual(lists.get_all_valid_moves(is_white), bitboards.get_all_valid_moves(is_white), lists.to_fen())
+            self.assertEqual(lists.get_all_valid_captures(is_white), bitboards.get_all_valid_captures(is_white))
+            self.assertEqual(lists.get_all_valid_quiets(is_white), bitboards.get_all_valid_quiets(is_white))
+
+    def test_same_make_undo(self):
+        # the bitboard make/undo keeps the list backend's board, rights and Move deltas
+        for lists, bitboards in random_games(FENS, games=2, plies=60, seed=11):
+            is_white = lists.white_to_move
+            snapshot = bitboards.to_snapshot()
+            saved = (dict(bitboards.bitboards), dict(bitboards.occupancy), bitboards.zobrist_hash,
+                     bitboards.material_score, bitboards.positional_score)
+            for move in lists.get_all_valid_moves(is_white):
+                list_move = lists.make_move(*move)
+                bitboard_move = bitboards.make_move(*move)
+                for name in Move.__slots__:
+                    self.assertEqual(getattr(list_move, name), getattr(bitboard_move, name), name)
+                self.assertEqual(bitboards.board, lists.board)
+                self.assertEqual((bitboards.castling_mask, bitboards.castled_dict, bitboards.king_positions),
+                                 (lists.castling_mask, lists.castled_dict, lists.king_positions))
+                # the running totals match a rebuild from the board
+                fresh = Bitboard_State.from_snapshot(bitboards.to_snapshot())
+                self.assertEqual((bitboards.bitboards, bitboards.occupancy), (fresh.bitboards, fresh.occupancy))
+                self.assertEqual((bitboards.zobrist_hash, bitboards.material_score, bitboards.positional_score),
+                                 (lists.zobrist_hash, lists.material_score, lists.positional_score))
+                bitboards.undo_move(bitboard_move)
+                lists.undo_move(list_move)
+                self.assertEqual(bitboards.to_snapshot(), snapshot)
+                self.assertEqual((dict(bitboards.bitboards), dict(bitboards.occupancy), bitboards.zobrist_hash,
+                                  bitboards.material_score, bitboards.positional_score), saved)
+
+    def test_same_exchange_evaluation(self):
+        for lists, bitboards in random_games(FENS, games=3, plies=80, seed=13):
+            is_white = lists.white_to_move
+            for move in lists.get_all_valid_captures(is_white):
+                self.assertEqual(lists.static_exchange_evaluation(*move), bitboards.static_exchange_evaluation(*move))
+            for row in range(8):
+                for col in range(8):
+                    for color in 'wb':
+                        self.assertEqual(lists.find_least_valuable_attacker(row, col, color),
+                                         bitboards.find_least_valuable_attacker(row, col, color))
+
+    def test_same_search(self):
+        for fen in (START_FEN, KIWIPETE):
+            results = []
+            for state_class in STATE_CLASSES:
+                state = state_class.from_fen(fen)
+                engine = Engine()
+                move = engine.get_best_move(state, 4, state.white_to_move)
+                results.append(((move.start_row, move.start_col, move.end_row, move.end_col),
+                                engine.best_score, engine.node_cnt, engine.qnode_cnt))
+            self.assertEqual(results[0], results[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
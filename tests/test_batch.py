@@ -0,0 +1,36 @@
+import unittest
+
+from chess_package import Engine
+from chess_package.batch import analyse_position, analyse_positions
+from helpers import START_FEN
+
+
+class Failing_Engine(Engine):
+
+    def get_best_move(self, state, depth, is_white, *args, **kwargs):
+        if state.to_fen().startswith('4k3'):
+            raise ValueError("broken search")
+        return super().get_best_move(state, depth, is_white, *args, **kwargs)
+
+
+class Test_Batch_Errors(unittest.TestCase):
+
+    def test_search_error_record(self):
+        engine = Failing_Engine()
+        record = analyse_position(0, 'a', '4k3/8/8/8/8/8/8/4K2R w K - 0 1', 2, None, 'list', engine)
+        self.assertEqual(record, {'index': 0, 'id': 'a', 'fen': '4k3/8/8/8/8/8/8/4K2R w K - 0 1',
+                                  'error': "Search failed: ValueError: broken search"})
+        # the engine is still usable for the next position
+        record = analyse_position(1, 'b', START_FEN, 2, None, 'list', engine)
+        self.assertNotIn('error', record)
+        self.assertIsNotNone(record['move'])
+
+    def test_batch_continues(self):
+        positions = [START_FEN, 'not a fen', '4k3/8/8/8/8/8/8/4K2R w K - 0 1']
+        records = sorted(analyse_positions(positions, depth=2, processes=1), key=lambda record: record['index'])
+        self.assertEqual([record['index'] for record in records], [0, 1, 2])
+        self.assertEqual(['error' in record for record in records], [False, True, False])
+
+
+if __name__ == '__main__':
+    unittest.main()
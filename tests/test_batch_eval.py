@@ -0,0 +1,82 @@
+import unittest
+
+from chess_package import Chess_State
+from chess_package.batch_eval import TERMS, encode_states, evaluate_batch, np
+from helpers import KIWIPETE, MIDDLEGAME, POSITION3, POSITION6, START_FEN, random_games
+
+FENS = (START_FEN, KIWIPETE, POSITION3, POSITION6, MIDDLEGAME)
+
+
+# copies of the positions along random games, castled sides included
+def random_positions():
+    return [states[0].clone() for states in random_games(FENS, (Chess_State,), games=4, plies=80, seed=23)]
+
+
+# the scalar evaluation, term by term
+def scalar_terms(state):
+    white, black = state.count_pseudo_mobility()
+    terms = {'material': state.get_material_score(), 'positional': state.get_positional_score(),
+             'mobility': state.MOBILITY_WEIGHT * (white - black), 'castling': state.get_castling_bonus()}
+    terms['total'] = state.evaluate_board()
+    return terms
+
+
+class Test_Batch_Evaluation(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.states = random_positions()
+        cls.expected = [scalar_terms(state) for state in cls.states]
+
+    def assert_terms(self, terms, expected, castling=True):
+        for name in TERMS + ('total',):
+            self.assertEqual(len(terms[name]), len(expected))
+            for index, row in enumerate(expected):
+                value = row[name]
+                if not castling and name in ('castling', 'total'):
+                    value -= row['castling']
+                self.assertAlmostEqual(float(terms[name][index]), value, places=9,
+                                       msg=f"{name} of {self.states[index].to_fen()}")
+
+    def test_scalar_fallback(self):
+        snapshots = [state.to_snapshot() for state in self.states]
+        self.assert_terms(evaluate_batch(snapshots, use_numpy=False), self.expected)
+        self.assert_terms(evaluate_batch(self.states, use_numpy=False), self.expected)
+        # 64 byte boards with the flags apart
+        boards = [snapshot[:64] for snapshot in snapshots]
+        flags = [snapshot[64] for snapshot in snapshots]
+        self.assert_terms(evaluate_batch(boards, flags, use_numpy=False), self.expected)
+
+    def test_mixed_input_leaves_states_alone(self):
+        # a snapshot after a Chess_State must not be loaded into that state
+        mixed = [state if index % 2 == 0 else state.to_snapshot() for index, state in enumerate(self.states)]
+        before = [state.to_snapshot() for state in self.states]
+        self.assert_terms(evaluate_batch(mixed, use_numpy=False), self.expected)
+        self.assertEqual([state.to_snapshot() for state in self.states], before)
+
+    @unittest.skipIf(np is None, "NumPy is not installed")
+    def test_snapshot_array(self):
+        terms = evaluate_batch(encode_states(self.states))
+        self.assert_terms(terms, self.expected)
+        # Chess_States go through the scalar path by default
+        self.assertIsInstance(evaluate_batch(self.states)['total'], list)
+
+    @unittest.skipIf(np is None, "NumPy is not installed")
+    def test_codes_and_planes(self):
+        snapshots = encode_states(self.states)
+        codes, flags = snapshots[:, :64], snapshots[:, 64]
+        self.assert_terms(evaluate_batch(codes, flags), self.expected)
+        # one-hot planes in PIECE_CODES order, code 1 (wP) is plane 0
+        planes = (codes[:, None, :] == np.arange(1, 13).reshape(1, 12, 1)).astype(np.uint8).reshape(-1, 12, 8, 8)
+        self.assert_terms(evaluate_batch(planes, flags), self.expected)
+        # without flags nobody can or did castle
+        self.assert_terms(evaluate_batch(planes), self.expected, castling=False)
+
+    @unittest.skipIf(np is None, "NumPy is not installed")
+    def test_bad_shape(self):
+        with self.assertRaises(Exception):
+            evaluate_batch(np.zeros((3, 63), dtype=np.uint8))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import json
+import os
+import tempfile
+import unittest
+
+from chess_package.benchmark import compare_results, run_scaling, run_search
+from helpers import KIWIPETE, MIDDLEGAME
+
+
+class Test_Benchmark_Nodes(unittest.TestCase):
+
+    def test_nps_counts_quiescence(self):
+        # one node definition with the UCI info lines: main search plus quiescence nodes
+        record = run_search('kiwipete', 'middlegame', KIWIPETE, 3, 'fixed')
+        self.assertGreater(record['qnode_cnt'], 0)
+        self.assertEqual(record['nodes'], record['node_cnt'] + record['qnode_cnt'])
+        self.assertEqual(record['nps'], round(record['nodes'] / record['time']))
+        self.assertEqual(record['ebf'], round(record['node_cnt'] ** (1.0 / 3), 3))
+
+    def test_compare_with_older_run(self):
+        # records saved before `nodes` existed are compared on the same definition
+        record = run_search('kiwipete', 'middlegame', KIWIPETE, 2, 'fixed')
+        old = dict(record)
+        del old['nodes']
+        old['nps'] = round(old['node_cnt'] / old['time'])
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'old.json')
+            with open(path, 'w') as f:
+                json.dump({'records': [old]}, f)
+            rows, totals = compare_results([record], path)
+        self.assertEqual((rows[0]['nodes'], rows[0]['nps'], totals['nodes'], totals['nps']), (0.0, 0.0, 0.0, 0.0))
+
+    def test_scaling_rows(self):
+        rows = run_scaling(4, (1, 2), positions=[('middlegame', 'middlegame', MIDDLEGAME)], verbose=False)
+        self.assertEqual([row['processes'] for row in rows], [1, 2])
+        self.assertEqual((rows[0]['speedup'], rows[0]['serial_share'], rows[0]['speedup_bound']), (1.0, 1.0, 1.0))
+        # the split searches part of the nodes in the other process, which bounds the speedup on two cores
+        self.assertLess(rows[1]['serial_share'], 1.0)
+        self.assertGreater(rows[1]['speedup_bound'], 1.0)
+        self.assertLessEqual(rows[1]['speedup_bound'], 2.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import os
+import tempfile
+import unittest
+
+from chess_package.cache import Analysis_Cache
+
+
+class Test_Cache_Eviction(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'cache.db')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_keeps_deepest_and_newest(self):
+        with Analysis_Cache(self.path, max_entries=10) as cache:
+            for key in range(10):
+                cache.put(key, True, 0.0, 'EXACT', 1 if key < 5 else 6)
+            self.assertEqual(len(cache), 10)
+            cache.put(100, True, 0.0, 'EXACT', 6)
+            # 11 rows: evicted down to 9, the two oldest shallow entries go first
+            self.assertEqual(len(cache), 9)
+            self.assertEqual(cache.get_stats()['evicted'], 2)
+            self.assertIsNone(cache.get(0, True))
+            self.assertIsNone(cache.get(1, True))
+            for key in list(range(2, 10)) + [100]:
+                self.assertIsNotNone(cache.get(key, True), key)
+
+    def test_updates_do_not_evict(self):
+        with Analysis_Cache(self.path, max_entries=10) as cache:
+            for key in range(10):
+                cache.put(key, True, 0.0, 'EXACT', 2)
+            for depth in range(3, 8):
+                cache.put(0, True, 1.0, 'EXACT', depth)
+            self.assertEqual(len(cache), 10)
+            self.assertEqual(cache.get_stats()['evicted'], 0)
+            self.assertEqual(cache.get(0, True), (1.0, 'EXACT', 7, None))
+
+    def test_counts_rarely(self):
+        with Analysis_Cache(self.path, max_entries=1000) as cache:
+            statements = []
+            cache.connection.set_trace_callback(statements.append)
+            for key in range(1500):
+                cache.put(key, key % 2 == 0, 0.0, 'EXACT', 3)
+            counts = sum('COUNT(*)' in statement for statement in statements)
+            # under the cap nothing is counted, past it once per 10 rows written
+            self.assertLessEqual(counts, 1500 // cache.count_interval - 1000 // cache.count_interval + 1)
+            self.assertLessEqual(len(cache), 1000)
+
+    def test_other_writers(self):
+        with Analysis_Cache(self.path, max_entries=20) as first, Analysis_Cache(self.path, max_entries=20) as second:
+            first.store_many({(key, True): (0.0, 'EXACT', 2, None) for key in range(15)})
+            second.store_many({(key, False): (0.0, 'EXACT', 2, None) for key in range(15)})
+            self.assertEqual(len(first), 30)
+            self.assertEqual(first.evict(force=True), 12)
+            self.assertEqual(len(second), 18)
+
+    def test_estimate_survives_reopen(self):
+        with Analysis_Cache(self.path, max_entries=10) as cache:
+            cache.store_many({(key, True): (0.0, 'EXACT', 2, None) for key in range(10)})
+        with Analysis_Cache(self.path, max_entries=10) as cache:
+            self.assertEqual(cache.row_estimate, 10)
+            cache.put(10, True, 0.0, 'EXACT', 2)
+            self.assertEqual(len(cache), 9)
+
+
+if __name__ == '__main__':
+    unittest.main()
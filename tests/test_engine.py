@@ -0,0 +1,69 @@
+import random
+import unittest
+
+from chess_package import Chess_State, Engine
+from helpers import KIWIPETE, MIDDLEGAME, POSITION3, POSITION6, START_FEN, STATE_CLASSES, random_games
+
+
+class Test_Quiescence(unittest.TestCase):
+
+    def test_delta_pruning_counts_promotion(self):
+        # bxa8=Q wins the queen and promotes: with alpha just above what the victim alone
+        # can bring, the capture is still searched and beats alpha
+        for state_class in STATE_CLASSES:
+            state = state_class.from_fen('q7/1P6/8/8/8/8/8/K6k w - - 0 1')
+            engine = Engine()
+            alpha = state.evaluate_board() + state.PIECE_VALUES['Q'] + engine.DELTA_MARGIN
+            self.assertGreater(engine.quiescence_search(state, alpha, alpha + 10, True), alpha)
+
+    def test_exchange_only_for_cheaper_victims(self):
+        state = Chess_State.from_fen(KIWIPETE)
+        board, values = state.board, state.PIECE_VALUES
+        exchanges = []
+        evaluate_exchange = state.static_exchange_evaluation
+
+        def counted(sr, sc, er, ec):
+            exchanges.append(values[board[er][ec][1]] < values[board[sr][sc][1]])
+            return evaluate_exchange(sr, sc, er, ec)
+
+        state.static_exchange_evaluation = counted
+        Engine().quiescence_search(state, -100, 100, True, depth=6)
+        self.assertTrue(exchanges)
+        self.assertTrue(all(exchanges))
+
+
+class Test_Staged_Moves(unittest.TestCase):
+
+    def test_same_moves_as_generation(self):
+        # random hash and killer moves: legal ones, legal ones of earlier positions and made-up ones
+        rng = random.Random(17)
+        engine = Engine()
+        earlier = []
+        for states in random_games((START_FEN, KIWIPETE, POSITION3, POSITION6, MIDDLEGAME), games=3, seed=17):
+            for state in states:
+                is_white = state.white_to_move
+                moves = state.get_all_valid_moves(is_white)
+                candidates = moves + earlier[-40:] + [tuple(rng.randrange(8) for _ in range(4)) for _ in range(4)]
+                hash_move = rng.choice(candidates + [None])
+                ply = rng.randrange(4)
+                engine.killer_moves = {ply: rng.sample(candidates, 2)}
+                engine.history = {(is_white, move): rng.randrange(100) for move in rng.sample(candidates, 3)}
+                snapshot, key = state.to_snapshot(), state.zobrist_hash
+
+                staged = list(engine.staged_moves(state, ply, is_white, hash_move))
+                self.assertEqual(len(staged), len(set(staged)), state.to_fen())
+                self.assertEqual(set(staged), set(moves), state.to_fen())
+                if hash_move in moves:
+                    self.assertEqual(staged[0], hash_move)
+                self.assertEqual((state.to_snapshot(), state.zobrist_hash), (snapshot, key))
+                # a cutoff stops the generator part way
+                generator = engine.staged_moves(state, ply, is_white, hash_move)
+                for _ in range(rng.randrange(len(moves) + 1)):
+                    next(generator)
+                generator.close()
+                self.assertEqual((state.to_snapshot(), state.zobrist_hash), (snapshot, key))
+                earlier.extend(moves)
+
+
+if __name__ == '__main__':
+    unittest.main()
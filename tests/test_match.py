@@ -0,0 +1,24 @@
+import unittest
+
+from chess_package.match import play_game
+
+
+class Test_Play_Game(unittest.TestCase):
+
+    def test_halfmove_clock_from_fen(self):
+        # 99 quiet plies already played: any rook or king move ends the game
+        record = play_game(0, '6k1/8/8/8/8/8/8/R5K1 w - - 99 80', True, {}, {}, movetime=0.2)
+        self.assertEqual((record['result'], record['reason'], record['plies']), ('1/2-1/2', 'fifty moves', 1))
+
+    def test_mate_over_fifty_moves(self):
+        # Ra8# is the 100th quiet ply, the mate stands
+        record = play_game(0, '6k1/5ppp/8/8/8/8/8/R5K1 w - - 99 80', True, {}, {}, movetime=0.2)
+        self.assertEqual((record['result'], record['reason'], record['moves']), ('1-0', 'checkmate', ['a1a8']))
+
+    def test_game_over_at_start(self):
+        record = play_game(0, 'R5k1/5ppp/8/8/8/8/8/6K1 b - - 0 1', True, {}, {}, movetime=0.2)
+        self.assertEqual((record['result'], record['reason'], record['plies']), ('1-0', 'checkmate', 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+
+from chess_package import Chess_State, Engine
+from helpers import KIWIPETE, MIDDLEGAME, START_FEN
+
+POSITIONS = (START_FEN, KIWIPETE, MIDDLEGAME)
+
+
+class Test_Parallel_Limits(unittest.TestCase):
+
+    def test_node_limit_with_search_processes(self):
+        processes = 3
+        engine = Engine(processes=processes)
+        try:
+            for fen, limit in ((fen, limit) for fen in POSITIONS for limit in (1000, 4000, 15000)):
+                state = Chess_State()
+                state.load_fen(fen)
+                move = engine.get_best_move_iterative(state, 20, state.white_to_move, time_limit=None, node_limit=limit)
+                self.assertIsNotNone(move)
+                stats = engine.get_stats()
+                # every process may run up to a couple of check intervals past its share
+                slack = 2 * Engine.ABORT_CHECK_INTERVAL * (processes + 1)
+                self.assertLessEqual(stats['node_cnt'] + stats['qnode_cnt'], limit + slack)
+                self.assertTrue(stats['aborted'])
+        finally:
+            engine.close()
+
+    def test_split_shares_the_table(self):
+        engine = Engine(processes=2)
+        try:
+            state = Chess_State()
+            state.load_fen(MIDDLEGAME)
+            move = engine.get_best_move(state, Engine.PARALLEL_MIN_DEPTH + 1, state.white_to_move)
+            self.assertIsNotNone(move)
+            stats = engine.get_stats()
+            self.assertGreater(stats['pool_nodes'], 0)
+            self.assertLess(stats['pool_nodes'], stats['nodes'])
+            # the processes stored their nodes in the main process' table: far more entries than
+            # the main process itself stored
+            table = engine.transposition_table
+            self.assertGreater(len(table), table.stores)
+        finally:
+            engine.close()
+
+    def test_close_after_stopped_search(self):
+        # close() stops the pool without shutdown(cancel_futures=True), which Python 3.8 lacks
+        engine = Engine(processes=2)
+        state = Chess_State()
+        state.load_fen(POSITIONS[1])
+        engine.get_best_move_iterative(state, 20, True, time_limit=None, node_limit=3000)
+        engine.close()
+        self.assertIsNone(engine.pool)
+        self.assertEqual(engine.pool_futures, set())
+        engine.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
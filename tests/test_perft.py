@@ -0,0 +1,53 @@
+import json
+import os
+import tempfile
+import unittest
+
+from chess_package.perft import check_regression, make_record, run_suite
+
+
+class Test_Perft(unittest.TestCase):
+
+    def test_reference_counts(self):
+        for backend in ('list', 'bitboard'):
+            for record in run_suite(3, backend):
+                self.assertTrue(record['ok'], record)
+
+
+class Test_Perft_Regression(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'baseline.json')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def check(self, baseline, records):
+        with open(self.path, 'w') as f:
+            json.dump({'records': baseline}, f)
+        return check_regression(records, self.path, 10.0)
+
+    def test_short_records_only_count_in_total(self):
+        # a depth 1 record that took twice as long is timer noise, the total holds
+        baseline = [make_record('startpos', 'list', 1, 20, 20, 0.0001), make_record('startpos', 'list', 3, 8902, 8902, 1.0)]
+        records = [make_record('startpos', 'list', 1, 20, 20, 0.0002), make_record('startpos', 'list', 3, 8902, 8902, 1.0)]
+        self.assertEqual(self.check(baseline, records), [])
+
+    def test_long_record_drop(self):
+        baseline = [make_record('startpos', 'list', 3, 8902, 8902, 1.0), make_record('startpos', 'list', 4, 197281, 197281, 10.0)]
+        records = [make_record('startpos', 'list', 3, 8902, 8902, 1.5), make_record('startpos', 'list', 4, 197281, 197281, 10.0)]
+        failures = self.check(baseline, records)
+        self.assertEqual(len(failures), 1)
+        self.assertTrue(failures[0].startswith('startpos depth 3'))
+
+    def test_total_drop(self):
+        baseline = [make_record('startpos', 'list', 1, 20, 20, 0.001)]
+        records = [make_record('startpos', 'list', 1, 20, 20, 0.002)]
+        failures = self.check(baseline, records)
+        self.assertEqual(len(failures), 1)
+        self.assertTrue(failures[0].startswith('total'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+import unittest
+
+from chess_package import Chess_State, Engine
+
+
+class Test_Search_Profiler(unittest.TestCase):
+
+    def test_ordering_phase(self):
+        # both ways of ordering moves show up in the ordering phase
+        for staged in (True, False):
+            engine = Engine(profile=True, use_staged_generation=staged)
+            state = Chess_State()
+            engine.get_best_move(state, 3, True)
+            ordering = engine.get_stats()['profile']['phases']['ordering']
+            self.assertGreater(ordering['calls'], 0, staged)
+            self.assertGreater(ordering['time'], 0.0, staged)
+            # the wrappers are gone after the search
+            self.assertNotIn('staged_moves', engine.__dict__)
+            self.assertNotIn('order_moves', engine.__dict__)
+
+    def test_same_search_when_profiled(self):
+        results = []
+        for profile in (False, True):
+            engine = Engine(profile=profile)
+            move = engine.get_best_move(Chess_State(), 3, True)
+            stats = engine.get_stats()
+            results.append((move.start_row, move.start_col, move.end_row, move.end_col, stats['node_cnt'],
+                            stats['qnode_cnt'], stats['best_score']))
+        self.assertEqual(results[0], results[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import unittest
+
+from chess_package import Bitboard_State, Chess_State
+from helpers import KIWIPETE, POSITION3, START_FEN, STATE_CLASSES, random_games
+
+# written the way to_fen writes them, castling rights of every kind
+FENS = (
+    START_FEN,
+    KIWIPETE,
+    'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R b Kq - 0 1',
+    POSITION3,
+    'r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 b - - 0 1',
+    '4k3/8/8/8/8/8/8/R3K3 w Q - 0 1',
+)
+
+
+class Test_State_Round_Trips(unittest.TestCase):
+
+    def assert_same_position(self, copy, state, castled=True):
+        self.assertEqual(copy.board, state.board)
+        self.assertEqual(copy.white_to_move, state.white_to_move)
+        self.assertEqual(copy.castling_mask, state.castling_mask)
+        self.assertEqual(copy.king_positions, state.king_positions)
+        self.assertEqual(copy.zobrist_hash, state.zobrist_hash)
+        self.assertEqual(copy.get_material_score(), state.get_material_score())
+        self.assertEqual(copy.get_positional_score(), state.get_positional_score())
+        self.assertEqual(copy.get_all_valid_moves(copy.white_to_move), state.get_all_valid_moves(state.white_to_move))
+        if castled:
+            self.assertEqual(copy.castled_dict, state.castled_dict)
+            self.assertEqual(copy.evaluate_board(), state.evaluate_board())
+        if isinstance(state, Bitboard_State) and isinstance(copy, Bitboard_State):
+            self.assertEqual(copy.bitboards, state.bitboards)
+            self.assertEqual(copy.occupancy, state.occupancy)
+
+    def test_fen_strings(self):
+        for state_class in STATE_CLASSES:
+            for fen in FENS:
+                self.assertEqual(state_class.from_fen(fen).to_fen(), fen)
+
+    def test_fen_round_trip(self):
+        for states in random_games(FENS, games=4, seed=5):
+            for state in states:
+                fen = state.to_fen()
+                copy = state.from_fen(fen)
+                self.assertEqual(copy.to_fen(), fen)
+                # a FEN does not say who has castled already
+                self.assert_same_position(copy, state, castled=False)
+
+    def test_snapshot_round_trip(self):
+        for states in random_games(FENS, games=4, seed=5):
+            for state in states:
+                data = state.to_snapshot()
+                self.assertEqual(len(data), state.SNAPSHOT_SIZE)
+                copy = state.from_snapshot(data)
+                self.assertEqual(copy.to_snapshot(), data)
+                self.assertEqual(copy.to_fen(), state.to_fen())
+                self.assert_same_position(copy, state)
+
+    def test_snapshot_across_backends(self):
+        for lists, bitboards in random_games(FENS, seed=5):
+            self.assert_same_position(Bitboard_State.from_snapshot(lists.to_snapshot()), lists)
+            self.assert_same_position(Chess_State.from_snapshot(bitboards.to_snapshot()), bitboards)
+
+    def test_loaded_state_plays_on(self):
+        # make/undo on a restored position brings back the same snapshot
+        for states in random_games(FENS, plies=30, seed=5):
+            for state in states:
+                copy = state.from_snapshot(state.to_snapshot())
+                data = copy.to_snapshot()
+                for move in copy.get_all_valid_moves(copy.white_to_move):
+                    undo = copy.make_move(*move)
+                    self.assertEqual(copy.compute_zobrist_hash(), copy.zobrist_hash)
+                    copy.undo_move(undo)
+                    self.assertEqual(copy.to_snapshot(), data)
+
+    def test_clone_is_independent(self):
+        for state_class in STATE_CLASSES:
+            state = state_class.from_fen(KIWIPETE)
+            data = state.to_snapshot()
+            copy = state.clone()
+            self.assert_same_position(copy, state)
+            copy.make_move(7, 4, 7, 6)
+            self.assertEqual(state.to_snapshot(), data)
+            self.assertFalse(state.castled_dict['w'])
+            self.assertTrue(copy.castled_dict['w'])
+
+    def test_invalid_input(self):
+        data = Chess_State().to_snapshot()
+        no_king = data.replace(bytes([Chess_State.SNAPSHOT_CODES['wK']]), bytes([Chess_State.SNAPSHOT_CODES['--']]))
+        for bad in (data[:-1], data + b'\0', bytes([255]) + data[1:], no_king):
+            with self.assertRaises(Exception):
+                Chess_State.from_snapshot(bad)
+        for fen in ('', 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP w KQkq - 0 1', '8/8/8/8/8/8/8/8 w - - 0 1',
+                    'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR x KQkq - 0 1', 'rnbqkbnr/ppppxppp/8/8/8/8/PPPPPPPP/RNBQKBNR w - - 0 1'):
+            with self.assertRaises(Exception):
+                Chess_State.from_fen(fen)
+
+
+if __name__ == '__main__':
+    unittest.main()
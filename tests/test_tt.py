@@ -0,0 +1,167 @@
+import unittest
+
+from chess_package.engine import Engine
+from chess_package.tt import Transposition_Table
+
+
+# keys that all land in the same bucket of a one bucket table
+A, B, C, D = 11, 22, 33, 44
+
+
+class Test_Transposition_Table_Entries(unittest.TestCase):
+
+    def test_score_round_trip(self):
+        table = Transposition_Table(1)
+        scores = (0.0, 0.001, -0.001, 1.5, -1.5, 25.1, -25.1, Engine.MATE_SCORE - 3, -(Engine.MATE_SCORE - 7),
+                  Engine.MATE_BOUND, -Engine.MATE_BOUND, Engine.INFINITE_SCORE, -Engine.INFINITE_SCORE)
+        for key, score in enumerate(scores, start=1):
+            table[(key, True)] = (score, 'EXACT', 4, None)
+            self.assertEqual(table[(key, True)], (score, 'EXACT', 4, None))
+
+    def test_fields_round_trip(self):
+        table = Transposition_Table(1)
+        key = (1 << 64) - 1
+        for flag in ('EXACT', 'LOWERBOUND', 'UPPERBOUND'):
+            for move in (None, (0, 0, 7, 7), (6, 4, 4, 4)):
+                for depth in (0, 1, 64, 255):
+                    table[(key, False)] = (-3.25, flag, depth, move)
+                    self.assertEqual(table.get((key, False)), (-3.25, flag, depth, move))
+        table[(key, False)] = (0.0, 'EXACT', 300, None)
+        self.assertEqual(table[(key, False)][2], 255)
+
+    def test_side_to_move(self):
+        table = Transposition_Table(1)
+        table[(A, True)] = (1.0, 'EXACT', 3, None)
+        self.assertIn((A, True), table)
+        self.assertNotIn((A, False), table)
+        self.assertIsNone(table.get((A, False)))
+        with self.assertRaises(KeyError):
+            table[(A, False)]
+
+
+class Test_Transposition_Table_Replacement(unittest.TestCase):
+
+    def setUp(self):
+        # one bucket: two slots
+        self.table = Transposition_Table(0)
+        self.assertEqual(self.table.slots, 2)
+
+    def store(self, key, depth, is_white=True):
+        self.table[(key, is_white)] = (float(depth), 'EXACT', depth, None)
+
+    def stored(self):
+        return {key for key in (A, B, C, D) if (key, True) in self.table}
+
+    def test_depth_preferred_and_always_replace(self):
+        self.store(A, 5)
+        self.store(B, 3)
+        self.assertEqual(self.table.find(A, True), 0)
+        self.assertEqual(self.table.find(B, True), 1)
+        # shallower than the first slot: always replaces the second
+        self.store(C, 2)
+        self.assertEqual(self.stored(), {A, C})
+        # at least as deep: takes the first slot
+        self.store(D, 5)
+        self.assertEqual(self.table.find(D, True), 0)
+        self.assertEqual(self.stored(), {C, D})
+        self.assertEqual(self.table.collisions, 2)
+
+    def test_same_position_keeps_first_slot(self):
+        self.store(A, 6)
+        self.store(A, 2)
+        self.assertEqual(self.table.find(A, True), 0)
+        self.assertEqual(self.table[(A, True)][2], 2)
+        self.assertEqual(len(self.table), 1)
+
+    def test_deeper_result_moves_to_first_slot(self):
+        self.store(A, 6)
+        self.store(B, 1)
+        self.store(B, 7)
+        self.assertEqual(self.table.find(B, True), 0)
+        self.assertEqual(self.stored(), {B})
+        self.assertEqual(len(self.table), 1)
+
+    def test_older_search_evicted_first(self):
+        self.store(A, 9)
+        self.store(B, 8)
+        self.table.new_search()
+        # a shallow entry of the new search still takes the first slot from an old deep one
+        self.store(C, 1)
+        self.assertEqual(self.table.find(C, True), 0)
+        self.assertEqual(self.stored(), {B, C})
+        # shallower than the first slot: the second slot, the old entry goes
+        self.store(D, 0)
+        self.assertEqual(self.stored(), {C, D})
+        # entries of another search are not collisions
+        self.assertEqual(self.table.collisions, 0)
+
+    def test_age_wraps(self):
+        self.store(A, 9)
+        for _ in range(256):
+            self.table.new_search()
+        self.assertEqual(self.table.age, 0)
+        self.table.new_search()
+        self.store(B, 1)
+        self.assertEqual(self.table.find(B, True), 0)
+
+
+class Test_Transposition_Table_Used(unittest.TestCase):
+
+    def test_used_accounting(self):
+        table = Transposition_Table(0)
+        self.assertEqual((len(table), table.fill_rate()), (0, 0.0))
+        table[(A, True)] = (0.0, 'EXACT', 4, None)
+        table[(A, False)] = (0.0, 'EXACT', 2, None)
+        self.assertEqual(len(table), 2)
+        self.assertEqual(table.fill_rate(), 1.0)
+        # overwrites never add entries
+        table[(A, True)] = (1.0, 'LOWERBOUND', 5, None)
+        table[(B, True)] = (0.0, 'EXACT', 1, None)
+        self.assertEqual(len(table), 2)
+        self.assertEqual(table.get_stats()['used'], 2)
+        self.assertEqual(table.stores, 4)
+        table.clear()
+        self.assertEqual((len(table), table.stores, table.collisions), (0, 0, 0))
+        self.assertIsNone(table.get((A, True)))
+
+    def test_used_matches_contents(self):
+        table = Transposition_Table(0.001)
+        for search in range(3):
+            table.new_search()
+            for key in range(500):
+                table[(key * 7919, key % 2 == 0)] = (0.0, 'EXACT', key % 9, None)
+        occupied = sum(1 for entry in table.data if entry)
+        self.assertEqual(len(table), occupied)
+
+
+class Test_Transposition_Table_Shared(unittest.TestCase):
+
+    def test_attached_table_sees_entries(self):
+        table = Transposition_Table(0.01, shared=True)
+        other = Transposition_Table(0.01, buffers=table.buffers)
+        table[(A, True)] = (1.5, 'LOWERBOUND', 4, (6, 4, 4, 4))
+        other[(B, False)] = (-2.0, 'EXACT', 3, None)
+        self.assertEqual(other[(A, True)], (1.5, 'LOWERBOUND', 4, (6, 4, 4, 4)))
+        self.assertEqual(table[(B, False)], (-2.0, 'EXACT', 3, None))
+        self.assertEqual((len(table), len(other)), (2, 2))
+        other.clear()
+        self.assertEqual(len(table), 0)
+        self.assertIsNone(table.get((A, True)))
+
+    def test_torn_entry_is_a_miss(self):
+        # the data word of one store with the key word of another, as a concurrent write leaves it
+        table = Transposition_Table(0)
+        table[(A, True)] = (1.0, 'EXACT', 5, None)
+        key_word = table.keys[0]
+        table[(A, True)] = (2.0, 'EXACT', 6, None)
+        table.keys[0] = key_word
+        self.assertNotIn((A, True), table)
+
+    def test_attach_needs_the_same_size(self):
+        table = Transposition_Table(0.01, shared=True)
+        with self.assertRaises(Exception):
+            Transposition_Table(0.02, buffers=table.buffers)
+
+
+if __name__ == '__main__':
+    unittest.main()
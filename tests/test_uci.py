@@ -0,0 +1,85 @@
+import threading
+import time
+import unittest
+
+from chess_package.uci import Uci_Protocol
+from helpers import KIWIPETE
+
+
+class Timed_Output:
+    # collects the lines the front-end sends, with the time each one arrived
+
+    def __init__(self):
+        self.lines = []
+        self.lock = threading.Lock()
+        self.buffer = ''
+
+    def write(self, text):
+        with self.lock:
+            self.buffer += text
+            while '\n' in self.buffer:
+                line, self.buffer = self.buffer.split('\n', 1)
+                self.lines.append((time.perf_counter(), line))
+
+    def flush(self):
+        pass
+
+    def wait_for(self, prefix, timeout):
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            with self.lock:
+                for arrived, line in self.lines:
+                    if line.startswith(prefix):
+                        return arrived, line
+            time.sleep(0.005)
+        return None
+
+
+# a stop is answered within a few milliseconds on an idle machine, the bound only catches a
+# search that ignores it and runs on to its next iteration or its end
+STOP_TIMEOUT = 5.0
+
+
+class Test_Uci_Stop(unittest.TestCase):
+
+    # `go infinite` with `threads` search processes, stopped `pause` seconds after the first
+    # iterations: (seconds from stop to bestmove, lines sent from the stop on)
+    def run_stop(self, threads, pause):
+        output = Timed_Output()
+        uci = Uci_Protocol(output)
+        try:
+            for line in ('uci', f'setoption name Threads value {threads}', 'setoption name Backend value list',
+                         f'position fen {KIWIPETE}', 'go infinite'):
+                uci.handle(line)
+            self.assertIsNotNone(output.wait_for('info depth 2', 60))
+            time.sleep(pause)
+            stop_time = time.perf_counter()
+            uci.handle('stop')
+            bestmove = output.wait_for('bestmove', 30)
+            # the search thread ends on its own once the bestmove is out
+            search_thread = uci.search_thread
+            search_thread.join(STOP_TIMEOUT)
+            self.assertFalse(search_thread.is_alive())
+        finally:
+            uci.quit()
+        self.assertIsNotNone(bestmove)
+        return bestmove[0] - stop_time, [line for arrived, line in output.lines if arrived >= stop_time]
+
+    def check_stop(self, threads, pauses):
+        for pause in pauses:
+            latency, after_stop = self.run_stop(threads, pause)
+            self.assertLess(latency, STOP_TIMEOUT, f"stop after {pause}s took {latency:.3f}s")
+            # the bestmove is the last line, nothing of the stopped search follows it
+            self.assertTrue(after_stop[-1].startswith('bestmove'), after_stop)
+            self.assertEqual(sum(line.startswith('bestmove') for line in after_stop), 1, after_stop)
+
+    def test_stop_single_thread(self):
+        self.check_stop(1, (0.5,))
+
+    def test_stop_with_search_processes(self):
+        # the root moves run in other processes, a stop has to reach them mid-move
+        self.check_stop(2, (0.5, 1.0, 2.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
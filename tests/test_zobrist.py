@@ -0,0 +1,29 @@
+import unittest
+
+from helpers import KIWIPETE, START_FEN, STATE_CLASSES, random_games
+
+
+class Test_Zobrist_Key(unittest.TestCase):
+    # a position gets the same key whether it was played to or loaded from a FEN
+
+    def assert_same_key(self, played):
+        loaded = played.from_fen(played.to_fen())
+        self.assertEqual(loaded.zobrist_hash, played.zobrist_hash, played.to_fen())
+        self.assertEqual(played.compute_zobrist_hash(), played.zobrist_hash, played.to_fen())
+
+    def test_after_castling(self):
+        for state_class in STATE_CLASSES:
+            played = state_class.from_fen(KIWIPETE)
+            played.make_move(7, 4, 7, 6)
+            played.make_move(0, 4, 0, 2)
+            self.assertTrue(played.castled_dict['w'] and played.castled_dict['b'])
+            self.assert_same_key(played)
+
+    def test_random_games(self):
+        for states in random_games((START_FEN, KIWIPETE), seed=11):
+            for played in states:
+                self.assert_same_key(played)
+
+
+if __name__ == '__main__':
+    unittest.main()